@@ -0,0 +1,32 @@
+"""add document content hash
+
+Revision ID: b6e1f4a8d273
+Revises: f3c9d2a7b615
+Create Date: 2026-05-08 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "b6e1f4a8d273"
+down_revision: Union[str, Sequence[str], None] = "f3c9d2a7b615"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing documents stay NULL: their bytes were never hashed, so they
+    # simply don't take part in upload dedup.
+    op.add_column("documents", sa.Column("content_hash", sa.String(64), nullable=True))
+    op.create_index(
+        "ix_documents_user_id_content_hash",
+        "documents",
+        ["user_id", "content_hash"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_user_id_content_hash", table_name="documents")
+    op.drop_column("documents", "content_hash")
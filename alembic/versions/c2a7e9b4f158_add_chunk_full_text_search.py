@@ -0,0 +1,31 @@
+"""add chunk full-text search
+
+Revision ID: c2a7e9b4f158
+Revises: b6e1f4a8d273
+Create Date: 2026-05-12 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "c2a7e9b4f158"
+down_revision: Union[str, Sequence[str], None] = "b6e1f4a8d273"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Generated column: Postgres fills it for existing rows and keeps it in
+    # sync on every insert/update, including the binary COPY ingestion path.
+    op.execute("""
+        ALTER TABLE chunks
+        ADD COLUMN content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+    """)
+    op.execute("CREATE INDEX ix_chunks_content_tsv ON chunks USING gin (content_tsv)")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chunks_content_tsv", table_name="chunks")
+    op.drop_column("chunks", "content_tsv")
@@ -0,0 +1,34 @@
+"""add user chunk counts
+
+Revision ID: d8b3f5c1e297
+Revises: c2a7e9b4f158
+Create Date: 2026-05-14 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "d8b3f5c1e297"
+down_revision: Union[str, Sequence[str], None] = "c2a7e9b4f158"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_chunk_counts",
+        sa.Column("user_id", sa.String(50), primary_key=True),
+        sa.Column("chunk_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=False, server_default=sa.func.now()),
+    )
+
+    op.execute("""
+        INSERT INTO user_chunk_counts (user_id, chunk_count)
+        SELECT user_id, count(*) FROM chunks GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("user_chunk_counts")
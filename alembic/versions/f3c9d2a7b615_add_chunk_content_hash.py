@@ -0,0 +1,38 @@
+"""add chunk content hash
+
+Revision ID: f3c9d2a7b615
+Revises: e7f3a1b9c042
+Create Date: 2026-05-06 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "f3c9d2a7b615"
+down_revision: Union[str, Sequence[str], None] = "e7f3a1b9c042"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("chunks", sa.Column("content_hash", sa.String(64), nullable=True))
+
+    # Same digest ingestion computes: sha256 of the UTF-8 content, hex-encoded.
+    op.execute("""
+        UPDATE chunks
+        SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+        WHERE content_hash IS NULL
+    """)
+
+    op.create_index(
+        "ix_chunks_document_id_chunk_index",
+        "chunks",
+        ["document_id", "chunk_index"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chunks_document_id_chunk_index", table_name="chunks")
+    op.drop_column("chunks", "content_hash")
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 # Origins allowed by CORSMiddleware. Referenced here so errors.py can add
@@ -46,7 +48,33 @@ class Settings(BaseSettings):
 
     # Embedding
     embedding_model: str = "text-embedding-3-small"
+    # Stored vector size. text-embedding-3 models are Matryoshka-trained, so
+    # 256/512 keep most of the quality at a fraction of the storage and search
+    # cost; changing it requires scripts/reproject_embeddings.py.
     embedding_dimensions: int = 1536
+    # Ask the provider for embedding_dimensions. Turn off for models that don't
+    # accept `dimensions`; longer vectors are then truncated and renormalized.
+    embedding_request_dimensions: bool = True
+
+    # Embedding scheduler (ingestion) — limits are per API key
+    embedding_max_in_flight: int = 4
+    embedding_tokens_per_minute: int = 1_000_000  # 0 disables the TPM budget
+    embedding_max_retries: int = 5
+    embedding_scheduler_max_keys: int = 256  # schedulers kept, least recently used dropped
+
+    # Embedding cache — in-process LRU in front of Redis, keyed by content hash
+    embedding_cache_lru_size: int = 2000  # entries; ~6 KB each at 1536 dims (4 bytes/dim)
+    embedding_cache_redis_enabled: bool = True
+    embedding_cache_ttl_seconds: int = 30 * 24 * 3600
+    query_embedding_cache_size: int = 1000  # per-user search queries, LRU-evicted
+    query_embedding_cache_ttl_seconds: int = 900
+
+    # Ingestion DB writes — chunks are COPY'd per batch, committed every N rows
+    ingest_commit_rows: int = 2000
+
+    # PDF extraction — process pool in the arq worker (0 = thread executor)
+    pdf_extract_processes: int = 2
+    pdf_extract_pages_per_task: int = 32  # big PDFs are split into ranges this size
 
     # Chunking
     chunk_size: int = 512
@@ -54,6 +82,42 @@ class Settings(BaseSettings):
 
     # Retrieval
     retrieval_top_k: int = 5
+    retrieval_hybrid_candidates: int = 40  # per-list candidates fused in hybrid mode
+    retrieval_rrf_k: int = 60  # reciprocal rank fusion damping constant
+    retrieval_exact_scan_max_chunks: int = 10_000  # tenants this small skip HNSW
+    retrieval_hnsw_ef_search: int = 100
+    retrieval_hnsw_iterative_scan: str = "relaxed_order"  # pgvector >= 0.8; "" disables
+    retrieval_context_neighbors: int = 1  # document_search shows hits with this many chunks either side
+    # document_search diversifies by maximal marginal relevance over this many
+    # candidates; lambda 1.0 is plain similarity order, lower favours variety.
+    retrieval_mmr_lambda: float = 0.7
+    retrieval_mmr_candidates: int = 20
+    # Adaptive result count (document_search): hits below either similarity
+    # cutoff are dropped and kept contexts are capped at this many tokens
+    # (0 = no cap). The cutoffs are calibrated with
+    # `scripts.eval_retrieval --offline` on the 18-query golden set, where
+    # every query has a single relevant chunk: there they keep all relevant
+    # hits while returning ~1.6 of 5. Questions whose answer spans several
+    # chunks can lose the weaker parts, so recalibrate on such queries or
+    # turn the cutoff off.
+    retrieval_adaptive_cutoff: bool = True
+    retrieval_min_similarity: float = 0.25
+    retrieval_relative_floor: float = 0.8  # fraction of the best hit's similarity
+    retrieval_max_context_tokens: int = 2000
+    # Which chunks HNSW index large-tenant searches walk: "full" (vector),
+    # "halfvec" or "binary" (compact expression indexes, see
+    # scripts/vector_index.py), the latter two rescored on full vectors.
+    vector_storage_mode: Literal["full", "halfvec", "binary"] = "full"
+    vector_rescore_factor: int = 4  # compact modes fetch top_k x this for rescoring
+
+    # Reranking — document_search over-fetches and re-orders with one LLM call
+    rerank_enabled: bool = False
+    rerank_model: str = "gpt-4o-mini"
+    rerank_candidates: int = 50
+    rerank_timeout_seconds: float = 2.0  # past this, the retrieval order is used
+    rerank_passage_chars: int = 600  # each candidate is cut to this in the prompt
+    rerank_cache_size: int = 500
+    rerank_cache_ttl_seconds: int = 900
 
     # Models
     chat_model: str = "gpt-5-nano"
@@ -68,6 +132,11 @@ class Settings(BaseSettings):
     # S3 — empty means use local filesystem (dev mode)
     s3_bucket_name: str = ""
     aws_default_region: str = "us-east-1"
+    max_upload_bytes: int = 250 * 1024 * 1024  # streamed uploads are cut off past this
+    pdf_memory_max_bytes: int = 32 * 1024 * 1024  # larger PDFs spill to a temp file
+    s3_transfer_chunk_bytes: int = 8 * 1024 * 1024  # ranged-GET part size for spills
+    s3_transfer_max_concurrency: int = 4
+    s3_max_pool_connections: int = 20  # shared client's HTTP connection pool
 
     # Auth (Clerk)
     clerk_secret_key: str = ""
@@ -88,11 +157,46 @@ class Settings(BaseSettings):
 
     # Demo seed corpus — documents visible to all guests
     seed_user_id: str = "demo_seed"
+    # Guests search the seed corpus in an in-process matrix instead of SQL;
+    # a reseed is picked up within seed_index_check_seconds.
+    seed_index_enabled: bool = True
+    seed_index_check_seconds: float = 30.0
 
     # Agent / tools
     tavily_api_key: str = ""
     e2b_api_key: str = ""
+    # python_executor sandboxes: "e2b" (needs E2B_API_KEY) or "local", a
+    # subprocess under rlimits for development and tests — not an isolation
+    # boundary. Sandboxes are pooled: a few kept warm, one reused per
+    # conversation until idle for sandbox_idle_seconds.
+    sandbox_backend: Literal["e2b", "local"] = "e2b"
+    sandbox_warm_size: int = 2
+    sandbox_pool_max: int = 20
+    sandbox_idle_seconds: float = 600.0
+    sandbox_max_age_seconds: float = 3600.0
+    sandbox_local_memory_mb: int = 1024
+    sandbox_local_cpu_seconds: int = 120
     agent_max_iterations: int = 10
+    # Outbound HTTP from tools: one pooled keep-alive client per upstream
+    # (app/services/http_clients.py), speaking HTTP/2 unless http2_enabled is off.
+    http2_enabled: bool = True
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_seconds: float = 60.0
+    # Tool calls from one model turn run concurrently, at most
+    # agent_max_parallel_tools at a time, each cut off after agent_tool_timeout_seconds.
+    agent_max_parallel_tools: int = 4
+    agent_tool_timeout_seconds: float = 60.0
+    # Each chat turn has a latency budget by effort level. A tool call gets
+    # what is left of it minus agent_answer_reserve_seconds (kept for the final
+    # answer); once that is spent the model must answer without tools.
+    agent_turn_budget_fast_seconds: float = 30.0
+    agent_turn_budget_balanced_seconds: float = 90.0
+    agent_turn_budget_thorough_seconds: float = 180.0
+    agent_answer_reserve_seconds: float = 10.0
+    # Start document_search / memory_search calls while the model is still
+    # streaming its turn, as soon as their arguments parse (litellm loop).
+    agent_speculative_tools: bool = True
 
     # Memory extraction
     memory_extraction_model: str = "gpt-4o-mini"
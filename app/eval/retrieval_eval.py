@@ -26,6 +26,8 @@ frozen_vectors.json schema::
 """
 
 import json
+import math
+import re
 from pathlib import Path
 from statistics import mean
 
@@ -55,11 +57,245 @@ def rank_by_cosine(
     return [corpus_ids[i] for i in order]
 
 
+def score_by_cosine(
+    query_vec: list[float],
+    corpus_vecs: list[list[float]],
+    corpus_ids: list[str],
+) -> list[tuple[str, float]]:
+    """(id, cosine similarity) pairs, best first, in rank_by_cosine's order."""
+    q = np.asarray(query_vec, dtype=np.float64)
+    matrix = np.asarray(corpus_vecs, dtype=np.float64)
+    q_norm = q / (np.linalg.norm(q) + 1e-12)
+    matrix_norm = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+    sims = matrix_norm @ q_norm
+    order = np.argsort(-sims, kind="stable")
+    return [(corpus_ids[i], float(sims[i])) for i in order]
+
+
+def apply_cutoff(
+    scored: list[tuple[str, float]], min_similarity: float, relative_floor: float
+) -> list[str]:
+    """Ids whose similarity clears both the absolute and the relative cutoff.
+
+    Mirrors retrieval.adaptive_cutoff (without its token budget): a hit is
+    kept if similarity >= min_similarity and >= relative_floor x the best.
+    """
+    if not scored:
+        return []
+    best = max(sim for _, sim in scored)
+    return [cid for cid, sim in scored if sim >= min_similarity and sim >= relative_floor * best]
+
+
+def calibrate_cutoffs(
+    frozen: dict,
+    golden: list[EvalCase],
+    top_k: int = 5,
+    margin: float = 0.05,
+    step: float = 0.05,
+) -> dict[str, float]:
+    """Tightest cutoffs that still keep every relevant id found in the top_k.
+
+    Takes the lowest similarity, and the lowest similarity / best-score ratio,
+    of any relevant id ranked within top_k across the golden set, subtracts
+    `margin` and rounds down to a multiple of `step`, so unseen queries have
+    headroom. These are the values to set as retrieval_min_similarity and
+    retrieval_relative_floor.
+    """
+    corpus_ids = list(frozen["corpus"])
+    corpus_vecs = [frozen["corpus"][cid] for cid in corpus_ids]
+    sims, ratios = [], []
+    for case in golden:
+        scored = score_by_cosine(frozen["queries"][case.query], corpus_vecs, corpus_ids)[:top_k]
+        best = scored[0][1]
+        for cid, sim in scored:
+            if cid in case.relevant_ids:
+                sims.append(sim)
+                ratios.append(sim / best)
+
+    def floor_to_step(value: float) -> float:
+        return round(math.floor(max(0.0, value - margin) / step) * step, 4)
+
+    return {"min_similarity": floor_to_step(min(sims)), "relative_floor": floor_to_step(min(ratios))}
+
+
+def evaluate_cutoff(
+    frozen: dict,
+    golden: list[EvalCase],
+    min_similarity: float,
+    relative_floor: float,
+    top_k: int = 5,
+) -> dict[str, float]:
+    """evaluate()'s metrics over cut-off top_k rankings, plus mean results returned."""
+    corpus_ids = list(frozen["corpus"])
+    corpus_vecs = [frozen["corpus"][cid] for cid in corpus_ids]
+    rankings = [
+        (
+            apply_cutoff(
+                score_by_cosine(frozen["queries"][case.query], corpus_vecs, corpus_ids)[:top_k],
+                min_similarity,
+                relative_floor,
+            ),
+            case.relevant_ids,
+        )
+        for case in golden
+    ]
+    return {
+        "hit_rate_at_3": mean(hit_rate_at_k(r, rel, 3) for r, rel in rankings),
+        "hit_rate_at_5": mean(hit_rate_at_k(r, rel, 5) for r, rel in rankings),
+        "mrr": mean(reciprocal_rank(r, rel) for r, rel in rankings),
+        "mean_results": mean(len(r) for r, _ in rankings),
+    }
+
+
+# Postgres' english configuration drops stopwords before matching; the offline
+# lexical ranker drops the commonest ones so they don't dominate BM25 either.
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "their this to was were who what which with".split()
+)
+
+
+def _tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def rank_by_bm25(
+    query: str,
+    corpus_texts: list[str],
+    corpus_ids: list[str],
+    k1: float = 1.2,
+    b: float = 0.75,
+) -> list[str]:
+    """Rank corpus ids by BM25 against the query, dropping ids with no term match.
+
+    The offline stand-in for the full-text half of hybrid retrieval (the live
+    path uses Postgres ts_rank_cd). Like a tsquery match, only documents that
+    share at least one term with the query are returned; ties keep corpus
+    order.
+    """
+    docs = [_tokenize(t) for t in corpus_texts]
+    n = len(docs)
+    avg_len = sum(len(d) for d in docs) / n if n else 0.0
+    df: dict[str, int] = {}
+    for doc in docs:
+        for term in set(doc):
+            df[term] = df.get(term, 0) + 1
+
+    scores = []
+    for doc in docs:
+        score = 0.0
+        for term in set(_tokenize(query)):
+            tf = doc.count(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg_len))
+        scores.append(score)
+    order = sorted(range(n), key=lambda i: -scores[i])
+    return [corpus_ids[i] for i in order if scores[i] > 0]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+    """Fuse rankings by summing 1 / (k + rank) per id (best first).
+
+    Mirrors the fusion step of hybrid retrieval in app/services/retrieval.py.
+    Ties resolve by first appearance across the input rankings.
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, candidate_id in enumerate(ranking, start=1):
+            scores[candidate_id] = scores.get(candidate_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda cid: -scores[cid])
+
+
+def rank_by_quantized(
+    query_vec: list[float],
+    corpus_vecs: list[list[float]],
+    corpus_ids: list[str],
+    storage: str,
+    pool: int,
+) -> list[str]:
+    """Rank like a compact-index search: quantized first pass, exact rescoring.
+
+    storage="halfvec" scores float16-rounded vectors by cosine; "binary" scores
+    sign bits by Hamming distance (pgvector's binary_quantize). The best `pool`
+    candidates are then re-ranked by full-precision cosine, as retrieval does
+    against the stored float32 vectors. Returns only the pool.
+    """
+    q = np.asarray(query_vec, dtype=np.float64)
+    matrix = np.asarray(corpus_vecs, dtype=np.float64)
+    if storage == "halfvec":
+        q_half = q.astype(np.float16).astype(np.float64)
+        m_half = matrix.astype(np.float16).astype(np.float64)
+        coarse = (m_half / (np.linalg.norm(m_half, axis=1, keepdims=True) + 1e-12)) @ (
+            q_half / (np.linalg.norm(q_half) + 1e-12)
+        )
+    elif storage == "binary":
+        coarse = -np.count_nonzero((matrix > 0) != (q > 0), axis=1).astype(np.float64)
+    else:
+        raise ValueError(f"unknown storage mode: {storage}")
+
+    candidates = np.argsort(-coarse, kind="stable")[:pool]
+    shortlist = [corpus_ids[i] for i in candidates]
+    return rank_by_cosine(query_vec, [corpus_vecs[i] for i in candidates], shortlist)
+
+
+def rank_by_mmr(
+    query_vec: list[float],
+    corpus_vecs: list[list[float]],
+    corpus_ids: list[str],
+    mmr_lambda: float,
+    pool: int = 20,
+) -> list[str]:
+    """Rank like retrieval's MMR diversification (retrieval.mmr_order).
+
+    Takes the top `pool` ids by cosine, then picks greedily by
+    mmr_lambda * relevance - (1 - mmr_lambda) * max similarity to the picks.
+    """
+    shortlist = rank_by_cosine(query_vec, corpus_vecs, corpus_ids)[:pool]
+    index = {cid: i for i, cid in enumerate(corpus_ids)}
+    matrix = np.asarray([corpus_vecs[index[cid]] for cid in shortlist], dtype=np.float64)
+    unit = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+    q = np.asarray(query_vec, dtype=np.float64)
+    relevance = unit @ (q / (np.linalg.norm(q) + 1e-12))
+
+    picked: list[int] = []
+    redundancy = np.zeros(len(shortlist))
+    available = np.ones(len(shortlist), dtype=bool)
+    for _ in range(len(shortlist)):
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        best = int(np.argmax(np.where(available, scores, -np.inf)))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, unit @ unit[best])
+    return [shortlist[i] for i in picked]
+
+
 def load_frozen(path: Path) -> dict:
     """Load frozen_vectors.json (corpus/query vectors + baseline + provenance)."""
     return json.loads(Path(path).read_text())
 
 
+def truncate_frozen(frozen: dict, dimensions: int) -> dict:
+    """Frozen vectors cut to their first `dimensions` and L2-renormalized.
+
+    Mirrors ingestion.fit_dimensions (the Matryoshka shortening that
+    text-embedding-3 applies for `dimensions=`), so a smaller
+    EMBEDDING_DIMENSIONS can be judged without re-embedding anything.
+    """
+
+    def fit(vector: list[float]) -> list[float]:
+        head = np.asarray(vector[:dimensions], dtype=np.float64)
+        return (head / (np.linalg.norm(head) + 1e-12)).tolist()
+
+    return {
+        **frozen,
+        "corpus": {cid: fit(v) for cid, v in frozen["corpus"].items()},
+        "queries": {q: fit(v) for q, v in frozen["queries"].items()},
+    }
+
+
 def rank_case(frozen: dict, case: EvalCase) -> list[str]:
     """Rank the frozen corpus ids for one golden case using its frozen query vector."""
     corpus_ids = list(frozen["corpus"])
@@ -67,13 +303,67 @@ def rank_case(frozen: dict, case: EvalCase) -> list[str]:
     return rank_by_cosine(frozen["queries"][case.query], corpus_vecs, corpus_ids)
 
 
-def evaluate(frozen: dict, golden: list[EvalCase]) -> dict[str, float]:
+def rank_case_hybrid(
+    frozen: dict,
+    corpus: dict[str, str],
+    case: EvalCase,
+    candidates: int = 40,
+    rrf_k: int = 60,
+) -> list[str]:
+    """Hybrid ranking for one case: top cosine and top BM25 candidates, RRF-fused."""
+    corpus_ids = list(frozen["corpus"])
+    lexical = rank_by_bm25(case.query, [corpus[cid] for cid in corpus_ids], corpus_ids)
+    vector = rank_case(frozen, case)
+    return reciprocal_rank_fusion([vector[:candidates], lexical[:candidates]], k=rrf_k)
+
+
+def rank_case_quantized(frozen: dict, case: EvalCase, storage: str, pool: int) -> list[str]:
+    """Compact-index ranking for one case (see rank_by_quantized)."""
+    corpus_ids = list(frozen["corpus"])
+    corpus_vecs = [frozen["corpus"][cid] for cid in corpus_ids]
+    return rank_by_quantized(frozen["queries"][case.query], corpus_vecs, corpus_ids, storage, pool)
+
+
+def evaluate(
+    frozen: dict,
+    golden: list[EvalCase],
+    corpus: dict[str, str] | None = None,
+    mode: str = "vector",
+    storage: str = "full",
+    rescore_pool: int = 20,
+    dimensions: int | None = None,
+    mmr_lambda: float | None = None,
+) -> dict[str, float]:
     """Rank every golden query over the frozen corpus and return mean metrics.
 
     Returns mean hit-rate@3, hit-rate@5, and MRR across all cases. MRR is the
     mean reciprocal rank; the metric functions themselves live in Plan 20-01.
+    mode="hybrid" ranks with rank_case_hybrid, which also needs the corpus
+    texts. storage="halfvec"/"binary" ranks vector-mode queries through a
+    quantized first pass of rescore_pool candidates (rank_case_quantized).
+    dimensions truncates every vector first (truncate_frozen). mmr_lambda
+    diversifies vector-mode rankings (rank_by_mmr).
     """
-    rankings = [(rank_case(frozen, case), case.relevant_ids) for case in golden]
+    if dimensions is not None:
+        frozen = truncate_frozen(frozen, dimensions)
+    if mmr_lambda is not None:
+        corpus_ids = list(frozen["corpus"])
+        corpus_vecs = [frozen["corpus"][cid] for cid in corpus_ids]
+        rankings = [
+            (rank_by_mmr(frozen["queries"][case.query], corpus_vecs, corpus_ids, mmr_lambda), case.relevant_ids)
+            for case in golden
+        ]
+    elif storage != "full":
+        rankings = [
+            (rank_case_quantized(frozen, case, storage, rescore_pool), case.relevant_ids)
+            for case in golden
+        ]
+    elif mode == "hybrid":
+        if corpus is None:
+            raise ValueError("hybrid evaluation needs the corpus texts")
+        rankings = [(rank_case_hybrid(frozen, corpus, case), case.relevant_ids) for case in golden]
+    else:
+        rankings = [(rank_case(frozen, case), case.relevant_ids) for case in golden]
     return {
         "hit_rate_at_3": mean(hit_rate_at_k(r, rel, 3) for r, rel in rankings),
         "hit_rate_at_5": mean(hit_rate_at_k(r, rel, 5) for r, rel in rankings),
@@ -12,6 +12,7 @@ from app.database import engine, async_session
 from app.errors import global_exception_handler
 from app.limiter import limiter
 from app.routers import documents, chat, keys, memories, guest
+from app.services import embedding_cache, http_clients, rerank, sandbox, seed_index
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
@@ -40,9 +41,28 @@ async def lifespan(app: FastAPI):
     from arq.connections import RedisSettings
     app.state.redis_pool = await create_pool(RedisSettings.from_dsn(settings.redis_url))
 
+    # Pooled keep-alive clients for tools' outbound HTTP
+    http_clients.start()
+
+    # Guests search the demo corpus from memory; load it before the first one arrives.
+    if settings.seed_index_enabled:
+        try:
+            async with async_session() as session:
+                await seed_index.load(session)
+        except Exception as e:  # noqa: BLE001 — the first guest search retries the load
+            logger.warning(f"Seed index not loaded at startup: {e}")
+
+    # Warm python_executor sandboxes and start reaping idle ones.
+    if sandbox.configured():
+        sandbox.get_pool().start()
+
     yield
 
+    await sandbox.aclose()
+    await http_clients.aclose()
+
     await app.state.redis_pool.aclose()
+    await embedding_cache.aclose()
 
 
 app = FastAPI(title="AI Assistant Platform", version="0.1.0", lifespan=lifespan)
@@ -78,6 +98,17 @@ async def health():
         )
 
 
+@app.get("/metrics")
+async def metrics():
+    """Process-local cache counters (reset on restart)."""
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "query_embedding_cache": embedding_cache.query_stats(),
+        "rerank": rerank.stats(),
+        "sandbox": sandbox.stats(),
+    }
+
+
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     return JSONResponse(
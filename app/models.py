@@ -2,8 +2,8 @@ import uuid
 from datetime import datetime
 
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import String, Text, Integer, DateTime, ForeignKey, Index, LargeBinary, Boolean
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import String, Text, Integer, DateTime, ForeignKey, Index, LargeBinary, Boolean, Computed
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.config import settings
@@ -37,6 +37,11 @@ class Document(Base):
         Integer, nullable=True
     )
 
+    # sha256 of the uploaded file, computed while streaming; used for dedup
+    content_hash: Mapped[str | None] = mapped_column(
+        String(64), nullable=True
+    )
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, default=datetime.utcnow
     )
@@ -71,9 +76,43 @@ class Chunk(Base):
         Vector(settings.embedding_dimensions), nullable=False
     )
 
+    # Full-text search vector for hybrid retrieval, maintained by Postgres
+    content_tsv: Mapped[str] = mapped_column(
+        TSVECTOR, Computed("to_tsvector('english', content)", persisted=True)
+    )
+
+    # sha256 of content; re-ingestion diffs on this to skip unchanged chunks
+    content_hash: Mapped[str | None] = mapped_column(
+        String(64), nullable=True
+    )
+
     document: Mapped["Document"] = relationship(back_populates="chunks")
 
 
+# Upload dedup: "has this user already uploaded this exact file?"
+document_content_hash_index = Index(
+    "ix_documents_user_id_content_hash",
+    Document.user_id,
+    Document.content_hash,
+)
+
+
+# GIN index for the full-text half of hybrid retrieval
+chunk_content_tsv_index = Index(
+    "ix_chunks_content_tsv",
+    Chunk.content_tsv,
+    postgresql_using="gin",
+)
+
+
+# Per-document lookups (re-ingestion diff, failure cleanup) in chunk order
+chunk_document_index = Index(
+    "ix_chunks_document_id_chunk_index",
+    Chunk.document_id,
+    Chunk.chunk_index,
+)
+
+
 # HNSW index for fast cosine similarity search
 chunk_embedding_index = Index(
     "ix_chunks_embedding_hnsw",
@@ -84,6 +123,27 @@ chunk_embedding_index = Index(
 )
 
 
+class UserChunkCount(Base):
+    """
+    Chunks stored per user, refreshed after each ingest. Retrieval reads it to
+    pick a search strategy by tenant size without counting on the hot path.
+    """
+
+    __tablename__ = "user_chunk_counts"
+
+    user_id: Mapped[str] = mapped_column(
+        String(50), primary_key=True
+    )
+
+    chunk_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
+
+
 class Conversation(Base):
     __tablename__ = "conversations"
 
@@ -264,6 +264,7 @@ async def chat_stream(
                 model=body.model or settings.chat_model,
                 is_guest=user.is_guest,
                 effort=body.effort,
+                conversation_id=str(conversation.id),
             ):
                 event_type = agent_event["type"]
 
@@ -297,6 +298,7 @@ async def chat_stream(
                             "id": agent_event["id"],
                             "name": agent_event["name"],
                             "error": agent_event["error"],
+                            "code": agent_event["code"],
                         }),
                     }
                 elif event_type == "assistant_message":
@@ -1,7 +1,6 @@
-import os
 import uuid
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -11,38 +10,82 @@ from app.database import get_db
 from app.auth import get_current_user_id
 from app.models import Document
 from app.schemas import DocumentResponse
-from app.services.storage import save_file
+from app.services.storage import delete_file, save_stream
+from app.services.upload_stream import MultipartFileStream
 
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 
 
-@router.post("/upload", response_model=DocumentResponse)
+# The file field is read by hand (MultipartFileStream), so describe it for the docs.
+_PDF_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+async def _stream_pdf_upload(request: Request, user_id: str) -> tuple[MultipartFileStream, str, str]:
+    """
+    Pipe the request's PDF straight into storage, hashing it on the way.
+
+    Returns (upload, file_key, storage_path). Nothing is buffered beyond one
+    storage part, and an oversize upload is cut off with a 413 as soon as it
+    crosses max_upload_bytes (storage discards what was written).
+    """
+    upload = MultipartFileStream(request, max_bytes=settings.max_upload_bytes)
+    filename = await upload.start()
+    if not filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported.")
+
+    file_key = f"{user_id}/{uuid.uuid4()}.pdf"
+    storage_path = await save_stream(file_key, upload.chunks())
+    return upload, file_key, storage_path
+
+
+@router.post("/upload", response_model=DocumentResponse, openapi_extra=_PDF_UPLOAD_BODY)
 @limiter.limit("5/minute")
 async def upload_document(
     request: Request,
-    file: UploadFile = File(...),
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    """Upload a PDF document for background ingestion."""
-    if not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Only PDF files are supported.")
+    """
+    Upload a PDF document for background ingestion.
 
-    # Save file
-    file_id = str(uuid.uuid4())
-    file_key = f"{user_id}/{file_id}.pdf"
-    content = await file.read()
-    storage_path = save_file(content, file_key)
+    If this user already uploaded the exact same file (same content hash), the
+    existing document is returned and the new copy is discarded.
+    """
+    upload, file_key, storage_path = await _stream_pdf_upload(request, user_id)
 
-    
+    result = await db.execute(
+        select(Document).where(
+            Document.user_id == user_id,
+            Document.content_hash == upload.sha256,
+            Document.status != "failed",
+        ).limit(1)
+    )
+    existing = result.scalar_one_or_none()
+    if existing:
+        await delete_file(file_key)
+        return existing
 
     # Create document record immediately
     doc = Document(
         user_id=user_id,
-        filename=file.filename,
+        filename=upload.filename,
         storage_path=storage_path,
+        content_hash=upload.sha256,
         status="processing",
     )
     db.add(doc)
@@ -55,8 +98,82 @@ async def upload_document(
         "process_document",
         str(doc.id),
         file_key,
-        file.filename,
+        upload.filename,
+        user_id,
+    )
+
+    return doc
+
+
+@router.post("/{document_id}/reingest", response_model=DocumentResponse, openapi_extra=_PDF_UPLOAD_BODY)
+@limiter.limit("5/minute")
+async def reingest_document(
+    request: Request,
+    document_id: uuid.UUID,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Upload a revised PDF for an existing document.
+
+    Only chunks whose text changed are re-embedded; unchanged chunks keep
+    their embeddings. The document keeps its id, so citations stay valid.
+    """
+    result = await db.execute(
+        select(Document).where(
+            Document.id == document_id,
+            Document.user_id == user_id,
+        )
+    )
+    doc = result.scalar_one_or_none()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if doc.status == "processing":
+        raise HTTPException(status_code=409, detail="Document is still processing.")
+
+    upload, file_key, storage_path = await _stream_pdf_upload(request, user_id)
+
+    # Claim the document under a row lock: a concurrent re-ingest may have
+    # passed the check above during the upload, and two jobs diffing against
+    # the same old chunks would both insert the changed ones.
+    result = await db.execute(
+        select(Document)
+        .where(Document.id == document_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    doc = result.scalar_one_or_none()
+    if doc is None or doc.status == "processing":
+        await db.commit()  # releases the lock
+        await delete_file(file_key)
+        if doc is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        raise HTTPException(status_code=409, detail="Document is still processing.")
+    if upload.sha256 == doc.content_hash and doc.status != "failed":
+        # Byte-identical revision: nothing to re-ingest.
+        await db.commit()
+        await delete_file(file_key)
+        return doc
+
+    # storage_path and content_hash move to the new revision when the job
+    # succeeds; until then they still describe the chunks being served, and
+    # a failed job puts back the status they had.
+    previous_status = doc.status
+    doc.status = "processing"
+    await db.commit()
+    await db.refresh(doc)
+
+    redis_pool = request.app.state.redis_pool
+    await redis_pool.enqueue_job(
+        "process_document",
+        str(doc.id),
+        file_key,
+        doc.filename,
         user_id,
+        reingest=True,
+        storage_path=storage_path,
+        content_hash=upload.sha256,
+        previous_status=previous_status,
     )
 
     return doc
@@ -1,6 +1,9 @@
+import asyncio
 import json
 import logging
+import time
 from collections.abc import AsyncGenerator
+from dataclasses import replace
 from typing import Any
 
 from litellm import acompletion
@@ -8,10 +11,11 @@ from openai import AsyncOpenAI
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings, model_supports_tools, provider_for_model
+from app.database import async_session
 from app.services.critic import _actor_critic, RESPONSES_API_MODELS
 from app.services.llm import normalize_ollama_url
 from app.tools import get_tool, get_tool_schemas
-from app.tools.base import ToolContext
+from app.tools.base import Tool, ToolContext
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +52,10 @@ GUEST_ALLOWED_TOOLS: frozenset[str] = frozenset(
     # memory_save excluded — guests cannot persist memories
 )
 
+# Read-only tools whose arguments are a short query: run_agent may start them
+# while the model is still streaming the rest of its turn.
+SPECULATIVE_TOOLS: frozenset[str] = frozenset({"document_search", "memory_search"})
+
 
 def _to_responses_input(messages: list[dict]) -> list[dict]:
     """Convert standard chat-completion messages to Responses API input format."""
@@ -95,6 +103,158 @@ def _to_responses_tools(tool_schemas: list[dict]) -> list[dict]:
     ]
 
 
+async def _call_tool(tool: Tool, ctx: ToolContext, args: dict) -> str:
+    if not tool.uses_db:
+        return await tool.execute(ctx, args)
+    # Never the request session: the call may run alongside others, and a
+    # timeout cancels it mid-query, after which the chat router still
+    # flushes and commits the request session. A cancelled call's own
+    # session is rolled back and closed on the way out.
+    async with async_session() as db:
+        result = await tool.execute(replace(ctx, db=db), args)
+        await db.commit()
+        return result
+
+
+def _turn_deadline(effort: str) -> float:
+    """The time.monotonic() by which a chat turn at this effort level should finish."""
+    budget = {
+        "fast": settings.agent_turn_budget_fast_seconds,
+        "thorough": settings.agent_turn_budget_thorough_seconds,
+    }.get(effort, settings.agent_turn_budget_balanced_seconds)
+    return time.monotonic() + budget
+
+
+def _tool_budget(deadline: float) -> float:
+    """Seconds a tool starting now may take: its share of the turn, capped per tool."""
+    remaining = deadline - time.monotonic() - settings.agent_answer_reserve_seconds
+    return min(settings.agent_tool_timeout_seconds, remaining)
+
+
+async def _run_tool_call(
+    ctx: ToolContext,
+    name: str,
+    args_raw: str,
+    limit: asyncio.Semaphore,
+    deadline: float,
+) -> tuple[str, str | None]:
+    """
+    Execute one tool call. Returns (result, error code); the code is None on
+    success; otherwise the result is the error text. Never raises.
+    """
+    try:
+        args = json.loads(args_raw) if args_raw else {}
+    except json.JSONDecodeError as e:
+        logger.error(f"{name}: Invalid tool arguments: {e}")
+        return f"Invalid tool arguments: {e}", "invalid_arguments"
+    try:
+        tool = get_tool(name)
+    except KeyError:
+        return f"Error: Unknown tool '{name}'", "unknown_tool"
+
+    async with limit:
+        timeout = _tool_budget(deadline)  # measured at start: queued calls get less
+        if timeout <= 0:
+            logger.warning(f"Tool {name} skipped: turn time budget spent")
+            return (
+                f"Error: {name} was not run because this turn's time budget is spent. "
+                "Answer with the information you already have.",
+                "budget_exhausted",
+            )
+        try:
+            return await asyncio.wait_for(_call_tool(tool, ctx, args), timeout), None
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {name} timed out after {timeout:.1f}s")
+            return (
+                f"Error: {name} timed out after {timeout:.3g}s and was cancelled. "
+                "Continue without its result.",
+                "timeout",
+            )
+        except Exception as e:
+            logger.error(f"Tool {name} failed: {e}", exc_info=True)
+            return f"Error: {str(e)}", "tool_failed"
+
+
+def _parsed_args(args_raw: str) -> dict | None:
+    """The arguments as a dict once the streamed JSON is complete, else None."""
+    if not args_raw.rstrip().endswith("}"):
+        return None
+    try:
+        args = json.loads(args_raw)
+    except json.JSONDecodeError:
+        return None
+    return args if isinstance(args, dict) else None
+
+
+# A tool call started before the model's turn finished streaming:
+# (name, arguments it was started with, running _run_tool_call task).
+_Prefetch = tuple[str, str, asyncio.Task]
+
+
+def _prefetch_tool_call(
+    ctx: ToolContext, name: str, args_raw: str, limit: asyncio.Semaphore, deadline: float
+) -> _Prefetch:
+    task = asyncio.create_task(_run_tool_call(ctx, name, args_raw, limit, deadline))
+    return name, args_raw, task
+
+
+async def _execute_tool_calls(
+    ctx: ToolContext,
+    calls: list[tuple[str, str, str]],
+    deadline: float,
+    limit: asyncio.Semaphore | None = None,
+    prefetched: dict[int, _Prefetch] | None = None,
+) -> AsyncGenerator[dict, None]:
+    """
+    Run the (id, name, arguments) tool calls of one model turn concurrently.
+
+    A turn that searches the web, reads a URL and searches documents pays for
+    the slowest call rather than the sum. At most agent_max_parallel_tools run
+    at once, each cancelled when its share of the turn's deadline runs out
+    (see _tool_budget). Events keep the order of the calls whatever order they finish in:
+    every tool_call_start first, then each call's tool_call_result (or
+    tool_call_error) and tool_message as soon as it and all earlier calls are
+    done, so persisted tool messages always follow the assistant's tool_calls.
+
+    `prefetched` maps positions in `calls` to calls already started while
+    the model streamed. One is used only if its name and arguments match the
+    final call; otherwise it is cancelled and the call runs afresh.
+    """
+    for call_id, name, args_raw in calls:
+        yield {"type": "tool_call_start", "id": call_id, "name": name, "arguments": args_raw}
+
+    limit = limit or asyncio.Semaphore(settings.agent_max_parallel_tools)
+    prefetched = dict(prefetched or {})
+    tasks = []
+    for position, (_, name, args_raw) in enumerate(calls):
+        early = prefetched.pop(position, None)
+        if early is not None:
+            early_name, early_args, task = early
+            if early_name == name and _parsed_args(early_args) == _parsed_args(args_raw):
+                tasks.append(task)
+                continue
+            logger.info(f"Prefetched {early_name} call changed before the turn ended; discarding it")
+            task.cancel()
+        tasks.append(
+            asyncio.create_task(_run_tool_call(ctx, name, args_raw, limit, deadline))
+        )
+    for _, _, task in prefetched.values():  # positions with no final call
+        task.cancel()
+
+    try:
+        for (call_id, name, _), task in zip(calls, tasks):
+            result, code = await task
+            if code:
+                yield {"type": "tool_call_error", "id": call_id, "name": name, "error": result, "code": code}
+            else:
+                yield {"type": "tool_call_result", "id": call_id, "name": name, "result": result}
+            yield {"type": "tool_message", "tool_call_id": call_id, "content": result}
+    finally:
+        # The consumer went away (client disconnect): don't leave tools running.
+        for task in tasks:
+            task.cancel()
+
+
 async def _run_responses_agent(
     db: AsyncSession,
     user_id: str,
@@ -104,21 +264,28 @@ async def _run_responses_agent(
     model: str,
     is_guest: bool = False,
     effort: str = "balanced",
+    conversation_id: str | None = None,
 ) -> AsyncGenerator[dict, None]:
     """Agent loop using the OpenAI Responses API (for gpt-5-nano and similar)."""
     client = AsyncOpenAI(api_key=api_key)
-    ctx = ToolContext(user_id=user_id, db=db, is_guest=is_guest)
+    ctx = ToolContext(user_id=user_id, db=db, is_guest=is_guest, conversation_id=conversation_id)
+    deadline = _turn_deadline(effort)
 
     consecutive_tool_only_iterations = 0
     for iteration in range(settings.agent_max_iterations):
         logger.info(f"Responses API iteration {iteration + 1}/{settings.agent_max_iterations}")
 
+        # Turn budget spent: no more tools, the model must answer now.
+        tools_allowed = _tool_budget(deadline) > 0
+        if not tools_allowed and responses_tools:
+            logger.warning("Responses API: turn time budget spent — withholding tools")
+
         try:
             _effort_map = {"fast": "low", "balanced": "medium", "thorough": "high"}
             stream = await client.responses.create(
                 model=model,
                 input=input_messages,
-                tools=responses_tools,
+                tools=responses_tools if tools_allowed else [],
                 reasoning={"effort": _effort_map.get(effort, "medium"), "summary": "auto"},
                 include=["reasoning.encrypted_content"],
                 store=True,
@@ -245,36 +412,16 @@ async def _run_responses_agent(
                 "arguments": tc["arguments"],
             })
 
-        # Execute tools and add results
-        for call_id, tc in pending_calls.items():
-            tc_name = tc["name"]
-            tc_args_raw = tc["arguments"]
-
-            yield {"type": "tool_call_start", "id": call_id, "name": tc_name, "arguments": tc_args_raw}
-
-            try:
-                tc_args = json.loads(tc_args_raw) if tc_args_raw else {}
-            except json.JSONDecodeError as e:
-                tool_result = f"Invalid tool arguments: {e}"
-                yield {"type": "tool_call_error", "id": call_id, "name": tc_name, "error": tool_result}
-                input_messages.append({"type": "function_call_output", "call_id": call_id, "output": tool_result})
-                yield {"type": "tool_message", "tool_call_id": call_id, "content": tool_result}
-                continue
-
-            try:
-                tool = get_tool(tc_name)
-                tool_result = await tool.execute(ctx, tc_args)
-                yield {"type": "tool_call_result", "id": call_id, "name": tc_name, "result": tool_result}
-            except KeyError:
-                tool_result = f"Error: Unknown tool '{tc_name}'"
-                yield {"type": "tool_call_error", "id": call_id, "name": tc_name, "error": tool_result}
-            except Exception as e:
-                logger.error(f"Tool {tc_name} failed: {e}", exc_info=True)
-                tool_result = f"Error: {str(e)}"
-                yield {"type": "tool_call_error", "id": call_id, "name": tc_name, "error": tool_result}
-
-            input_messages.append({"type": "function_call_output", "call_id": call_id, "output": tool_result})
-            yield {"type": "tool_message", "tool_call_id": call_id, "content": tool_result}
+        # Execute tools (concurrently) and add results
+        calls = [(call_id, tc["name"], tc["arguments"]) for call_id, tc in pending_calls.items()]
+        async for event in _execute_tool_calls(ctx, calls, deadline):
+            if event["type"] == "tool_message":
+                input_messages.append({
+                    "type": "function_call_output",
+                    "call_id": event["tool_call_id"],
+                    "output": event["content"],
+                })
+            yield event
 
         # Nudge: after 5 consecutive tool-only iterations, prompt for synthesis
         if pending_calls and not accumulated_text.strip():
@@ -331,6 +478,7 @@ async def run_agent(
     model: str | None = None,
     is_guest: bool = False,
     effort: str = "balanced",  # "fast" skips critique; "balanced"/"thorough" trigger it (AGT-04)
+    conversation_id: str | None = None,
 ) -> AsyncGenerator[dict, None]:
     """
     Run the agent loop for a single user message.
@@ -343,7 +491,10 @@ async def run_agent(
       - {"type": "token", "content": str}          — a streaming text token
       - {"type": "tool_call_start", "id": str, "name": str, "arguments": str}
       - {"type": "tool_call_result", "id": str, "name": str, "result": str}
-      - {"type": "tool_call_error", "id": str, "name": str, "error": str}
+      - {"type": "tool_call_error", "id": str, "name": str, "error": str, "code": str}
+            — code is one of invalid_arguments, unknown_tool, tool_failed,
+              timeout (cancelled after its share of the turn budget) or
+              budget_exhausted (not run: the turn's budget was already spent)
       - {"type": "assistant_message", "content": str, "tool_calls": list | None}
             — full assistant message to persist to DB (emitted before each iteration ends)
       - {"type": "tool_message", "tool_call_id": str, "content": str}
@@ -359,6 +510,8 @@ async def run_agent(
         user_message: The user's new message
         conversation_history: Prior messages in OpenAI format
         api_key: User's API key (from BYOK), None to use system default
+        effort: Also picks the turn's latency budget (agent_turn_budget_*_seconds)
+        conversation_id: Lets tools keep per-conversation state (python_executor's sandbox)
     """
     # Build the initial message list. System prompt (+ injected memories) first,
     # then history, then the new user message.
@@ -401,24 +554,32 @@ async def run_agent(
         input_messages = _to_responses_input(messages)
         responses_tools = _to_responses_tools(tool_schemas) if model_supports_tools(resolved_model) else []
         async for event in _run_responses_agent(
-            db, user_id, input_messages, responses_tools, resolved_api_key, resolved_model, is_guest, effort
+            db, user_id, input_messages, responses_tools, resolved_api_key, resolved_model, is_guest, effort,
+            conversation_id,
         ):
             yield event
         return
 
     # Build tool context — passed to every tool execution
-    ctx = ToolContext(user_id=user_id, db=db, is_guest=is_guest)
+    ctx = ToolContext(user_id=user_id, db=db, is_guest=is_guest, conversation_id=conversation_id)
+    # Latency budget for the whole turn; tool calls get slices of it.
+    deadline = _turn_deadline(effort)
 
     is_ollama = resolved_model.startswith("ollama/")
     consecutive_tool_only_iterations = 0
     for iteration in range(settings.agent_max_iterations):
         logger.info(f"Agent iteration {iteration + 1}/{settings.agent_max_iterations}")
 
+        # Turn budget spent: no more tools, the model must answer now.
+        tools_allowed = model_supports_tools(resolved_model) and _tool_budget(deadline) > 0
+        if not tools_allowed and model_supports_tools(resolved_model):
+            logger.warning("litellm agent: turn time budget spent — withholding tools")
+
         try:
             response = await acompletion(
                 model=resolved_model,
                 messages=messages,
-                tools=tool_schemas if model_supports_tools(resolved_model) else None,
+                tools=tool_schemas if tools_allowed else None,
                 api_key="" if is_ollama else resolved_api_key,
                 api_base=normalize_ollama_url(resolved_api_key) if is_ollama else None,
                 max_tokens=600 if effort == "fast" else 1500,
@@ -434,47 +595,72 @@ async def run_agent(
         accumulated_tool_calls: dict[int, dict] = {}
         # Keyed by index because tool calls arrive as deltas with an index field.
 
-        async for chunk in response:
-            if chunk is None:
-                break
-            delta = chunk.choices[0].delta
-
-            # Handle text content — stream it to the frontend as it arrives
-            if delta.content:
-                accumulated_text += delta.content
-                yield {"type": "token", "content": delta.content}
-
-            # Handle tool call deltas — accumulate them
-            if delta.tool_calls:
-                for tc_delta in delta.tool_calls:
-                    idx = tc_delta.index
-
-                    # First chunk for this tool call — initialize the accumulator
-                    if idx not in accumulated_tool_calls:
-                        accumulated_tool_calls[idx] = {
-                            "id": tc_delta.id or "",
-                            "type": "function",
-                            "function": {
-                                "name": (tc_delta.function.name
-                                         if tc_delta.function else "") or "",
-                                "arguments": "",
-                            },
-                        }
+        # Speculative prefetch: a SPECULATIVE_TOOLS call starts as soon as its
+        # arguments parse, overlapping it with the rest of the model's output.
+        # Also keyed by stream index; the final arguments decide whether the
+        # early result is used (see _execute_tool_calls).
+        limit = asyncio.Semaphore(settings.agent_max_parallel_tools)
+        prefetched: dict[int, _Prefetch] = {}
+        speculate = tools_allowed and settings.agent_speculative_tools
 
-                    # Subsequent chunks may carry the ID, name, or arguments.
-                    # The SSE protocol splits JSON arguments across multiple chunks,
-                    # so we concatenate them.
-                    if tc_delta.id:
-                        accumulated_tool_calls[idx]["id"] = tc_delta.id
-                    if tc_delta.function:
-                        if tc_delta.function.name:
-                            accumulated_tool_calls[idx]["function"]["name"] = (
-                                tc_delta.function.name
-                            )
-                        if tc_delta.function.arguments:
-                            accumulated_tool_calls[idx]["function"]["arguments"] += (
-                                tc_delta.function.arguments
+        try:
+            async for chunk in response:
+                if chunk is None:
+                    break
+                delta = chunk.choices[0].delta
+
+                # Handle text content — stream it to the frontend as it arrives
+                if delta.content:
+                    accumulated_text += delta.content
+                    yield {"type": "token", "content": delta.content}
+
+                # Handle tool call deltas — accumulate them
+                if delta.tool_calls:
+                    for tc_delta in delta.tool_calls:
+                        idx = tc_delta.index
+
+                        # First chunk for this tool call — initialize the accumulator
+                        if idx not in accumulated_tool_calls:
+                            accumulated_tool_calls[idx] = {
+                                "id": tc_delta.id or "",
+                                "type": "function",
+                                "function": {
+                                    "name": (tc_delta.function.name
+                                             if tc_delta.function else "") or "",
+                                    "arguments": "",
+                                },
+                            }
+
+                        # Subsequent chunks may carry the ID, name, or arguments.
+                        # The SSE protocol splits JSON arguments across multiple chunks,
+                        # so we concatenate them.
+                        if tc_delta.id:
+                            accumulated_tool_calls[idx]["id"] = tc_delta.id
+                        if tc_delta.function:
+                            if tc_delta.function.name:
+                                accumulated_tool_calls[idx]["function"]["name"] = (
+                                    tc_delta.function.name
+                                )
+                            if tc_delta.function.arguments:
+                                accumulated_tool_calls[idx]["function"]["arguments"] += (
+                                    tc_delta.function.arguments
+                                )
+
+                if speculate and delta.tool_calls:
+                    for idx in {tc_delta.index for tc_delta in delta.tool_calls}:
+                        call = accumulated_tool_calls[idx]["function"]
+                        if (
+                            idx not in prefetched
+                            and call["name"] in SPECULATIVE_TOOLS
+                            and _parsed_args(call["arguments"]) is not None
+                        ):
+                            prefetched[idx] = _prefetch_tool_call(
+                                ctx, call["name"], call["arguments"], limit, deadline
                             )
+        except BaseException:
+            for _, _, task in prefetched.values():
+                task.cancel()
+            raise
 
         # Stream is done for this iteration. Now decide: is the agent finished,
         # or does it need to execute tools and loop again?
@@ -516,101 +702,45 @@ async def run_agent(
         # endpoint can save it to the DB.
         tool_calls_list = [accumulated_tool_calls[i] for i in sorted(accumulated_tool_calls)]
 
-        yield {
-            "type": "assistant_message",
-            "content": accumulated_text,
-            "tool_calls": tool_calls_list,
-        }
-
-        # Also append to the in-memory message list so the LLM sees it
-        # on the next iteration.
-        messages.append({
-            "role": "assistant",
-            "content": accumulated_text,
-            "tool_calls": tool_calls_list,
-        })
-
-        # Execute each tool call and collect results
-        for tc in tool_calls_list:
-            tc_id = tc["id"]
-            tc_name = tc["function"]["name"]
-            tc_args_raw = tc["function"]["arguments"]
-
-            # Signal tool call start to the frontend
+        # Prefetched calls belong to _execute_tool_calls only once it awaits
+        # them; if the consumer goes away before that (at any yield below),
+        # cancel them here. Cancelling a finished task is a no-op.
+        try:
             yield {
-                "type": "tool_call_start",
-                "id": tc_id,
-                "name": tc_name,
-                "arguments": tc_args_raw,
+                "type": "assistant_message",
+                "content": accumulated_text,
+                "tool_calls": tool_calls_list,
             }
 
-            # Parse arguments (they come as a JSON string)
-            try:
-                tc_args = json.loads(tc_args_raw) if tc_args_raw else {}
-            except json.JSONDecodeError as e:
-                error_msg = f"Invalid tool arguments: {e}"
-                logger.error(f"{tc_name}: {error_msg}")
-                yield {
-                    "type": "tool_call_error",
-                    "id": tc_id,
-                    "name": tc_name,
-                    "error": error_msg,
-                }
-                # Append error as the tool result so the LLM can react
-                tool_result = error_msg
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tc_id,
-                    "content": tool_result,
-                })
-                yield {
-                    "type": "tool_message",
-                    "tool_call_id": tc_id,
-                    "content": tool_result,
-                }
-                continue
-
-            # Look up and execute the tool
-            try:
-                tool = get_tool(tc_name)
-                tool_result = await tool.execute(ctx, tc_args)
-                yield {
-                    "type": "tool_call_result",
-                    "id": tc_id,
-                    "name": tc_name,
-                    "result": tool_result,
-                }
-            except KeyError:
-                tool_result = f"Error: Unknown tool '{tc_name}'"
-                yield {
-                    "type": "tool_call_error",
-                    "id": tc_id,
-                    "name": tc_name,
-                    "error": tool_result,
-                }
-            except Exception as e:
-                logger.error(f"Tool {tc_name} failed: {e}", exc_info=True)
-                tool_result = f"Error: {str(e)}"
-                yield {
-                    "type": "tool_call_error",
-                    "id": tc_id,
-                    "name": tc_name,
-                    "error": tool_result,
-                }
-
-            # Append tool result to messages for the next LLM iteration
+            # Also append to the in-memory message list so the LLM sees it
+            # on the next iteration.
             messages.append({
-                "role": "tool",
-                "tool_call_id": tc_id,
-                "content": tool_result,
+                "role": "assistant",
+                "content": accumulated_text,
+                "tool_calls": tool_calls_list,
             })
 
-            # Signal the tool result to persist
-            yield {
-                "type": "tool_message",
-                "tool_call_id": tc_id,
-                "content": tool_result,
-            }
+            # Execute the tool calls (concurrently) and collect results. Events
+            # come back in tool_calls order: tool_call_start for every call, then
+            # each call's result/error and the tool message to persist.
+            calls = [
+                (tc["id"], tc["function"]["name"], tc["function"]["arguments"])
+                for tc in tool_calls_list
+            ]
+            positions = {index: position for position, index in enumerate(sorted(accumulated_tool_calls))}
+            early = {positions[index]: p for index, p in prefetched.items()}
+            async for event in _execute_tool_calls(ctx, calls, deadline, limit, early):
+                if event["type"] == "tool_message":
+                    # Append tool result to messages for the next LLM iteration
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": event["tool_call_id"],
+                        "content": event["content"],
+                    })
+                yield event
+        finally:
+            for _, _, task in prefetched.values():
+                task.cancel()
 
         # Nudge: after 5 consecutive tool-only iterations, prompt for synthesis
         if accumulated_tool_calls and not accumulated_text.strip():
@@ -0,0 +1,179 @@
+"""
+Bulk write path for vector tables (chunks, memories) via binary COPY.
+
+The ORM path builds one unit-of-work object per row and sends each embedding
+as a ~20 KB text literal that Postgres has to parse back into floats. Here
+rows are encoded straight into Postgres' binary COPY format — pgvector's
+binary `vector` representation is a 4-byte header followed by big-endian
+float32s — and streamed through asyncpg's copy_to_table in one round trip.
+
+The encoding is done by hand rather than by registering pgvector's asyncpg
+codec, because that codec is connection-wide and would change how every
+other query on a pooled connection binds its `str(embedding)` parameters.
+"""
+import struct
+import uuid
+from collections.abc import Callable, Sequence
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack("!h", -1)
+_NULL_FIELD = struct.pack("!i", -1)
+_PG_EPOCH = datetime(2000, 1, 1)
+
+
+def _encode_uuid(value: uuid.UUID) -> bytes:
+    return value.bytes
+
+
+def _encode_text(value: str) -> bytes:
+    return value.encode("utf-8")
+
+
+def _encode_int4(value: int) -> bytes:
+    return struct.pack("!i", value)
+
+
+def _encode_bool(value: bool) -> bytes:
+    return b"\x01" if value else b"\x00"
+
+
+def _encode_timestamp(value: datetime) -> bytes:
+    """`timestamp without time zone`: int64 microseconds since 2000-01-01."""
+    delta = value - _PG_EPOCH
+    micros = (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return struct.pack("!q", micros)
+
+
+def _encode_vector(value: Sequence[float]) -> bytes:
+    """pgvector binary format: uint16 dim, uint16 unused, dim x float32 (big-endian)."""
+    arr = np.asarray(value, dtype=">f4")
+    return struct.pack("!HH", arr.shape[0], 0) + arr.tobytes()
+
+
+Encoder = Callable[[Any], bytes]
+
+
+def encode_copy_binary(rows: Sequence[Sequence[Any]], encoders: Sequence[Encoder]) -> bytes:
+    """Encode rows as a complete PGCOPY binary stream. None encodes as NULL."""
+    field_count = struct.pack("!h", len(encoders))
+    parts = [_PGCOPY_HEADER]
+    for row in rows:
+        parts.append(field_count)
+        for value, encode in zip(row, encoders):
+            if value is None:
+                parts.append(_NULL_FIELD)
+            else:
+                data = encode(value)
+                parts.append(struct.pack("!i", len(data)))
+                parts.append(data)
+    parts.append(_PGCOPY_TRAILER)
+    return b"".join(parts)
+
+
+async def copy_rows(
+    db: AsyncSession,
+    table: str,
+    columns: Sequence[str],
+    encoders: Sequence[Encoder],
+    rows: Sequence[Sequence[Any]],
+) -> None:
+    """
+    COPY rows into `table` on the session's connection, inside its transaction.
+
+    Nothing is committed here; the caller decides when to commit.
+    """
+    if not rows:
+        return
+
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    pg = raw.driver_connection
+    # The asyncpg adapter opens its transaction lazily on the first statement.
+    # COPY goes straight to the driver, so make sure that transaction exists —
+    # otherwise the rows would autocommit outside the session's control.
+    if not pg.is_in_transaction():
+        await conn.execute(text("SELECT 1"))
+
+    await pg.copy_to_table(
+        table,
+        source=encode_copy_binary(rows, encoders),
+        columns=list(columns),
+        format="binary",
+    )
+
+
+CHUNK_COLUMNS = ("id", "document_id", "user_id", "content", "chunk_index", "embedding", "content_hash")
+_CHUNK_ENCODERS = (
+    _encode_uuid, _encode_uuid, _encode_text, _encode_text, _encode_int4, _encode_vector, _encode_text,
+)
+
+MEMORY_COLUMNS = (
+    "id", "user_id", "category", "content", "embedding", "source_conversation_id",
+    "is_active", "edited_by_user", "created_at", "updated_at",
+)
+_MEMORY_ENCODERS = (
+    _encode_uuid, _encode_text, _encode_text, _encode_text, _encode_vector, _encode_uuid,
+    _encode_bool, _encode_bool, _encode_timestamp, _encode_timestamp,
+)
+
+
+async def copy_chunks(db: AsyncSession, rows: Sequence[dict]) -> None:
+    """
+    Bulk-insert chunk rows. Each dict has document_id, user_id, content,
+    chunk_index, embedding and content_hash; ids are generated here like the
+    ORM default.
+    """
+    await copy_rows(
+        db,
+        "chunks",
+        CHUNK_COLUMNS,
+        _CHUNK_ENCODERS,
+        [
+            (
+                uuid.uuid4(),
+                r["document_id"],
+                r["user_id"],
+                r["content"],
+                r["chunk_index"],
+                r["embedding"],
+                r["content_hash"],
+            )
+            for r in rows
+        ],
+    )
+
+
+async def copy_memories(db: AsyncSession, rows: Sequence[dict]) -> None:
+    """
+    Bulk-insert memory rows. Each dict has user_id, category, content,
+    embedding and source_conversation_id; the remaining columns get the same
+    values the ORM defaults would.
+    """
+    now = datetime.utcnow()
+    await copy_rows(
+        db,
+        "memories",
+        MEMORY_COLUMNS,
+        _MEMORY_ENCODERS,
+        [
+            (
+                uuid.uuid4(),
+                r["user_id"],
+                r["category"],
+                r["content"],
+                r["embedding"],
+                r["source_conversation_id"],
+                True,
+                False,
+                now,
+                now,
+            )
+            for r in rows
+        ],
+    )
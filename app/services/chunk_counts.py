@@ -0,0 +1,37 @@
+"""
+Per-user chunk counts, used by retrieval to choose a search strategy.
+
+Counts are recomputed from the chunks table in one short statement after an
+ingest commits, or chunks are deleted, rather than maintained row by row: a counter updated inside
+the ingest transaction would hold the user's row lock until that (possibly
+long) transaction commits and serialize concurrent uploads by the same user.
+Retrieval only needs the order of magnitude, so a count that lags an
+in-flight ingest is fine. A count left nonzero after the chunks are gone is
+not: guests would keep paying for a SQL search of nothing (retrieval._seed_scope).
+"""
+from collections.abc import Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def refresh_chunk_count(db: AsyncSession, user_id: str) -> None:
+    """Recount one user's chunks (caller commits)."""
+    await db.execute(
+        text("""
+            INSERT INTO user_chunk_counts (user_id, chunk_count, updated_at)
+            SELECT :user_id, count(*), now() FROM chunks WHERE user_id = :user_id
+            ON CONFLICT (user_id) DO UPDATE
+            SET chunk_count = EXCLUDED.chunk_count, updated_at = EXCLUDED.updated_at
+        """),
+        {"user_id": user_id},
+    )
+
+
+async def get_chunk_count(db: AsyncSession, user_ids: Sequence[str]) -> int:
+    """Total chunks across the given users (0 for users never counted)."""
+    result = await db.execute(
+        text("SELECT coalesce(sum(chunk_count), 0) FROM user_chunk_counts WHERE user_id = ANY(:user_ids)"),
+        {"user_ids": list(user_ids)},
+    )
+    return int(result.scalar() or 0)
@@ -0,0 +1,226 @@
+"""
+Content-addressed embedding cache.
+
+An embedding is a pure function of (model, dimensions, text), so re-uploaded
+PDFs, boilerplate pages shared across resumes and repeated queries don't need
+another provider round-trip. Entries are keyed by sha256 of the text and live
+in two tiers:
+
+  - an in-process LRU (bounded entry count), checked first;
+  - Redis (shared by the API and worker, with a TTL), checked on LRU misses.
+
+Vectors are stored as float32 — the precision pgvector stores them at anyway —
+which keeps each 1536-dim entry at ~6 KB. Redis is an optimization, never a
+dependency: any Redis error is logged, counted, and treated as a miss, and the
+tier is skipped for a short cool-off so a dead Redis doesn't add latency to
+every call.
+
+Query embeddings get an extra, per-user tier on top (get_query / set_query):
+a TTL-bounded LRU keyed by (user, model, normalized query text), so an agent
+that repeats a document_search or memory_search within a conversation skips
+both the embedding round-trip and the BYOK key lookup.
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+import numpy as np
+import redis.asyncio as aioredis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# After a Redis error, skip the shared tier for this long.
+REDIS_COOLOFF_SECONDS = 30.0
+
+
+class LRUCache:
+    """Small ordered-dict LRU with an optional per-entry TTL (seconds)."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def cache_key(text: str, model: str | None = None, dimensions: int | None = None) -> str:
+    """Redis/LRU key for a text under the given (default: configured) model."""
+    model = model or settings.embedding_model
+    dimensions = dimensions or settings.embedding_dimensions
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"emb:{model}:{dimensions}:{digest}"
+
+
+def _to_bytes(vector: list[float]) -> bytes:
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+def _from_bytes(data: bytes) -> list[float]:
+    return np.frombuffer(data, dtype="<f4").tolist()
+
+
+_lru = LRUCache(settings.embedding_cache_lru_size)
+_redis: aioredis.Redis | None = None
+_redis_skip_until = 0.0
+_stats = {"lru_hits": 0, "redis_hits": 0, "misses": 0, "redis_errors": 0}
+
+
+def _get_redis() -> aioredis.Redis | None:
+    global _redis
+    if not settings.embedding_cache_redis_enabled or time.monotonic() < _redis_skip_until:
+        return None
+    if _redis is None:
+        _redis = aioredis.from_url(
+            settings.redis_url,
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5,
+        )
+    return _redis
+
+
+def _redis_failed(e: Exception) -> None:
+    global _redis_skip_until
+    _stats["redis_errors"] += 1
+    _redis_skip_until = time.monotonic() + REDIS_COOLOFF_SECONDS
+    logger.warning(f"Embedding cache Redis tier unavailable, skipping for {REDIS_COOLOFF_SECONDS:.0f}s: {e}")
+
+
+async def get_many(texts: list[str]) -> list[list[float] | None]:
+    """Look up each text; returns a vector or None per position."""
+    keys = [cache_key(t) for t in texts]
+    results: list[list[float] | None] = [_lru.get(k) for k in keys]
+    _stats["lru_hits"] += sum(r is not None for r in results)
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    client = _get_redis() if missing else None
+    if client is not None:
+        try:
+            raw = await client.mget([keys[i] for i in missing])
+        except Exception as e:  # noqa: BLE001 — cache must never fail the caller
+            _redis_failed(e)
+            raw = [None] * len(missing)
+        for i, data in zip(missing, raw):
+            if data is not None:
+                vector = _from_bytes(data)
+                results[i] = vector
+                _lru.set(keys[i], vector)
+                _stats["redis_hits"] += 1
+
+    _stats["misses"] += sum(r is None for r in results)
+    return results
+
+
+async def set_many(entries: dict[str, list[float]]) -> None:
+    """Store freshly computed embeddings (text -> vector) in both tiers."""
+    if not entries:
+        return
+    for text, vector in entries.items():
+        _lru.set(cache_key(text), vector)
+
+    client = _get_redis()
+    if client is None:
+        return
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for text, vector in entries.items():
+                pipe.set(cache_key(text), _to_bytes(vector), ex=settings.embedding_cache_ttl_seconds)
+            await pipe.execute()
+    except Exception as e:  # noqa: BLE001
+        _redis_failed(e)
+
+
+def stats() -> dict[str, float]:
+    """Hit/miss counters since process start (exposed at /metrics)."""
+    hits = _stats["lru_hits"] + _stats["redis_hits"]
+    lookups = hits + _stats["misses"]
+    return {
+        **_stats,
+        "lru_entries": len(_lru),
+        "lru_evictions": _lru.evictions,
+        "hit_rate": hits / lookups if lookups else 0.0,
+    }
+
+
+_query_lru = LRUCache(
+    settings.query_embedding_cache_size,
+    ttl_seconds=settings.query_embedding_cache_ttl_seconds,
+)
+_query_stats = {"hits": 0, "misses": 0}
+
+
+def _query_key(user_id: str, query: str) -> tuple[str, str, int, str]:
+    # Case and whitespace differences between repeated tool calls don't
+    # change what the user is looking for.
+    normalized = " ".join(query.casefold().split())
+    return (user_id, settings.embedding_model, settings.embedding_dimensions, normalized)
+
+
+def get_query(user_id: str, query: str) -> list[float] | None:
+    """Cached embedding for a search query issued by this user, if still fresh."""
+    vector = _query_lru.get(_query_key(user_id, query))
+    _query_stats["hits" if vector is not None else "misses"] += 1
+    return vector
+
+
+def set_query(user_id: str, query: str, vector: list[float]) -> None:
+    _query_lru.set(_query_key(user_id, query), vector)
+
+
+def query_stats() -> dict[str, float]:
+    """Query-cache counters since process start (exposed at /metrics)."""
+    lookups = _query_stats["hits"] + _query_stats["misses"]
+    return {
+        **_query_stats,
+        "entries": len(_query_lru),
+        "evictions": _query_lru.evictions,
+        "hit_rate": _query_stats["hits"] / lookups if lookups else 0.0,
+    }
+
+
+def clear() -> None:
+    """Drop the in-process tiers and reset counters (Redis is left alone)."""
+    for lru in (_lru, _query_lru):
+        lru.clear()
+        lru.evictions = 0
+    for counters in (_stats, _query_stats):
+        for k in counters:
+            counters[k] = 0
+
+
+async def aclose() -> None:
+    """Close the Redis client; called from app/worker shutdown."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
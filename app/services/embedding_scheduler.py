@@ -0,0 +1,186 @@
+"""
+Bounded-concurrency scheduler for embedding batches during ingestion.
+
+Ingestion produces embedding batches far faster than the provider answers
+them, so awaiting each batch in turn leaves most of the wall-clock time on the
+network. EmbeddingScheduler keeps up to `embedding_max_in_flight` batches
+outstanding, yields results in the order the batches were produced (so
+chunk_index stays aligned), and retries rate-limited calls with exponential
+backoff.
+
+Limits are per API key and shared by every ingestion running in the process:
+two documents uploaded under the same key draw from one concurrency pool and
+one tokens-per-minute budget, which is how the provider meters them. Given a
+cache lookup, only the texts that miss it are sent and charged to the budget.
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+from typing import TypeVar
+
+import litellm
+
+from app.config import settings
+from app.services.embedding_cache import LRUCache
+from app.services.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Backoff for 429s: base * 2**attempt seconds (with jitter), capped.
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 30.0
+
+T = TypeVar("T")
+
+Embed = Callable[[list[str]], Awaitable[list[list[float]]]]
+# Cached vectors for a batch, None per text that isn't cached.
+Lookup = Callable[[list[str]], Awaitable[list[list[float] | None]]]
+
+
+async def _aiter(items: Iterable[T] | AsyncIterable[T]) -> AsyncIterator[T]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute budget. Refills continuously at tokens_per_minute / 60
+    per second up to one minute's worth; acquire() waits until enough tokens
+    are available. A budget of 0 disables throttling.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: int) -> None:
+        if self.capacity <= 0:
+            return
+        # A single request larger than the whole budget can never fit; let it
+        # through once the bucket is full rather than waiting forever.
+        needed = min(float(tokens), self.capacity)
+        async with self._lock:  # FIFO: waiters are served in arrival order
+            self._refill()
+            while self.tokens < needed:
+                await asyncio.sleep((needed - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= needed
+
+
+class EmbeddingScheduler:
+    """Concurrency pool + token budget for one API key."""
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        tokens_per_minute: int,
+        max_retries: int,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._budget = TokenBucket(tokens_per_minute)
+
+    async def _embed_with_lookup(
+        self, batch: list[str], embed: Embed, lookup: Lookup | None
+    ) -> list[list[float]]:
+        """Embed a batch, sending only the distinct texts `lookup` can't serve."""
+        if lookup is None:
+            return await self._embed_with_retry(batch, embed)
+        cached = await lookup(batch)
+        missing = list(dict.fromkeys(t for t, v in zip(batch, cached) if v is None))
+        if not missing:
+            return cached
+        fresh = dict(zip(missing, await self._embed_with_retry(missing, embed)))
+        return [v if v is not None else fresh[t] for t, v in zip(batch, cached)]
+
+    async def _embed_with_retry(self, texts: list[str], embed: Embed) -> list[list[float]]:
+        tokens = sum(count_tokens(text) for text in texts)
+        attempt = 0
+        while True:
+            await self._budget.acquire(tokens)
+            async with self._semaphore:
+                try:
+                    return await embed(texts)
+                except litellm.RateLimitError:
+                    if attempt >= self.max_retries:
+                        raise
+            delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2**attempt)
+            delay *= random.uniform(0.5, 1.0)
+            attempt += 1
+            logger.warning(
+                f"Embedding batch rate-limited; retry {attempt}/{self.max_retries} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+    async def embed_batches(
+        self,
+        batches: Iterable[list[str]] | AsyncIterable[list[str]],
+        embed: Embed,
+        lookup: Lookup | None = None,
+    ) -> AsyncIterator[tuple[list[str], list[list[float]]]]:
+        """
+        Embed batches concurrently and yield (batch, embeddings) in input order.
+
+        At most max_in_flight batches are pulled from `batches` ahead of the
+        consumer, so memory stays bounded by a few batches. If the consumer
+        stops early or a batch fails, outstanding requests are cancelled.
+
+        With `lookup`, each batch is looked up first and `embed` gets only its
+        distinct misses; a batch that fully hits takes no slot and no tokens.
+        """
+        pending: deque[tuple[list[str], asyncio.Task]] = deque()
+        try:
+            async for batch in _aiter(batches):
+                task = asyncio.create_task(self._embed_with_lookup(batch, embed, lookup))
+                pending.append((batch, task))
+                if len(pending) >= self.max_in_flight:
+                    head, task = pending.popleft()
+                    yield head, await task
+            while pending:
+                head, task = pending.popleft()
+                yield head, await task
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+
+# Least recently used keys are dropped past embedding_scheduler_max_keys, so
+# BYOK users don't accumulate schedulers. An ingestion keeps the scheduler it
+# started with; only a key idle long enough to be evicted starts afresh.
+_schedulers = LRUCache(settings.embedding_scheduler_max_keys)
+
+
+def get_embedding_scheduler(api_key: str | None) -> EmbeddingScheduler:
+    """
+    Return the process-wide scheduler for an API key (None = system key).
+
+    Keyed by a hash so raw keys are not held as cache keys.
+    """
+    key = api_key or settings.openai_api_key
+    key_id = hashlib.sha256(key.encode()).hexdigest()
+    scheduler = _schedulers.get(key_id)
+    if scheduler is None:
+        scheduler = EmbeddingScheduler(
+            max_in_flight=settings.embedding_max_in_flight,
+            tokens_per_minute=settings.embedding_tokens_per_minute,
+            max_retries=settings.embedding_max_retries,
+        )
+        _schedulers.set(key_id, scheduler)
+    return scheduler
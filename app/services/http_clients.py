@@ -0,0 +1,71 @@
+"""
+Shared outbound HTTP clients for tools.
+
+A client per call (as web_search and url_reader used to make) pays DNS, TCP
+and TLS setup on every request and never reuses a connection. Instead there
+is one long-lived httpx.AsyncClient per upstream, created at API and worker
+startup and closed at shutdown:
+
+  - "tavily": web_search's API. Tavily's SDK writes its Authorization header
+    onto the client it is given, which is why no client is shared across
+    upstreams: the key must never ride along to an arbitrary URL.
+  - "jina":   url_reader's reader proxy.
+
+Each keeps up to http_max_keepalive_connections idle connections alive for
+http_keepalive_seconds, and opens at most http_max_connections, so the limits
+are per host. With http2_enabled, HTTP/2 is used where the server offers it
+and concurrent calls from one agent turn share a single multiplexed
+connection. That needs h2 (httpx[http2], pinned in uv.lock); without it
+client creation fails rather than quietly falling back to HTTP/1.1.
+
+Outside the app (scripts, tests) clients are created on first use.
+"""
+import logging
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+UPSTREAMS: dict[str, dict] = {
+    "tavily": {},
+    "jina": {"timeout": httpx.Timeout(20.0), "follow_redirects": True},
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _create(name: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=settings.http2_enabled,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_seconds,
+        ),
+        **UPSTREAMS[name],
+    )
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """The pooled client for an upstream in UPSTREAMS. Raises KeyError otherwise."""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _clients[name] = _create(name)
+    return client
+
+
+def start() -> None:
+    """Create every upstream's client (API lifespan / worker startup)."""
+    for name in UPSTREAMS:
+        get_client(name)
+    logger.info(f"HTTP clients ready: {', '.join(UPSTREAMS)} (http2={settings.http2_enabled})")
+
+
+async def aclose() -> None:
+    """Close all clients and their connections; called from app/worker shutdown."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -1,107 +1,284 @@
+import hashlib
 import os
 import re
 import uuid
 import logging
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from itertools import islice
+from typing import TypeVar
 
+import numpy as np
 import pymupdf
 from litellm import aembedding
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.models import Document, Chunk
+from app.models import Chunk, Document
+from app.services import embedding_cache
+from app.services.bulk_insert import copy_chunks
+from app.services.chunk_counts import refresh_chunk_count
+from app.services.embedding_scheduler import get_embedding_scheduler
 from app.services.llm import get_user_api_key
-from app.services.storage import get_local_path
+from app.services.pdf_extract import PdfSource, aiter_pdf_pages, pdf_page_count
+from app.services.storage import delete_file, file_key_for, open_pdf_source
 
 
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 logger = logging.getLogger(__name__)
 
+# Chunks per embedding request. OpenAI allows up to 2048, but be conservative.
+EMBEDDING_BATCH_SIZE = 100
+
+T = TypeVar("T")
+
+
+def iter_pdf_pages(pdf: pymupdf.Document) -> Iterator[str]:
+    """Yield the text of each page in order, so only one page is resident at a time."""
+    for page in pdf:
+        yield page.get_text()
+
 
 def extract_text_from_pdf(file_path: str) -> tuple[str, int]:
     """Extract all text from a PDF. Returns (text, page_count)."""
-    doc = pymupdf.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text() + "\n"
-    page_count = len(doc)
-    doc.close()
+    with pymupdf.open(file_path) as pdf:
+        text = "\n".join(iter_pdf_pages(pdf))
+        page_count = len(pdf)
     return text.strip(), page_count
 
 
+# Paragraphs are separated by blank lines.
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
 # Split a paragraph into sentences, keeping the terminator attached to each
 # sentence. Trailing text without a terminator is captured as a final sentence.
 _SENTENCE_RE = re.compile(r"\S.*?[.!?](?=\s|$)|\S.*?$", re.DOTALL)
 
+# Upper bound on the text carried between pages while waiting for a sentence
+# terminator. Only reached by pathological input (e.g. tables with no
+# punctuation), which the chunker hard-splits anyway.
+_MAX_CARRY_CHARS = 64_000
+
 
 def _split_sentences(paragraph: str) -> list[str]:
     """Split a paragraph into sentences (terminator kept on the sentence)."""
     return [m.group().strip() for m in _SENTENCE_RE.finditer(paragraph) if m.group().strip()]
 
 
+class SentenceSplitter:
+    """
+    Incremental sentence splitter: feed page texts in order, get back the
+    sentences known to be complete so far.
+
+    Produces the same sentences as splitting the newline-joined pages into
+    paragraphs and then sentences. Every sentence that is known to be complete
+    is returned as soon as its page is fed; only the trailing, possibly
+    unfinished sentence of a page is carried over and re-scanned with the next
+    page. Call finish() after the last page for whatever is still carried.
+    """
+
+    def __init__(self) -> None:
+        self._carry = ""
+
+    def feed(self, page: str) -> list[str]:
+        sentences: list[str] = []
+        paragraphs = _PARAGRAPH_RE.split(self._carry + page + "\n")
+        for paragraph in paragraphs[:-1]:
+            sentences.extend(_split_sentences(paragraph))
+
+        tail = paragraphs[-1]
+        matches = list(_SENTENCE_RE.finditer(tail))
+        if not matches:
+            self._carry = tail
+            return sentences
+        for match in matches[:-1]:
+            sentence = match.group().strip()
+            if sentence:
+                sentences.append(sentence)
+        self._carry = tail[matches[-1].start():]
+        if len(self._carry) > _MAX_CARRY_CHARS:
+            sentences.append(self._carry.strip())
+            self._carry = ""
+        return sentences
+
+    def finish(self) -> list[str]:
+        sentences = _split_sentences(self._carry)
+        self._carry = ""
+        return sentences
+
+
+def iter_sentences(pages: Iterable[str]) -> Iterator[str]:
+    """Stream sentences out of page texts without building the whole document."""
+    splitter = SentenceSplitter()
+    for page in pages:
+        yield from splitter.feed(page)
+    yield from splitter.finish()
+
+
 def _hard_split(sentence: str, chunk_size: int) -> list[str]:
     """Hard-split an oversize sentence on character count so chunking terminates."""
     return [sentence[i : i + chunk_size] for i in range(0, len(sentence), chunk_size)]
 
 
-def chunk_text(text: str, chunk_size: int, overlap: int) -> list[str]:
+class Chunker:
     """
-    Split text into overlapping chunks on sentence/paragraph boundaries.
-
-    Text is split into paragraphs (blank lines), then sentences. Sentences are
-    greedily packed into chunks up to chunk_size characters; each new chunk is
-    seeded with whole trailing sentences from the previous chunk totalling about
-    `overlap` characters, so chunks overlap without cutting mid-sentence. A
-    single sentence longer than chunk_size is hard-split on character count
-    (the only case where a chunk is cut mid-sentence), guaranteeing termination.
+    Incremental chunker: greedily packs a stream of sentences into
+    overlapping chunks.
+
+    Sentences are packed into chunks up to chunk_size characters; each new
+    chunk is seeded with whole trailing sentences from the previous chunk
+    totalling about `overlap` characters, so chunks overlap without cutting
+    mid-sentence. A single sentence longer than chunk_size is hard-split on
+    character count (the only case where a chunk is cut mid-sentence),
+    guaranteeing termination. Only the chunk being built is held in memory.
     """
-    # Flatten paragraphs into an ordered list of sentences.
-    sentences: list[str] = []
-    for paragraph in re.split(r"\n\s*\n", text):
-        sentences.extend(_split_sentences(paragraph))
-
-    chunks: list[str] = []
-    current: list[str] = []
-    current_len = 0  # length of " ".join(current)
-
-    def flush() -> list[str]:
-        """Emit the current chunk and return the whole-sentence overlap seed."""
-        if not current:
-            return []
-        chunks.append(" ".join(current))
-        # Carry whole trailing sentences totalling ~overlap chars into next chunk.
+
+    def __init__(self, chunk_size: int, overlap: int) -> None:
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self._current: list[str] = []
+        self._current_len = 0  # length of " ".join(self._current)
+
+    def _overlap_seed(self) -> list[str]:
+        """Whole trailing sentences of the current chunk totalling ~overlap chars."""
         seed: list[str] = []
         seed_len = 0
-        for sentence in reversed(current):
+        for sentence in reversed(self._current):
             added = len(sentence) + (1 if seed else 0)
-            if seed and seed_len + added > overlap:
+            if seed and seed_len + added > self.overlap:
                 break
             seed.insert(0, sentence)
             seed_len += added
         return seed
 
-    for sentence in sentences:
-        if len(sentence) > chunk_size:
+    def feed(self, sentence: str) -> list[str]:
+        """Add one sentence; returns the chunks it completed (usually none)."""
+        chunks: list[str] = []
+        if len(sentence) > self.chunk_size:
             # Oversize sentence: flush what we have, then hard-split it. No
             # overlap is carried across a hard-split boundary.
-            flush()
-            chunks.extend(_hard_split(sentence, chunk_size))
-            current, current_len = [], 0
-            continue
+            if self._current:
+                chunks.append(" ".join(self._current))
+            for piece in _hard_split(sentence, self.chunk_size):
+                if piece.strip():
+                    chunks.append(piece.strip())
+            self._current, self._current_len = [], 0
+            return chunks
+
+        addition = len(sentence) + (1 if self._current else 0)
+        if self._current and self._current_len + addition > self.chunk_size:
+            chunks.append(" ".join(self._current))
+            self._current = self._overlap_seed()
+            self._current_len = len(" ".join(self._current))
+            addition = len(sentence) + (1 if self._current else 0)
+
+        self._current.append(sentence)
+        self._current_len += addition
+        return chunks
+
+    def finish(self) -> list[str]:
+        chunks = [" ".join(self._current)] if self._current else []
+        self._current, self._current_len = [], 0
+        return chunks
+
+
+def merge_chunks(chunks: list[str]) -> str:
+    """
+    Join consecutive chunks of one document back into continuous text.
+
+    Inverse of the Chunker's overlap seeding: each chunk may start with whole
+    trailing sentences of the one before, so the longest suffix of the text so
+    far that starts on a word boundary and is also a prefix of the next chunk
+    is dropped from that chunk. Chunks without a seed (after a hard split) are
+    joined with a space.
+    """
+    if not chunks:
+        return ""
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        longest = min(len(merged), len(chunk))
+        for size in range(longest, 0, -1):
+            starts_word = size == len(merged) or merged[-size - 1] == " "
+            if starts_word and merged.endswith(chunk[:size]):
+                chunk = chunk[size:].lstrip()
+                break
+        if chunk:
+            merged = f"{merged} {chunk}"
+    return merged
+
+
+def iter_chunks(sentences: Iterable[str], chunk_size: int, overlap: int) -> Iterator[str]:
+    """Lazily pack a stream of sentences into overlapping chunks (see Chunker)."""
+    chunker = Chunker(chunk_size, overlap)
+    for sentence in sentences:
+        yield from chunker.feed(sentence)
+    yield from chunker.finish()
+
+
+async def aiter_chunks(pages: AsyncIterable[str], chunk_size: int, overlap: int) -> AsyncIterator[str]:
+    """Async form of iter_chunks(iter_sentences(pages)) for pages extracted off-loop."""
+    splitter = SentenceSplitter()
+    chunker = Chunker(chunk_size, overlap)
+    async for page in pages:
+        for sentence in splitter.feed(page):
+            for chunk in chunker.feed(sentence):
+                yield chunk
+    for sentence in splitter.finish():
+        for chunk in chunker.feed(sentence):
+            yield chunk
+    for chunk in chunker.finish():
+        yield chunk
+
+
+def chunk_text(text: str, chunk_size: int, overlap: int) -> list[str]:
+    """
+    Split text into overlapping chunks on sentence/paragraph boundaries.
+
+    Text is split into paragraphs (blank lines), then sentences, which are
+    packed by iter_chunks. Ingestion streams pages through iter_sentences and
+    iter_chunks directly; this wrapper is for callers that already hold the
+    whole text.
+    """
+    return list(iter_chunks(iter_sentences([text]), chunk_size, overlap))
+
+
+def iter_batches(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Group an iterable into lists of at most `size` items."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
-        addition = len(sentence) + (1 if current else 0)
-        if current and current_len + addition > chunk_size:
-            current = flush()
-            current_len = len(" ".join(current))
-            addition = len(sentence) + (1 if current else 0)
 
-        current.append(sentence)
-        current_len += addition
+async def aiter_batches(items: Iterable[T] | AsyncIterable[T], size: int) -> AsyncIterator[list[T]]:
+    """iter_batches for a sync or async iterable."""
+    if not isinstance(items, AsyncIterable):
+        for batch in iter_batches(items, size):
+            yield batch
+        return
+    batch: list[T] = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-    if current:
-        chunks.append(" ".join(current))
 
-    return [c.strip() for c in chunks if c.strip()]
+def fit_dimensions(vector: list[float], dimensions: int) -> list[float]:
+    """
+    Shorten a Matryoshka embedding to its first `dimensions` components and
+    L2-renormalize, which is what text-embedding-3 returns when asked for
+    `dimensions` directly. Vectors already that short are returned unchanged.
+    Must match the SQL in scripts/reproject_embeddings.py.
+    """
+    if len(vector) <= dimensions:
+        return vector
+    head = np.asarray(vector[:dimensions], dtype=np.float64)
+    norm = np.linalg.norm(head)
+    return (head / norm).tolist() if norm else head.tolist()
 
 
 async def generate_embeddings(
@@ -123,13 +300,217 @@ async def generate_embeddings(
     with no key at all, resolves to None here and correctly falls back to
     the system key — their content is embedded under the system account.
     This is the honest, intended scope, not a regression.
+
+    Results go through the content-addressed embedding cache: texts already
+    embedded under this model are served from the LRU/Redis tiers, and only
+    the distinct misses are sent to the provider (none at all if every text
+    hits).
+
+    Vectors are settings.embedding_dimensions long: requested at that size
+    from the provider (embedding_request_dimensions), and otherwise shortened
+    with fit_dimensions.
+    """
+    results = await embedding_cache.get_many(texts)
+    missing = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+    if not missing:
+        return results
+
+    fresh = dict(zip(missing, await _embed_uncached(missing, api_key)))
+    return [r if r is not None else fresh[t] for t, r in zip(texts, results)]
+
+
+async def _embed_uncached(texts: list[str], api_key: str | None = None) -> list[list[float]]:
+    """
+    The provider call behind generate_embeddings, for distinct texts already
+    known to miss the cache; the vectors are stored in it.
     """
+    extra = {"dimensions": settings.embedding_dimensions} if settings.embedding_request_dimensions else {}
     response = await aembedding(
         model=settings.embedding_model,
         input=texts,
         api_key=api_key or settings.openai_api_key,
+        **extra,
+    )
+    vectors = [fit_dimensions(item["embedding"], settings.embedding_dimensions) for item in response.data]
+    await embedding_cache.set_many(dict(zip(texts, vectors)))
+    return vectors
+
+
+def chunk_hash(content: str) -> str:
+    """Digest stored on each chunk; must match the migration's SQL backfill."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+async def _embed_and_store_indexed(
+    db: AsyncSession,
+    document_id: uuid.UUID,
+    user_id: str,
+    indexed_chunks: AsyncIterable[tuple[int, str]],
+    commit_rows: int,
+) -> int:
+    """
+    Embed (chunk_index, content) pairs batch by batch and COPY each batch in.
+
+    Embedding requests overlap (bounded by the per-key scheduler) but batches
+    come back and are inserted in order. Every commit_rows rows the
+    transaction is committed; 0 leaves committing entirely to the caller.
+    Returns the number of chunks stored.
+    """
+    api_key = await get_user_api_key(db, user_id, "openai")
+    scheduler = get_embedding_scheduler(api_key)
+
+    # The scheduler looks batches up in the embedding cache itself, so only
+    # the misses are sent to the provider and charged to the key's budget.
+    async def embed(texts: list[str]) -> list[list[float]]:
+        return await _embed_uncached(texts, api_key=api_key)
+
+    # The scheduler works on text batches; their chunk indices wait here and
+    # are matched back up in the same (FIFO) order the results arrive.
+    index_batches: deque[list[int]] = deque()
+
+    async def text_batches() -> AsyncIterator[list[str]]:
+        async for pairs in aiter_batches(indexed_chunks, EMBEDDING_BATCH_SIZE):
+            index_batches.append([index for index, _ in pairs])
+            yield [content for _, content in pairs]
+
+    stored = 0
+    uncommitted = 0
+    async for batch, embeddings in scheduler.embed_batches(text_batches(), embed, embedding_cache.get_many):
+        indices = index_batches.popleft()
+        await copy_chunks(
+            db,
+            [
+                {
+                    "document_id": document_id,
+                    "user_id": user_id,
+                    "content": content,
+                    "chunk_index": index,
+                    "embedding": embedding,
+                    "content_hash": chunk_hash(content),
+                }
+                for index, content, embedding in zip(indices, batch, embeddings)
+            ],
+        )
+        stored += len(batch)
+        uncommitted += len(batch)
+        # Commit in bounded slices so a huge document doesn't hold one
+        # enormous transaction open for the whole ingest.
+        if commit_rows and uncommitted >= commit_rows:
+            await db.commit()
+            uncommitted = 0
+    return stored
+
+
+async def _embed_and_store_chunks(
+    db: AsyncSession,
+    document_id: uuid.UUID,
+    user_id: str,
+    chunks: Iterable[str] | AsyncIterable[str],
+) -> int:
+    """
+    Embed a stream of chunks batch by batch and insert each batch as it's ready.
+
+    Rows go out through binary COPY rather than db.add, so nothing piles up in
+    the session's identity map — peak memory is a few batches of chunk text
+    and vectors regardless of document size. Every ingest_commit_rows rows the
+    transaction is committed; if ingestion later fails, the worker deletes the
+    document's partial chunks. Returns the number of chunks stored.
+    """
+
+    async def indexed() -> AsyncIterator[tuple[int, str]]:
+        index = 0
+        async for batch in aiter_batches(chunks, EMBEDDING_BATCH_SIZE):
+            for content in batch:
+                yield index, content
+                index += 1
+
+    return await _embed_and_store_indexed(
+        db, document_id, user_id, indexed(), settings.ingest_commit_rows
+    )
+
+
+def _pdf_chunks(source: PdfSource, page_count: int) -> AsyncIterator[str]:
+    pages = aiter_pdf_pages(
+        source,
+        page_count,
+        pages_per_task=settings.pdf_extract_pages_per_task,
+        max_pending=max(2, settings.pdf_extract_processes * 2),
+    )
+    return aiter_chunks(pages, settings.chunk_size, settings.chunk_overlap)
+
+
+async def _ingest_pdf(db: AsyncSession, doc: Document, source: PdfSource) -> int:
+    """
+    Stream a PDF through pages → sentences → chunks → embedding batches → insert.
+
+    Sets doc.page_count and returns the number of chunks stored. Page text is
+    extracted off the event loop (see pdf_extract) in ranges that run ahead of
+    the embedding batches by a bounded amount.
+    """
+    doc.page_count = await pdf_page_count(source)
+    chunks = _pdf_chunks(source, doc.page_count)
+    stored = await _embed_and_store_chunks(db, doc.id, doc.user_id, chunks)
+
+    logger.info(
+        f"Ingested document: {doc.filename} ({doc.page_count} pages, {stored} chunks)"
+    )
+    return stored
+
+
+async def reingest_chunks(
+    db: AsyncSession,
+    document_id: uuid.UUID,
+    user_id: str,
+    chunks: Iterable[str] | AsyncIterable[str],
+) -> dict[str, int]:
+    """
+    Bring a document's stored chunks in line with a new chunk stream, touching
+    only what changed.
+
+    Stored chunks are matched to new ones by content hash (duplicates are
+    matched in document order). A matched chunk keeps its row and embedding
+    and only has chunk_index moved if it shifted; unmatched new chunks are
+    embedded and inserted; stored chunks left unmatched are deleted.
+
+    Nothing is committed here: a failed re-ingest rolls back to the previous
+    revision intact. Returns counts of kept, moved, added and removed chunks.
+    """
+    result = await db.execute(
+        select(Chunk.id, Chunk.chunk_index, Chunk.content_hash)
+        .where(Chunk.document_id == document_id)
+        .order_by(Chunk.chunk_index)
     )
-    return [item["embedding"] for item in response.data]
+    stored: dict[str, deque[tuple[uuid.UUID, int]]] = {}
+    for chunk_id, index, content_hash in result.all():
+        stored.setdefault(content_hash, deque()).append((chunk_id, index))
+
+    kept = 0
+    moves: list[dict] = []
+
+    async def changed() -> AsyncIterator[tuple[int, str]]:
+        nonlocal kept
+        index = 0
+        async for batch in aiter_batches(chunks, EMBEDDING_BATCH_SIZE):
+            for content in batch:
+                matches = stored.get(chunk_hash(content))
+                if matches:
+                    chunk_id, old_index = matches.popleft()
+                    kept += 1
+                    if old_index != index:
+                        moves.append({"id": chunk_id, "chunk_index": index})
+                else:
+                    yield index, content
+                index += 1
+
+    added = await _embed_and_store_indexed(db, document_id, user_id, changed(), commit_rows=0)
+
+    if moves:
+        await db.execute(update(Chunk), moves)
+    stale = [chunk_id for matches in stored.values() for chunk_id, _ in matches]
+    if stale:
+        await db.execute(delete(Chunk).where(Chunk.id.in_(stale)))
+
+    return {"kept": kept, "moved": len(moves), "added": added, "removed": len(stale)}
 
 
 async def ingest_document(
@@ -154,44 +535,11 @@ async def ingest_document(
     db.add(doc)
     await db.flush()  # Get the ID without committing
 
-    # 2. Extract text
-    text, page_count = extract_text_from_pdf(file_path)
-    doc.page_count = page_count
-
-    if not text:
-        doc.status = "empty"
-        await db.commit()
-        return doc
-
-    # 3. Chunk
-    chunks = chunk_text(text, settings.chunk_size, settings.chunk_overlap)
-
-    # Log
-    logger.info(f"Ingesting document: {filename} ({page_count} pages, {len(chunks)} chunks)")
-
-    # 4. Embed (in batches to avoid API limits)
-    api_key = await get_user_api_key(db, user_id, "openai")
-    batch_size = 100  # OpenAI allows up to 2048, but be conservative
-    all_embeddings = []
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i : i + batch_size]
-        embeddings = await generate_embeddings(batch, api_key=api_key)
-        all_embeddings.extend(embeddings)
-
-    # 5. Store chunks with embeddings
-    for idx, (chunk_text_content, embedding) in enumerate(
-        zip(chunks, all_embeddings)
-    ):
-        chunk = Chunk(
-            document_id=doc.id,
-            user_id=user_id,
-            content=chunk_text_content,
-            chunk_index=idx,
-            embedding=embedding,
-        )
-        db.add(chunk)
+    # 2. Extract, chunk, embed and store in one streaming pass
+    stored = await _ingest_pdf(db, doc, file_path)
 
-    doc.status = "ready"
+    doc.status = "ready" if stored else "empty"
+    await refresh_chunk_count(db, user_id)
     await db.commit()
     await db.refresh(doc)
     return doc
@@ -208,55 +556,64 @@ async def ingest_document_background(
     Background version of ingestion. The Document row already exists
     with status='processing'. This function does the heavy lifting.
     """
-    from app.models import Document
-    from sqlalchemy import select
-
     # Fetch the existing document record
     result = await db.execute(
         select(Document).where(Document.id == uuid.UUID(document_id))
     )
     doc = result.scalar_one()
 
+    async with open_pdf_source(file_path) as source:
+        stored = await _ingest_pdf(db, doc, source)
 
-    # Extract text — need a local file for pymupdf
-    local_path = get_local_path(file_path)
-    try:
-        text, page_count = extract_text_from_pdf(local_path)
-    finally:
-        # Clean up temp file if it was downloaded from S3
-        import os
-        if local_path != file_path and os.path.exists(local_path):
-            os.remove(local_path)
+    doc.status = "ready" if stored else "empty"
+    await refresh_chunk_count(db, doc.user_id)
+    await db.commit()
 
-    doc.page_count = page_count
 
-    # Chunk
-    chunks = chunk_text(text, settings.chunk_size, settings.chunk_overlap)
-    logger.info(
-        f"Ingesting document: {filename} ({page_count} pages, {len(chunks)} chunks)"
+async def reingest_document_background(
+    db: AsyncSession,
+    document_id: str,
+    file_path: str,
+    storage_path: str,
+    content_hash: str,
+) -> None:
+    """
+    Re-ingest an existing document from a revised file.
+
+    file_path is the new file's key; storage_path and content_hash are what
+    save_stream returned for it and its hash. Only chunks whose content
+    changed are embedded; see reingest_chunks. The document's storage_path
+    and content_hash switch to the new revision in the same transaction, so
+    a failure leaves the previous revision's file, hash and chunks in place.
+    Once committed, the previous revision's file is deleted.
+    """
+    result = await db.execute(
+        select(Document).where(Document.id == uuid.UUID(document_id))
     )
+    doc = result.scalar_one()
+    previous_path = doc.storage_path
 
-    # Embed in batches
-    api_key = await get_user_api_key(db, user_id, "openai")
-    batch_size = 100
-    all_embeddings = []
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i : i + batch_size]
-        embeddings = await generate_embeddings(batch, api_key=api_key)
-        all_embeddings.extend(embeddings)
-
-    # Store chunks
-    for idx, (chunk_text_content, embedding) in enumerate(
-        zip(chunks, all_embeddings)
-    ):
-        chunk = Chunk(
-            document_id=doc.id,
-            user_id=user_id,
-            content=chunk_text_content,
-            chunk_index=idx,
-            embedding=embedding,
+    async with open_pdf_source(file_path) as source:
+        page_count = await pdf_page_count(source)
+        counts = await reingest_chunks(
+            db, doc.id, doc.user_id, _pdf_chunks(source, page_count)
         )
-        db.add(chunk)
 
+    doc.page_count = page_count
+    doc.storage_path = storage_path
+    doc.content_hash = content_hash
     doc.status = "ready"
+    await refresh_chunk_count(db, doc.user_id)
     await db.commit()
+
+    if previous_path and previous_path != storage_path:
+        try:
+            await delete_file(file_key_for(previous_path))
+        except Exception as e:
+            # The new revision is live; an orphaned old file is only a leak.
+            logger.warning(f"Could not delete previous revision {previous_path}: {e}")
+    logger.info(
+        f"Re-ingested document: {doc.filename} ({page_count} pages; "
+        f"{counts['kept']} kept, {counts['moved']} moved, "
+        f"{counts['added']} added, {counts['removed']} removed)"
+    )
@@ -3,17 +3,23 @@ import logging
 import uuid
 from datetime import datetime
 
+import numpy as np
 from litellm import acompletion
 from sqlalchemy import select, text as sa_text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.models import Memory, Message
+from app.services.bulk_insert import copy_memories
+from app.services import embedding_cache
 from app.services.ingestion import generate_embeddings
 from app.services.llm import get_user_api_key
 
 logger = logging.getLogger(__name__)
 
+# Cosine similarity at or above which a new memory is treated as a duplicate.
+DUPLICATE_SIMILARITY = 0.85
+
 
 EXTRACTION_PROMPT = """You are a memory extraction system. Given a conversation between \
 a user and an AI assistant, extract durable, useful facts about the user that would help \
@@ -150,6 +156,17 @@ async def extract_memories_from_conversation(
     return valid_memories
 
 
+def _max_similarity(embedding: list[float], others: list[list[float]]) -> float:
+    """Highest cosine similarity between `embedding` and any of `others` (0.0 if none)."""
+    if not others:
+        return 0.0
+    q = np.asarray(embedding, dtype=np.float64)
+    matrix = np.asarray(others, dtype=np.float64)
+    q = q / (np.linalg.norm(q) + 1e-12)
+    matrix = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+    return float((matrix @ q).max())
+
+
 async def persist_memories(
     db: AsyncSession,
     user_id: str,
@@ -159,6 +176,9 @@ async def persist_memories(
     """
     Store extracted memories with embeddings.
     Returns the number of memories actually saved.
+
+    Near-duplicates (of stored memories or of each other) are skipped; the
+    rest are written in one binary COPY and committed by the caller.
     """
     if not memories:
         return 0
@@ -167,7 +187,7 @@ async def persist_memories(
     api_key = await get_user_api_key(db, user_id, "openai")
     embeddings = await generate_embeddings(contents, api_key=api_key)
 
-    count = 0
+    accepted: list[dict] = []
     for mem_data, embedding in zip(memories, embeddings):
         dup_result = await db.execute(
             sa_text("""
@@ -186,22 +206,36 @@ async def persist_memories(
             },
         )
         dup_row = dup_result.fetchone()
-        if dup_row and dup_row.similarity >= 0.85:
+        if dup_row and dup_row.similarity >= DUPLICATE_SIMILARITY:
             logger.info(
                 f"Skipping duplicate memory for user {user_id} "
                 f"(similarity={dup_row.similarity:.3f}): {mem_data['content'][:60]}"
             )
             continue
 
-        memory = Memory(
-            user_id=user_id,
-            category=mem_data["category"],
-            content=mem_data["content"],
-            embedding=embedding,
-            source_conversation_id=conversation_id,
+        # Rows queued for the bulk insert aren't visible to the query above,
+        # so dedup against them in memory as well.
+        batch_similarity = _max_similarity(
+            embedding,
+            [m["embedding"] for m in accepted if m["category"] == mem_data["category"]],
         )
-        db.add(memory)
-        count += 1
+        if batch_similarity >= DUPLICATE_SIMILARITY:
+            logger.info(
+                f"Skipping duplicate memory within batch for user {user_id} "
+                f"(similarity={batch_similarity:.3f}): {mem_data['content'][:60]}"
+            )
+            continue
+
+        accepted.append({
+            "user_id": user_id,
+            "category": mem_data["category"],
+            "content": mem_data["content"],
+            "embedding": embedding,
+            "source_conversation_id": conversation_id,
+        })
+
+    await copy_memories(db, accepted)
+    count = len(accepted)
 
     logger.info(f"Persisted {count} memories for user {user_id}")
     return count
@@ -240,9 +274,12 @@ async def search_memories(
     """Semantic search over a user's memories. Used by the memory_search tool."""
     top_k = top_k or settings.memory_retrieval_top_k
 
-    api_key = await get_user_api_key(db, user_id, "openai")
-    embeddings = await generate_embeddings([query], api_key=api_key)
-    query_embedding = embeddings[0]
+    query_embedding = embedding_cache.get_query(user_id, query)
+    if query_embedding is None:
+        api_key = await get_user_api_key(db, user_id, "openai")
+        embeddings = await generate_embeddings([query], api_key=api_key)
+        query_embedding = embeddings[0]
+        embedding_cache.set_query(user_id, query, query_embedding)
 
     result = await db.execute(
         sa_text("""
@@ -0,0 +1,145 @@
+"""
+PDF text extraction off the event loop.
+
+PyMuPDF is CPU-bound and holds the GIL, so extracting a large (especially
+scanned) PDF inline blocks every other coroutine in the process — in the arq
+worker that means every other job. Extraction runs here instead:
+
+  - in the worker, on a ProcessPoolExecutor started in `startup`; a big
+    document is split into page ranges that run on several processes at once;
+  - anywhere the pool isn't started (API process, scripts, tests), on the
+    default thread executor, which at least keeps the loop responsive.
+
+Pages still come back in document order and only a bounded number of ranges
+is outstanding, so memory stays proportional to a few ranges of text rather
+than the whole document.
+
+Functions submitted to the pool are module-level and take only a source (a
+path, or the bytes of a PDF small enough to keep in memory) and page numbers;
+the pool uses the `spawn` start method so children don't inherit the worker's
+event loop, sockets or Redis clients. Arguments are pickled per task, so an
+in-memory PDF never goes to the pool as bytes more than once: its pages are
+counted on a thread, and when it is split across several pool tasks it is
+first written to a temp file and the tasks get its path.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any
+
+import pymupdf
+
+logger = logging.getLogger(__name__)
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def start_pool(max_workers: int) -> None:
+    """Start the process pool (worker startup). 0 keeps extraction on threads."""
+    global _pool
+    if max_workers <= 0 or _pool is not None:
+        return
+    _pool = ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    logger.info(f"PDF extraction pool started with {max_workers} processes")
+
+
+def shutdown_pool() -> None:
+    """Stop the process pool (worker shutdown), cancelling queued ranges."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+# A path on disk, or the whole PDF in memory (see storage.open_pdf_source).
+PdfSource = str | bytes
+
+
+def _open(source: PdfSource) -> pymupdf.Document:
+    if isinstance(source, bytes):
+        return pymupdf.open(stream=source, filetype="pdf")
+    return pymupdf.open(source)
+
+
+def _page_count(source: PdfSource) -> int:
+    with _open(source) as pdf:
+        return len(pdf)
+
+
+def _extract_range(source: PdfSource, start: int, stop: int) -> list[str]:
+    """Text of pages [start, stop). Runs in a pool process."""
+    with _open(source) as pdf:
+        return [pdf[i].get_text() for i in range(start, stop)]
+
+
+async def _run(fn: Callable[..., Any], *args: Any) -> Any:
+    executor: Executor | None = _pool
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+def page_ranges(page_count: int, pages_per_task: int) -> list[tuple[int, int]]:
+    """Split [0, page_count) into consecutive ranges of at most pages_per_task."""
+    step = max(1, pages_per_task)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+async def pdf_page_count(source: PdfSource) -> int:
+    if isinstance(source, bytes):
+        # Counting only reads the page tree; pickling the document over to
+        # a pool process would cost more than the count itself.
+        return await asyncio.to_thread(_page_count, source)
+    return await _run(_page_count, source)
+
+
+def _spill(data: bytes) -> str:
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+async def aiter_pdf_pages(
+    source: PdfSource,
+    page_count: int,
+    pages_per_task: int,
+    max_pending: int,
+) -> AsyncIterator[str]:
+    """
+    Yield the text of each page in order, extracted off the event loop.
+
+    Pages are extracted in ranges of pages_per_task, with up to max_pending
+    ranges running ahead of the consumer. If the consumer stops early or a
+    range fails, ranges that haven't started are cancelled.
+
+    In-memory sources bound for the process pool in more than one range are
+    spilled to a temp file for the duration, deleted on exit.
+    """
+    ranges = page_ranges(page_count, pages_per_task)
+    spill_path: str | None = None
+    if isinstance(source, bytes) and _pool is not None and len(ranges) > 1:
+        source = spill_path = await asyncio.to_thread(_spill, source)
+    pending: deque[asyncio.Future] = deque()
+    try:
+        for start, stop in ranges:
+            pending.append(asyncio.ensure_future(_run(_extract_range, source, start, stop)))
+            if len(pending) >= max(1, max_pending):
+                for page in await pending.popleft():
+                    yield page
+        while pending:
+            for page in await pending.popleft():
+                yield page
+    finally:
+        for future in pending:
+            future.cancel()
+        if spill_path is not None:
+            # Ranges still running only get cancelled above, whose results
+            # nobody awaits any more; an open file survives the unlink anyway.
+            os.remove(spill_path)
@@ -0,0 +1,114 @@
+"""
+Second-stage reranking of retrieved chunks.
+
+Cosine similarity over embeddings is a good recall stage but a blunt ranker:
+it scores the query and each passage independently. Here an over-fetched
+candidate list (rerank_candidates) is re-ordered by one cheap LLM call that
+reads the query and every candidate together and scores each passage's
+relevance, and the best top_k are kept.
+
+The call runs under a latency budget (rerank_timeout_seconds). If it times
+out, fails, or returns something unparseable, the raw retrieval order is used,
+so reranking can only ever cost the budget, never the search. Orders are
+cached per (query, candidate set) in a TTL-bounded LRU, so an agent repeating
+a search skips the call entirely.
+
+Like the actor-critic pass, reranking is a system-side quality step and uses
+the system key.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+
+from litellm import acompletion
+
+from app.config import settings
+from app.services.embedding_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+RERANK_PROMPT = """You rank passages by how well they answer a search query.
+
+Score every passage from 0 (irrelevant) to 10 (directly answers the query).
+Output ONLY a JSON object of the form {"scores": [s0, s1, ...]} with exactly \
+one integer per passage, in passage order."""
+
+_cache = LRUCache(settings.rerank_cache_size, ttl_seconds=settings.rerank_cache_ttl_seconds)
+_stats = {"cache_hits": 0, "calls": 0, "fallbacks": 0}
+
+
+def _cache_key(query: str, chunks: list[dict]) -> tuple[str, str, tuple[str, ...]]:
+    normalized = " ".join(query.casefold().split())
+    digests = tuple(hashlib.sha256(c["content"].encode("utf-8")).hexdigest() for c in chunks)
+    return (settings.rerank_model, normalized, digests)
+
+
+def _prompt(query: str, chunks: list[dict]) -> str:
+    limit = settings.rerank_passage_chars
+    passages = "\n\n".join(f"[{i}] {c['content'][:limit]}" for i, c in enumerate(chunks))
+    return f"Query: {query}\n\nPassages:\n\n{passages}"
+
+
+def _parse_order(content: str, count: int) -> list[int]:
+    """Candidate indices, best first; ties keep retrieval order. Raises ValueError."""
+    scores = json.loads(content)["scores"]
+    if not isinstance(scores, list) or len(scores) != count:
+        raise ValueError(f"expected {count} scores, got {scores!r}")
+    scores = [float(s) for s in scores]
+    return sorted(range(count), key=lambda i: -scores[i])
+
+
+async def _score(query: str, chunks: list[dict]) -> list[int]:
+    response = await acompletion(
+        model=settings.rerank_model,
+        messages=[
+            {"role": "system", "content": RERANK_PROMPT},
+            {"role": "user", "content": _prompt(query, chunks)},
+        ],
+        api_key=settings.openai_api_key,
+        max_tokens=8 * len(chunks) + 20,
+        response_format={"type": "json_object"},
+    )
+    return _parse_order(response.choices[0].message.content or "", len(chunks))
+
+
+async def rerank(query: str, chunks: list[dict], top_k: int) -> list[dict]:
+    """
+    Re-order retrieved chunks (dicts with 'content') by LLM relevance and
+    return the best top_k. Falls back to the first top_k in retrieval order.
+    """
+    if len(chunks) <= 1:
+        return chunks[:top_k]
+
+    key = _cache_key(query, chunks)
+    order = _cache.get(key)
+    if order is not None:
+        _stats["cache_hits"] += 1
+    else:
+        _stats["calls"] += 1
+        try:
+            order = await asyncio.wait_for(_score(query, chunks), settings.rerank_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.info(f"Rerank exceeded {settings.rerank_timeout_seconds}s; using retrieval order")
+            _stats["fallbacks"] += 1
+            return chunks[:top_k]
+        except Exception as e:  # noqa: BLE001 — reranking must never fail the search
+            logger.warning(f"Rerank failed ({e}); using retrieval order")
+            _stats["fallbacks"] += 1
+            return chunks[:top_k]
+        _cache.set(key, order)
+
+    return [chunks[i] for i in order[:top_k]]
+
+
+def stats() -> dict[str, float]:
+    """Rerank counters since process start (exposed at /metrics)."""
+    return {**_stats, "cache_entries": len(_cache)}
+
+
+def clear() -> None:
+    """Drop cached orders and reset counters."""
+    _cache.clear()
+    for k in _stats:
+        _stats[k] = 0
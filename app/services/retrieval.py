@@ -1,13 +1,343 @@
+import json
 import logging
+
+import numpy as np
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.services.ingestion import generate_embeddings
+from app.services import embedding_cache
+from app.services.chunk_counts import get_chunk_count
+from app.services.ingestion import generate_embeddings, merge_chunks
 from app.services.llm import get_user_api_key
+from app.services.seed_index import SeedIndex, get_seed_index
+from app.services.tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
+RETRIEVAL_MODES = ("vector", "hybrid")
+
+# Vector candidates are picked by the plan's `order_by` (which decides the
+# index used, see _plan_vector_search) into a pool of :pool rows, then ranked
+# by full-precision cosine distance. With full vectors the pool is just the
+# result; with a quantized index it is the rescoring window.
+#
+# {embedding} and {query} are the query vector and text: bind parameters for
+# one query, or columns of the VALUES list in the batched statement.
+_NEAREST_SQL = """
+    SELECT {columns}, embedding <=> {embedding} AS distance
+    FROM chunks
+    WHERE {owner_filter}
+    ORDER BY {order_by}
+    LIMIT :pool
+"""
+
+_VECTOR_SQL = """
+    SELECT id, content, 1 - distance AS similarity, distance AS sort_key
+    FROM ({nearest}) nearest
+    ORDER BY distance
+    LIMIT :top_k
+"""
+
+# Hybrid retrieval: the top `candidates` chunks by cosine distance (HNSW) and
+# the top `candidates` by full-text rank (GIN on content_tsv) are fused with
+# reciprocal rank fusion — score = sum over lists of 1 / (rrf_k + rank) — so a
+# chunk that matches an exact name, identifier or number ranks well even when
+# its embedding doesn't, without having to calibrate cosine against ts_rank.
+# app/eval/retrieval_eval.py mirrors this fusion offline.
+_HYBRID_SQL = """
+    WITH vector_hits AS (
+        SELECT id, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+        FROM ({nearest}) nearest
+        ORDER BY rank
+        LIMIT :candidates
+    ),
+    text_hits AS (
+        SELECT id, ROW_NUMBER() OVER (ORDER BY score DESC) AS rank
+        FROM (
+            SELECT id, ts_rank_cd(content_tsv, tsq) AS score
+            FROM chunks, websearch_to_tsquery('english', {query}) tsq
+            WHERE {owner_filter} AND content_tsv @@ tsq
+            ORDER BY score DESC
+            LIMIT :candidates
+        ) matches
+    ),
+    fused AS (
+        SELECT id, SUM(1.0 / (:rrf_k + rank)) AS score
+        FROM (SELECT * FROM vector_hits UNION ALL SELECT * FROM text_hits) ranked
+        GROUP BY id
+    )
+    SELECT c.id, c.content, 1 - (c.embedding <=> {embedding}) AS similarity, -fused.score AS sort_key
+    FROM fused JOIN chunks c ON c.id = fused.id
+    ORDER BY sort_key
+    LIMIT :top_k
+"""
+
+# Every hit comes back with its document (for citations) and the contents of
+# chunks chunk_index +- :neighbors of the same document, in order — fetched per
+# hit through ix_chunks_document_id_chunk_index in the same statement. They
+# are de-overlapped into one passage in Python (ingestion.merge_chunks).
+_CONTEXT_SQL = """
+    SELECT hits.content, hits.similarity, hits.sort_key,
+           c.document_id, d.filename{vector_column},
+           ARRAY(
+               SELECT n.content FROM chunks n
+               WHERE n.document_id = c.document_id
+                 AND n.chunk_index BETWEEN c.chunk_index - :neighbors AND c.chunk_index + :neighbors
+               ORDER BY n.chunk_index
+           ) AS neighborhood
+    FROM ({search}) hits
+    JOIN chunks c ON c.id = hits.id
+    JOIN documents d ON d.id = c.document_id
+    ORDER BY hits.sort_key
+"""
+
+# Several queries in one statement: each row of the VALUES list drives one
+# LATERAL run of the single-query search, so the plan (and HNSW index use) per
+# query is the same as issuing them one at a time.
+_MANY_SQL = """
+    SELECT q.idx, hits.content, hits.similarity, hits.document_id, hits.filename, hits.neighborhood{vector_column}
+    FROM (VALUES {values}) AS q(idx, query_embedding, query_text)
+    CROSS JOIN LATERAL ({search}) hits
+    ORDER BY q.idx, hits.sort_key
+"""
+
+# "+ 0" hides the operator from the planner so it can't choose the HNSW index:
+# the user_id index narrows to the tenant's rows and they are ranked exactly.
+_EXACT_ORDER = "(embedding <=> {embedding}) + 0"
+
+
+def _ann_order(storage: str) -> str:
+    """ORDER BY expression matching the HNSW index for a vector storage mode.
+
+    The compact indexes are expression indexes built by scripts/vector_index.py.
+    """
+    dims = settings.embedding_dimensions
+    if storage == "halfvec":
+        return f"embedding::halfvec({dims}) <=> CAST({{embedding}} AS halfvec({dims}))"
+    if storage == "binary":
+        return f"binary_quantize(embedding)::bit({dims}) <~> binary_quantize(CAST({{embedding}} AS vector({dims})))"
+    return "embedding <=> {embedding}"
+
+
+async def _plan_vector_search(
+    db: AsyncSession, user_ids: list[str], candidates: int, count: int | None = None
+) -> tuple[str, int]:
+    """
+    Pick the vector-search strategy for these tenants; returns the ORDER BY
+    expression that selects candidates (with an {embedding} placeholder) and
+    the pool size to select.
+
+    pgvector's HNSW scan filters *after* walking the graph, so for a small
+    tenant in a big table most of the ef_search candidates belong to other
+    users and the query returns fewer than top_k rows. Tenants up to
+    retrieval_exact_scan_max_chunks are therefore ranked exactly over their
+    own rows (which is also faster at that size). Larger tenants use HNSW with
+    ef_search raised to cover the pool and, on pgvector >= 0.8, iterative
+    scans that keep walking until enough rows pass the filter. Settings are
+    transaction-local.
+
+    With vector_storage_mode "halfvec" or "binary" the HNSW walk runs over the
+    compact index and the pool is widened by vector_rescore_factor; the final
+    ranking is always by full-precision distance.
+
+    `count` is the tenants' chunk count when the caller already has it.
+    """
+    if count is None:
+        count = await get_chunk_count(db, user_ids)
+    if count <= settings.retrieval_exact_scan_max_chunks:
+        return _EXACT_ORDER, candidates
+
+    storage = settings.vector_storage_mode
+    pool = candidates if storage == "full" else candidates * max(1, settings.vector_rescore_factor)
+    ef_search = max(settings.retrieval_hnsw_ef_search, pool)
+    if settings.retrieval_hnsw_iterative_scan:
+        await db.execute(
+            text("SELECT set_config('hnsw.ef_search', :ef, true), set_config('hnsw.iterative_scan', :scan, true)"),
+            {"ef": str(ef_search), "scan": settings.retrieval_hnsw_iterative_scan},
+        )
+    else:
+        await db.execute(
+            text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": str(ef_search)}
+        )
+    return _ann_order(storage), pool
+
+
+def _owner_scope(user_id: str, include_seed: bool) -> tuple[list[str], str, dict]:
+    """Tenants searched, their WHERE clause, and its bind parameters.
+
+    The seed user's own search already covers the seed corpus; it is not added twice.
+    """
+    params = {"user_id": user_id, "seed_user_id": settings.seed_user_id}
+    if include_seed and user_id != settings.seed_user_id:
+        return [user_id, settings.seed_user_id], "(user_id = :user_id OR user_id = :seed_user_id)", params
+    return [user_id], "user_id = :user_id", params
+
+
+async def _search_sql(
+    db: AsyncSession,
+    user_ids: list[str],
+    owner_filter: str,
+    mode: str,
+    top_k: int,
+    neighbors: int,
+    embedding: str,
+    query: str,
+    with_vectors: bool = False,
+    chunk_count: int | None = None,
+) -> tuple[str, dict]:
+    """
+    Plan the search and build its SQL for one query, whose vector and text are
+    the SQL expressions `embedding` and `query`. Returns (sql, params) where
+    params holds everything but the owner filter's and the query's own.
+    Rows have content, similarity, sort_key (ascending = better), document_id,
+    filename and neighborhood (see _CONTEXT_SQL), plus the chunk's embedding
+    as text when with_vectors is set.
+    """
+    params: dict = {"top_k": top_k}
+    candidates = max(top_k, settings.retrieval_hybrid_candidates) if mode == "hybrid" else top_k
+    order_by, pool = await _plan_vector_search(db, user_ids, candidates, chunk_count)
+    nearest = _NEAREST_SQL.format(
+        columns="id" if mode == "hybrid" else "id, content",
+        owner_filter=owner_filter,
+        order_by=order_by.format(embedding=embedding),
+        embedding=embedding,
+    )
+    if mode == "hybrid":
+        sql = _HYBRID_SQL.format(nearest=nearest, owner_filter=owner_filter, embedding=embedding, query=query)
+        params |= {"candidates": candidates, "rrf_k": settings.retrieval_rrf_k}
+    else:
+        sql = _VECTOR_SQL.format(nearest=nearest)
+    params |= {"pool": pool, "neighbors": neighbors}
+    vector_column = ", c.embedding::text AS embedding" if with_vectors else ""
+    return _CONTEXT_SQL.format(search=sql, vector_column=vector_column), params
+
+
+def mmr_order(query: list[float], vectors: np.ndarray, k: int, mmr_lambda: float) -> list[int]:
+    """
+    Maximal marginal relevance: pick k of `vectors` one at a time, each
+    maximizing mmr_lambda * sim(query, v) - (1 - mmr_lambda) * max sim(v, picked).
+
+    Overlapping chunks of the same passage are nearly identical vectors, so
+    after the first is picked the others are penalized in favour of hits that
+    add something new. mmr_lambda=1 is plain similarity order. Returns indices
+    into `vectors` in pick order.
+    """
+    unit = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    q = np.asarray(query, dtype=np.float32)
+    relevance = unit @ (q / (np.linalg.norm(q) + 1e-12))
+    pairwise = unit @ unit.T
+
+    picked: list[int] = []
+    redundancy = np.zeros(len(unit), dtype=np.float32)
+    available = np.ones(len(unit), dtype=bool)
+    for _ in range(min(k, len(unit))):
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        best = int(np.argmax(np.where(available, scores, -np.inf)))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return picked
+
+
+# A hit paired with its vector (for MMR; None when not diversifying).
+_Item = tuple[dict, np.ndarray | None]
+
+
+def _diversify(items: list[_Item], query: list[float], top_k: int, mmr_lambda: float) -> list[_Item]:
+    """Reduce over-fetched items to top_k by MMR."""
+    if len(items) <= 1:
+        return items[:top_k]
+    vectors = np.array([vector for _, vector in items], dtype=np.float32)
+    return [items[i] for i in mmr_order(query, vectors, top_k, mmr_lambda)]
+
+
+def adaptive_cutoff(hits: list[dict]) -> list[dict]:
+    """
+    Drop the tail of a result list that isn't worth its tokens.
+
+    A hit is kept only if its similarity is at least retrieval_min_similarity
+    and at least retrieval_relative_floor x the best hit's, and only while the
+    kept contexts fit in retrieval_max_context_tokens (0 = no budget; the
+    first kept hit always fits). Order is preserved. The two thresholds are
+    calibrated on the golden set by app.eval.retrieval_eval.calibrate_cutoffs.
+    """
+    if not hits:
+        return hits
+    best = max(hit["similarity"] for hit in hits)
+    floor = max(settings.retrieval_min_similarity, settings.retrieval_relative_floor * best)
+    kept: list[dict] = []
+    tokens = 0
+    for hit in hits:
+        if hit["similarity"] < floor:
+            continue
+        if settings.retrieval_max_context_tokens:
+            tokens += count_tokens(hit["context"])
+            if kept and tokens > settings.retrieval_max_context_tokens:
+                break
+        kept.append(hit)
+    return kept
+
+
+def _fetch_k(top_k: int, mmr_lambda: float | None) -> int:
+    """Rows to fetch: top_k, or the MMR candidate pool when diversifying."""
+    if mmr_lambda is None:
+        return top_k
+    return max(top_k, settings.retrieval_mmr_candidates)
+
+
+def _hit(row) -> dict:
+    return {
+        "content": row.content,
+        "similarity": row.similarity,
+        "context": merge_chunks(list(row.neighborhood)),
+        "document_id": row.document_id,
+        "filename": row.filename,
+    }
+
+
+def _item(row, with_vectors: bool) -> _Item:
+    return _hit(row), np.array(json.loads(row.embedding), dtype=np.float32) if with_vectors else None
+
+
+async def _seed_scope(
+    db: AsyncSession, user_id: str, include_seed: bool, mode: str
+) -> tuple[SeedIndex | None, int | None]:
+    """
+    For guests in vector mode, the in-process seed index (see seed_index) and
+    the guest's own chunk count; SQL then only searches the guest's chunks,
+    and not at all while they have none. (None, None) otherwise, including for
+    the seed user, whose own chunks are the seed corpus and are searched in
+    SQL (the index would return each of them a second time).
+    """
+    if not (include_seed and mode == "vector" and settings.seed_index_enabled):
+        return None, None
+    if user_id == settings.seed_user_id:
+        return None, None
+    return await get_seed_index(db), await get_chunk_count(db, [user_id])
+
+
+def _merge_seed(
+    items: list[_Item], seed: SeedIndex, query: list[float], fetch_k: int, neighbors: int
+) -> list[_Item]:
+    """The guest's own hits and the seed index's, best fetch_k by similarity."""
+    merged = items + seed.search(query, fetch_k, neighbors)
+    merged.sort(key=lambda item: -item[0]["similarity"])
+    return merged[:fetch_k]
+
+
+async def _embed_queries(db: AsyncSession, user_id: str, queries: list[str]) -> list[list[float]]:
+    """Query vectors, from the per-user query cache or one embedding call for the rest."""
+    vectors = [embedding_cache.get_query(user_id, q) for q in queries]
+    missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+    if missing:
+        api_key = await get_user_api_key(db, user_id, "openai")
+        fresh = dict(zip(missing, await generate_embeddings(missing, api_key=api_key)))
+        for q, vector in fresh.items():
+            embedding_cache.set_query(user_id, q, vector)
+        vectors = [v if v is not None else fresh[q] for q, v in zip(queries, vectors)]
+    return vectors
+
 
 async def retrieve_relevant_chunks(
     db: AsyncSession,
@@ -15,53 +345,137 @@ async def retrieve_relevant_chunks(
     user_id: str,
     top_k: int | None = None,
     include_seed: bool = False,
+    mode: str = "vector",
+    neighbors: int = 0,
+    mmr_lambda: float | None = None,
+    adaptive: bool = False,
 ) -> list[dict]:
     """
     Embed the query and find the most similar chunks via cosine similarity.
 
-    Returns a list of dicts with 'content' and 'similarity' keys.
+    Returns a list of dicts with 'content' (the matched chunk), 'similarity',
+    'context' (the chunk merged with up to `neighbors` adjacent chunks on each
+    side), and 'document_id' / 'filename' for citations.
     When include_seed=True (guest users), also searches the shared demo corpus.
+
+    mode="hybrid" also runs a full-text search and fuses the two rankings
+    (see _HYBRID_SQL); 'similarity' is still the chunk's cosine similarity,
+    so results read the same either way.
+
+    With mmr_lambda set, retrieval_mmr_candidates hits are fetched with their
+    vectors and top_k of them chosen by maximal marginal relevance (mmr_order),
+    so near-duplicate overlapping chunks don't crowd out distinct ones.
+
+    adaptive=True returns up to top_k hits rather than exactly top_k, cutting
+    weak and over-budget ones (adaptive_cutoff).
     """
     top_k = top_k or settings.retrieval_top_k
+    fetch_k = _fetch_k(top_k, mmr_lambda)
+    with_vectors = mmr_lambda is not None
+    [query_embedding] = await _embed_queries(db, user_id, [query])
+    seed, own_count = await _seed_scope(db, user_id, include_seed, mode)
 
-    api_key = await get_user_api_key(db, user_id, "openai")
-    embeddings = await generate_embeddings([query], api_key=api_key)
-    query_embedding = embeddings[0]
-
-    if include_seed:
-        sql = text("""
-            SELECT content, 1 - (embedding <=> :embedding) AS similarity
-            FROM chunks
-            WHERE user_id = :user_id OR user_id = :seed_user_id
-            ORDER BY embedding <=> :embedding
-            LIMIT :top_k
-        """)
-        params = {
-            "embedding": str(query_embedding),
-            "user_id": user_id,
-            "seed_user_id": settings.seed_user_id,
-            "top_k": top_k,
-        }
-    else:
-        sql = text("""
-            SELECT content, 1 - (embedding <=> :embedding) AS similarity
-            FROM chunks
-            WHERE user_id = :user_id
-            ORDER BY embedding <=> :embedding
-            LIMIT :top_k
-        """)
-        params = {
-            "embedding": str(query_embedding),
-            "user_id": user_id,
-            "top_k": top_k,
-        }
-
-    result = await db.execute(sql, params)
-    rows = result.fetchall()
-
-    if rows:
-        logger.info(f"Retrieved {len(rows)} chunks for query (top similarity: {rows[0].similarity:.3f})")
+    items: list[_Item] = []
+    if seed is None or own_count:
+        user_ids, owner_filter, params = _owner_scope(user_id, include_seed and seed is None)
+        sql, search_params = await _search_sql(
+            db,
+            user_ids,
+            owner_filter,
+            mode,
+            fetch_k,
+            neighbors,
+            embedding=":embedding",
+            query=":query",
+            with_vectors=with_vectors,
+            chunk_count=own_count,
+        )
+        params |= search_params | {"embedding": str(query_embedding)}
+        if mode == "hybrid":
+            params["query"] = query
+        result = await db.execute(text(sql), params)
+        items = [_item(row, with_vectors) for row in result.fetchall()]
+
+    if seed is not None:
+        items = _merge_seed(items, seed, query_embedding, fetch_k, neighbors)
+    if mmr_lambda is not None:
+        items = _diversify(items, query_embedding, top_k, mmr_lambda)
+    hits = [hit for hit, _ in items]
+    if adaptive:
+        hits = adaptive_cutoff(hits)
+
+    if hits:
+        logger.info(f"Retrieved {len(hits)} chunks for query (top similarity: {hits[0]['similarity']:.3f})")
     else:
         logger.info("No chunks retrieved for query")
 
-    return [{"content": row.content, "similarity": row.similarity} for row in rows]
+    return hits
+
+
+async def retrieve_relevant_chunks_many(
+    db: AsyncSession,
+    queries: list[str],
+    user_id: str,
+    top_k: int | None = None,
+    include_seed: bool = False,
+    mode: str = "vector",
+    neighbors: int = 0,
+    mmr_lambda: float | None = None,
+    adaptive: bool = False,
+) -> list[list[dict]]:
+    """
+    retrieve_relevant_chunks for several queries at once: one embedding call
+    for the uncached queries and one SQL round-trip for all of them (see
+    _MANY_SQL). Returns one ranked result list per query, in query order.
+    mmr_lambda and adaptive apply per query as in retrieve_relevant_chunks.
+    """
+    if not queries:
+        return []
+    top_k = top_k or settings.retrieval_top_k
+    fetch_k = _fetch_k(top_k, mmr_lambda)
+    with_vectors = mmr_lambda is not None
+    vectors = await _embed_queries(db, user_id, queries)
+    seed, own_count = await _seed_scope(db, user_id, include_seed, mode)
+
+    items_by_query: list[list[_Item]] = [[] for _ in queries]
+    if seed is None or own_count:
+        user_ids, owner_filter, params = _owner_scope(user_id, include_seed and seed is None)
+        search, search_params = await _search_sql(
+            db,
+            user_ids,
+            owner_filter,
+            mode,
+            fetch_k,
+            neighbors,
+            embedding="q.query_embedding",
+            query="q.query_text",
+            with_vectors=with_vectors,
+            chunk_count=own_count,
+        )
+        params |= search_params
+        values = []
+        for i, (query, vector) in enumerate(zip(queries, vectors)):
+            values.append(f"({i}, CAST(:embedding_{i} AS vector), CAST(:query_{i} AS text))")
+            params |= {f"embedding_{i}": str(vector), f"query_{i}": query}
+        vector_column = ", hits.embedding" if with_vectors else ""
+        sql = _MANY_SQL.format(values=", ".join(values), search=search, vector_column=vector_column)
+
+        result = await db.execute(text(sql), params)
+        for row in result.fetchall():
+            items_by_query[row.idx].append(_item(row, with_vectors))
+
+    if seed is not None:
+        items_by_query = [
+            _merge_seed(items, seed, vector, fetch_k, neighbors)
+            for items, vector in zip(items_by_query, vectors)
+        ]
+    if mmr_lambda is not None:
+        items_by_query = [
+            _diversify(items, vector, top_k, mmr_lambda) for items, vector in zip(items_by_query, vectors)
+        ]
+    results = [[hit for hit, _ in items] for items in items_by_query]
+    if adaptive:
+        results = [adaptive_cutoff(hits) for hits in results]
+
+    logger.info(f"Retrieved chunks for {len(queries)} queries in one statement")
+    return results
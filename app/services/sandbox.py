@@ -0,0 +1,383 @@
+"""
+Pooled Python sandboxes for the python_executor tool.
+
+Creating a sandbox (an E2B microVM) takes a second or more, and used to be
+paid on every tool call. The pool instead keeps:
+
+  - a few warm sandboxes (sandbox_warm_size), created ahead of time and not
+    yet used, so a conversation's first call starts at once;
+  - one sandbox per (user, conversation), reused by that conversation's later
+    calls, so variables and files persist between them like notebook cells.
+    Calls in one conversation take turns; a sandbox is only ever bound to a
+    single user's conversation and is killed, never handed on, when it
+    leaves the pool.
+
+Bound sandboxes idle for sandbox_idle_seconds, and any sandbox older than
+sandbox_max_age_seconds, are killed by a reaper task started with the API; a
+call never starts in a sandbox past that age either, reap or not. At
+most sandbox_pool_max sandboxes are pooled: past that the least recently used
+idle one is evicted, and if every one is busy the call runs in a throwaway
+sandbox, as before pooling.
+
+SANDBOX_BACKEND=local replaces E2B with LocalSandbox, a Python subprocess
+under rlimits, so the tool can be run and tested without an E2B key. It is
+not an isolation boundary: never use it where untrusted users can reach it.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from e2b_code_interpreter import AsyncSandbox
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Execution:
+    """What one run printed, and the error it raised, as 'Name: value'."""
+    stdout: str
+    stderr: str
+    error: str | None = None
+
+
+class Sandbox(ABC):
+    """A Python process whose globals persist from one run() to the next."""
+
+    alive: bool = True
+
+    @abstractmethod
+    async def run(self, code: str) -> Execution:
+        """Execute code; user errors come back in Execution.error, not raised."""
+
+    @abstractmethod
+    async def kill(self) -> None:
+        """Release the sandbox. Never raises."""
+
+
+class E2BSandbox(Sandbox):
+    """An E2B code-interpreter sandbox (a Jupyter kernel in a microVM)."""
+
+    def __init__(self, sandbox: AsyncSandbox):
+        self._sandbox = sandbox
+
+    @classmethod
+    async def create(cls) -> "E2BSandbox":
+        # Past its E2B timeout the VM is stopped server-side, so a sandbox
+        # leaked by a crashed process is bounded too. The pool hands a
+        # sandbox out only until sandbox_max_age_seconds; the timeout leaves
+        # room for a call started just before then to finish.
+        timeout = settings.sandbox_max_age_seconds + settings.agent_tool_timeout_seconds + 60
+        sandbox = await AsyncSandbox.create(api_key=settings.e2b_api_key, timeout=int(timeout))
+        return cls(sandbox)
+
+    async def run(self, code: str) -> Execution:
+        execution = await self._sandbox.run_code(code)
+        error = execution.error
+        return Execution(
+            stdout="".join(execution.logs.stdout),
+            stderr="".join(execution.logs.stderr),
+            error=f"{error.name}: {error.value}" if error else None,
+        )
+
+    async def kill(self) -> None:
+        self.alive = False
+        try:
+            await self._sandbox.kill()
+        except Exception as e:
+            logger.warning(f"Failed to kill sandbox: {e}")
+
+
+# Runs in the LocalSandbox subprocess. It first applies the rlimits passed
+# in argv (memory bytes, CPU seconds, file size bytes) to itself, so nothing
+# runs between fork and exec (preexec_fn isn't safe in a threaded process).
+# Then: one JSON-encoded code string per line in, one JSON result per line
+# out, all runs sharing one globals dict.
+_WORKER = r"""
+import contextlib, io, json, resource, sys
+memory, cpu, fsize = map(int, sys.argv[1:4])
+resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+namespace = {"__name__": "__main__"}
+requests, sys.stdin = sys.stdin, io.StringIO()  # user code never reads the protocol
+for line in requests:
+    out, err, error = io.StringIO(), io.StringIO(), None
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            exec(compile(json.loads(line), "<sandbox>", "exec"), namespace)
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+    sys.__stdout__.write(json.dumps({"stdout": out.getvalue(), "stderr": err.getvalue(), "error": error}) + "\n")
+    sys.__stdout__.flush()
+"""
+
+
+class LocalSandbox(Sandbox):
+    """Development backend: an isolated-mode interpreter in a scratch directory."""
+
+    def __init__(self, process: asyncio.subprocess.Process, workdir: str):
+        self._process = process
+        self._workdir = workdir
+
+    @classmethod
+    async def create(cls) -> "LocalSandbox":
+        workdir = tempfile.mkdtemp(prefix="sandbox-")
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-I", "-c", _WORKER,
+            str(settings.sandbox_local_memory_mb * 1024 * 1024),
+            str(settings.sandbox_local_cpu_seconds),
+            str(64 * 1024 * 1024),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=workdir,
+            env={"PATH": os.environ.get("PATH", ""), "HOME": workdir},
+            limit=16 * 1024 * 1024,  # longest result line
+        )
+        return cls(process, workdir)
+
+    async def run(self, code: str) -> Execution:
+        self._process.stdin.write(json.dumps(code).encode() + b"\n")
+        await self._process.stdin.drain()
+        line = await self._process.stdout.readline()
+        if not line:  # killed by an rlimit, or exited
+            self.alive = False
+            return Execution("", "", "SandboxExited: the sandbox process ended (resource limit reached?)")
+        return Execution(**json.loads(line))
+
+    async def kill(self) -> None:
+        self.alive = False
+        if self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
+        shutil.rmtree(self._workdir, ignore_errors=True)
+
+
+@dataclass
+class _Lease:
+    """A sandbox bound to one (user_id, conversation_id)."""
+    sandbox: Sandbox
+    created: float
+    last_used: float
+    runs: int = 0
+    users: int = 0  # calls running or waiting on this sandbox
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class SandboxPool:
+    """Warm and conversation-bound sandboxes; see the module docstring."""
+
+    def __init__(self, create: Callable[[], Awaitable[Sandbox]]):
+        self._create = create
+        self._warm: list[tuple[Sandbox, float]] = []  # (sandbox, created)
+        self._bound: dict[tuple[str, str], _Lease] = {}
+        self._filling = 0  # warm sandboxes being created
+        self._tasks: set[asyncio.Task] = set()
+        self._stats = {"created": 0, "warm_hits": 0, "reuses": 0, "evicted": 0, "throwaway": 0}
+
+    def __len__(self) -> int:
+        return len(self._warm) + len(self._bound) + self._filling
+
+    async def _new(self) -> Sandbox:
+        self._stats["created"] += 1
+        return await self._create()
+
+    @staticmethod
+    def _expired(created: float, now: float) -> bool:
+        return now - created > settings.sandbox_max_age_seconds
+
+    @staticmethod
+    def _too_old_to_hand_out(created: float, now: float) -> bool:
+        # Ages count from creation, warm time included (E2B's own timeout
+        # does). A warm sandbox must still have an idle window of life left
+        # once bound, or it could die under a conversation.
+        return now - created > settings.sandbox_max_age_seconds - settings.sandbox_idle_seconds
+
+    async def _take(self) -> tuple[Sandbox, float]:
+        """
+        A fresh sandbox and its creation time: a warm one if any is young
+        enough (topping the pool back up), else a new one.
+        """
+        now = time.monotonic()
+        while self._warm:
+            sandbox, created = self._warm.pop()
+            if self._too_old_to_hand_out(created, now):
+                self._spawn(sandbox.kill())
+                continue
+            self._stats["warm_hits"] += 1
+            self._spawn(self.fill())
+            return sandbox, created
+        return await self._new(), now
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def fill(self) -> None:
+        """Create warm sandboxes up to sandbox_warm_size, within sandbox_pool_max."""
+        while (
+            len(self._warm) + self._filling < settings.sandbox_warm_size
+            and len(self) < settings.sandbox_pool_max
+        ):
+            self._filling += 1
+            created = time.monotonic()
+            try:
+                sandbox = await self._new()
+            except Exception as e:
+                logger.warning(f"Warm sandbox creation failed: {e}")
+                return
+            finally:
+                self._filling -= 1
+            self._warm.append((sandbox, created))
+
+    def _evict_lru(self) -> bool:
+        idle = [(lease.last_used, key) for key, lease in self._bound.items() if not lease.users]
+        if not idle:
+            return False
+        _, key = min(idle)
+        self._drop(key)
+        return True
+
+    def _drop(self, key: tuple[str, str]) -> None:
+        lease = self._bound.pop(key)
+        self._stats["evicted"] += 1
+        self._spawn(lease.sandbox.kill())
+
+    async def _lease(self, key: tuple[str, str]) -> _Lease | None:
+        """
+        The sandbox bound to key, binding a fresh one if needed; None if the
+        pool is full. An idle bound sandbox past sandbox_max_age_seconds is
+        replaced here rather than left to the next reap, which may be a minute
+        away: E2B's timeout could stop it in the middle of this call.
+        """
+        lease = self._bound.get(key)
+        if lease is not None:
+            if lease.users or not self._expired(lease.created, time.monotonic()):
+                return lease
+            self._drop(key)
+        if len(self) >= settings.sandbox_pool_max and not self._warm and not self._evict_lru():
+            return None
+        sandbox, created = await self._take()
+        lease = self._bound.get(key)
+        if lease is not None:  # a concurrent first call bound one meanwhile
+            self._warm.append((sandbox, created))  # never ran code: still fresh
+            return lease
+        lease = self._bound[key] = _Lease(sandbox, created=created, last_used=time.monotonic())
+        return lease
+
+    async def run(self, user_id: str, conversation_id: str | None, code: str) -> Execution:
+        """
+        Run code in the conversation's sandbox, so state carries over from its
+        earlier calls. Without a conversation, or with the pool full of busy
+        sandboxes, a throwaway sandbox is used.
+        """
+        lease = await self._lease((user_id, conversation_id)) if conversation_id else None
+        if lease is None:
+            self._stats["throwaway"] += 1
+            sandbox, _ = await self._take()
+            try:
+                return await sandbox.run(code)
+            finally:
+                await sandbox.kill()
+
+        key = (user_id, conversation_id)
+        lease.users += 1
+        try:
+            async with lease.lock:
+                if lease.runs:
+                    self._stats["reuses"] += 1
+                lease.runs += 1
+                try:
+                    execution = await lease.sandbox.run(code)
+                except BaseException:
+                    # Failed or cancelled mid-run: its state is unknown, don't reuse it.
+                    lease.sandbox.alive = False
+                    raise
+                finally:
+                    lease.last_used = time.monotonic()
+                    if not lease.sandbox.alive and self._bound.get(key) is lease:
+                        self._drop(key)
+                return execution
+        finally:
+            lease.users -= 1
+
+    async def reap(self) -> None:
+        """Kill idle or expired bound sandboxes and warm ones too old to hand out; refill."""
+        now = time.monotonic()
+        for key, lease in list(self._bound.items()):
+            if not lease.users and (
+                now - lease.last_used > settings.sandbox_idle_seconds
+                or self._expired(lease.created, now)
+            ):
+                self._drop(key)
+        expired = [s for s, created in self._warm if self._too_old_to_hand_out(created, now)]
+        self._warm = [(s, c) for s, c in self._warm if s not in expired]
+        for sandbox in expired:
+            await sandbox.kill()
+        await self.fill()
+
+    async def _reap_forever(self) -> None:
+        while True:
+            await asyncio.sleep(min(60.0, settings.sandbox_idle_seconds / 2))
+            try:
+                await self.reap()
+            except Exception as e:  # noqa: BLE001 — keep reaping
+                logger.warning(f"Sandbox reap failed: {e}")
+
+    def start(self) -> None:
+        """Begin warming and reaping (API startup)."""
+        self._spawn(self.fill())
+        self._spawn(self._reap_forever())
+
+    async def aclose(self) -> None:
+        """Stop background work and kill every pooled sandbox."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        sandboxes = [s for s, _ in self._warm] + [lease.sandbox for lease in self._bound.values()]
+        self._warm, self._bound = [], {}
+        await asyncio.gather(*(s.kill() for s in sandboxes))
+
+    def stats(self) -> dict[str, int]:
+        return {**self._stats, "warm": len(self._warm), "bound": len(self._bound)}
+
+
+_pool: SandboxPool | None = None
+
+
+def get_pool() -> SandboxPool:
+    """The process-wide pool, on the configured backend."""
+    global _pool
+    if _pool is None:
+        create = LocalSandbox.create if settings.sandbox_backend == "local" else E2BSandbox.create
+        _pool = SandboxPool(create)
+    return _pool
+
+
+def configured() -> bool:
+    """Whether python_executor can run (E2B needs a key; local always can)."""
+    return settings.sandbox_backend == "local" or bool(settings.e2b_api_key)
+
+
+def stats() -> dict[str, int]:
+    """Pool counters since process start (exposed at /metrics)."""
+    return _pool.stats() if _pool is not None else {}
+
+
+async def aclose() -> None:
+    """Kill pooled sandboxes; called from app shutdown."""
+    global _pool
+    if _pool is not None:
+        await _pool.aclose()
+        _pool = None
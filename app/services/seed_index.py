@@ -0,0 +1,139 @@
+"""
+In-process exact index over the demo seed corpus.
+
+Every guest search also covers the seed user's documents. In SQL that is an
+`user_id = :user_id OR user_id = :seed_user_id` filter over the shared chunks
+table, re-ranking the same static corpus for every query. The corpus is small
+and only changes when scripts/seed_demo_corpus.py runs, so it is held here as
+a unit-normalized float32 matrix and searched with one matrix-vector product:
+sub-millisecond for a few thousand chunks, no database work.
+
+The matrix is loaded at API startup. The seed user's user_chunk_counts row,
+rewritten by every ingest, is the version: it is re-read at most every
+seed_index_check_seconds, and a change (a reseed) reloads the matrix.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Sequence
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.services.ingestion import merge_chunks
+
+logger = logging.getLogger(__name__)
+
+_VERSION_SQL = text(
+    "SELECT chunk_count, updated_at FROM user_chunk_counts WHERE user_id = :user_id"
+)
+
+_LOAD_SQL = text("""
+    SELECT c.content, c.chunk_index, c.document_id, d.filename, c.embedding::text AS embedding
+    FROM chunks c JOIN documents d ON d.id = c.document_id
+    WHERE c.user_id = :user_id
+    ORDER BY c.document_id, c.chunk_index
+""")
+
+
+class SeedIndex:
+    """The seed corpus as parallel lists plus a normalized embedding matrix."""
+
+    def __init__(self, rows: Sequence, version: tuple | None):
+        self.version = version
+        self.contents = [row.content for row in rows]
+        self.document_ids = [row.document_id for row in rows]
+        self.filenames = [row.filename for row in rows]
+        self.chunk_indexes = [row.chunk_index for row in rows]
+        # (document_id, chunk_index) -> row, for neighbour context.
+        self._positions = {
+            (doc, index): i for i, (doc, index) in enumerate(zip(self.document_ids, self.chunk_indexes))
+        }
+        if rows:
+            matrix = np.array([json.loads(row.embedding) for row in rows], dtype=np.float32)
+            self.matrix = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+        else:
+            self.matrix = np.zeros((0, settings.embedding_dimensions), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def _context(self, i: int, neighbors: int) -> str:
+        doc, index = self.document_ids[i], self.chunk_indexes[i]
+        window = [
+            self.contents[self._positions[(doc, n)]]
+            for n in range(index - neighbors, index + neighbors + 1)
+            if (doc, n) in self._positions
+        ]
+        return merge_chunks(window)
+
+    def search(self, query: list[float], k: int, neighbors: int = 0) -> list[tuple[dict, np.ndarray]]:
+        """
+        The k chunks most cosine-similar to `query`, best first, as
+        (hit, unit vector) pairs; hits have the same keys as retrieval's.
+        """
+        if not len(self) or k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32)
+        scores = self.matrix @ (q / (np.linalg.norm(q) + 1e-12))
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (
+                {
+                    "content": self.contents[i],
+                    "similarity": float(scores[i]),
+                    "context": self._context(i, neighbors),
+                    "document_id": self.document_ids[i],
+                    "filename": self.filenames[i],
+                },
+                self.matrix[i],
+            )
+            for i in top
+        ]
+
+
+_index: SeedIndex | None = None
+_checked_at = 0.0
+_lock = asyncio.Lock()
+
+
+async def _version(db: AsyncSession) -> tuple | None:
+    row = (await db.execute(_VERSION_SQL, {"user_id": settings.seed_user_id})).first()
+    return tuple(row) if row else None
+
+
+async def load(db: AsyncSession) -> SeedIndex:
+    """(Re)build the index from the database (API startup, or after a reseed)."""
+    global _index, _checked_at
+    version = await _version(db)
+    rows = (await db.execute(_LOAD_SQL, {"user_id": settings.seed_user_id})).fetchall()
+    _index = SeedIndex(rows, version)
+    _checked_at = time.monotonic()
+    logger.info(f"Seed index loaded: {len(_index)} chunks")
+    return _index
+
+
+async def get_seed_index(db: AsyncSession) -> SeedIndex:
+    """The current index, reloaded first if the seed corpus changed."""
+    global _checked_at
+    if _index is not None and time.monotonic() - _checked_at < settings.seed_index_check_seconds:
+        return _index
+    async with _lock:  # one reload, however many guest searches are waiting
+        if _index is None:
+            return await load(db)
+        if time.monotonic() - _checked_at >= settings.seed_index_check_seconds:
+            if await _version(db) != _index.version:
+                return await load(db)
+            _checked_at = time.monotonic()
+    return _index
+
+
+def clear() -> None:
+    """Forget the index; the next guest search reloads it."""
+    global _index, _checked_at
+    _index, _checked_at = None, 0.0
@@ -1,80 +1,254 @@
+"""
+File storage behind one async interface: S3 in production, the local
+filesystem in development (S3_BUCKET_NAME unset).
+
+The S3 backend shares a single boto3 client — clients are thread-safe and
+keep a connection pool (s3_max_pool_connections) — and runs its calls on
+worker threads via asyncio.to_thread, so uploads and downloads never block
+the event loop and never pay for a fresh client or TLS handshake per call.
+"""
+import asyncio
 import os
 import logging
+import tempfile
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterable, AsyncIterator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
 
 import boto3
-from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 from app.config import settings
+from app.services.pdf_extract import PdfSource
 
 logger = logging.getLogger(__name__)
 
 LOCAL_UPLOAD_DIR = "uploads"
 os.makedirs(LOCAL_UPLOAD_DIR, exist_ok=True)
 
+class StorageBackend(ABC):
+    """Where uploaded files live. Keys look like '{user_id}/{file_id}.pdf'."""
 
-def _get_s3_client():
-    """Get an S3 client. Uses IAM role credentials in ECS (no keys needed)."""
-    return boto3.client("s3", region_name=settings.aws_default_region)
+    @abstractmethod
+    async def save_stream(self, file_key: str, chunks: AsyncIterable[bytes]) -> str:
+        """
+        Store a stream of byte chunks without holding it all in memory.
+        Returns the path/key for later retrieval. If the stream raises, nothing
+        is left behind.
+        """
 
+    @abstractmethod
+    async def load(self, file_key: str) -> bytes:
+        """Read a whole stored file."""
 
-def save_file(file_content: bytes, file_key: str) -> str:
-    """
-    Save a file. Returns the path/key for later retrieval.
+    @abstractmethod
+    async def delete(self, file_key: str) -> None:
+        """Remove a stored file; a missing file is not an error."""
 
-    In production (S3_BUCKET_NAME set): uploads to S3.
-    In development (no bucket): saves to local filesystem.
-    """
-    if settings.s3_bucket_name:
-        s3 = _get_s3_client()
-        s3.put_object(
-            Bucket=settings.s3_bucket_name,
-            Key=file_key,
-            Body=file_content,
-        )
-        logger.info(f"Uploaded to S3: {file_key}")
-        return file_key
-    else:
-        local_path = os.path.join(LOCAL_UPLOAD_DIR, file_key)
+    @abstractmethod
+    def open_pdf_source(self, file_key: str) -> AbstractAsyncContextManager[PdfSource]:
+        """Yield (as an async context manager) something PyMuPDF can open directly."""
+
+    def file_key(self, storage_path: str) -> str:
+        """The key of a file from the path/key save_stream returned for it."""
+        return storage_path
+
+    async def save(self, file_key: str, content: bytes) -> str:
+        async def one_chunk() -> AsyncIterator[bytes]:
+            yield content
+
+        return await self.save_stream(file_key, one_chunk())
+
+
+class LocalStorage(StorageBackend):
+    """Development backend: files under LOCAL_UPLOAD_DIR."""
+
+    def _path(self, file_key: str) -> str:
+        return os.path.join(LOCAL_UPLOAD_DIR, file_key)
+
+    def file_key(self, storage_path: str) -> str:
+        return os.path.relpath(storage_path, LOCAL_UPLOAD_DIR)
+
+    async def save_stream(self, file_key: str, chunks: AsyncIterable[bytes]) -> str:
+        local_path = self._path(file_key)
         os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        with open(local_path, "wb") as f:
-            f.write(file_content)
+        try:
+            with open(local_path, "wb") as f:
+                async for chunk in chunks:
+                    await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            os.remove(local_path)
+            raise
         logger.info(f"Saved locally: {local_path}")
         return local_path
 
+    async def load(self, file_key: str) -> bytes:
+        with open(self._path(file_key), "rb") as f:
+            return await asyncio.to_thread(f.read)
+
+    async def delete(self, file_key: str) -> None:
+        try:
+            os.remove(self._path(file_key))
+        except FileNotFoundError:
+            pass
+
+    @asynccontextmanager
+    async def open_pdf_source(self, file_key: str) -> AsyncIterator[PdfSource]:
+        # Already on disk: hand PyMuPDF the stored file itself, no copy.
+        yield self._path(file_key)
+
+
+class S3Storage(StorageBackend):
+    """Production backend: one pooled boto3 client, calls run off the event loop."""
 
-def load_file(file_key: str) -> bytes:
-    """
-    Load a file by its key/path.
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+        self._client = boto3.client(
+            "s3",
+            region_name=settings.aws_default_region,  # IAM role credentials in ECS
+            config=Config(max_pool_connections=settings.s3_max_pool_connections),
+        )
+        self._transfer = TransferConfig(
+            multipart_threshold=settings.s3_transfer_chunk_bytes,
+            multipart_chunksize=settings.s3_transfer_chunk_bytes,
+            max_concurrency=settings.s3_transfer_max_concurrency,
+        )
+
+    async def _call(self, method: str, **kwargs):
+        return await asyncio.to_thread(getattr(self._client, method), **kwargs)
+
+    async def save_stream(self, file_key: str, chunks: AsyncIterable[bytes]) -> str:
+        """
+        Multipart upload, one part per s3_transfer_chunk_bytes buffered.
+
+        Only the part being filled is held in memory. A stream shorter than
+        one part is sent as a single put_object; a failed multipart upload is
+        aborted so S3 doesn't keep (and bill for) orphaned parts.
+        """
+        part_size = settings.s3_transfer_chunk_bytes
+        buffer = bytearray()
+        upload_id: str | None = None
+        parts: list[dict] = []
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                while len(buffer) >= part_size:
+                    if upload_id is None:
+                        response = await self._call(
+                            "create_multipart_upload", Bucket=self.bucket, Key=file_key
+                        )
+                        upload_id = response["UploadId"]
+                    part, buffer = bytes(buffer[:part_size]), buffer[part_size:]
+                    parts.append(await self._upload_part(file_key, upload_id, len(parts) + 1, part))
+
+            if upload_id is None:
+                await self._call("put_object", Bucket=self.bucket, Key=file_key, Body=bytes(buffer))
+            else:
+                if buffer:
+                    parts.append(
+                        await self._upload_part(file_key, upload_id, len(parts) + 1, bytes(buffer))
+                    )
+                await self._call(
+                    "complete_multipart_upload",
+                    Bucket=self.bucket,
+                    Key=file_key,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+        except BaseException:
+            if upload_id is not None:
+                await self._call(
+                    "abort_multipart_upload", Bucket=self.bucket, Key=file_key, UploadId=upload_id
+                )
+            raise
+        logger.info(f"Uploaded to S3: {file_key}")
+        return file_key
 
-    Automatically detects S3 vs local based on config.
-    """
-    if settings.s3_bucket_name:
-        s3 = _get_s3_client()
-        response = s3.get_object(
-            Bucket=settings.s3_bucket_name,
+    async def _upload_part(self, file_key: str, upload_id: str, number: int, body: bytes) -> dict:
+        response = await self._call(
+            "upload_part",
+            Bucket=self.bucket,
             Key=file_key,
+            UploadId=upload_id,
+            PartNumber=number,
+            Body=body,
         )
-        return response["Body"].read()
-    else:
-        with open(os.path.join(LOCAL_UPLOAD_DIR, file_key), "rb") as f:
-            return f.read()
-
-
-def get_local_path(file_key: str) -> str:
-    """
-    Get a local file path for processing.
-
-    For S3: downloads to a temp location and returns that path.
-    For local: returns the path directly.
-
-    The caller should clean up the temp file after processing.
-    """
-    if settings.s3_bucket_name:
-        import tempfile
-        content = load_file(file_key)
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        tmp.write(content)
-        tmp.close()
-        return tmp.name
-    else:
-        return os.path.join(LOCAL_UPLOAD_DIR, file_key)
\ No newline at end of file
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    async def load(self, file_key: str) -> bytes:
+        response = await self._call("get_object", Bucket=self.bucket, Key=file_key)
+        return await asyncio.to_thread(response["Body"].read)
+
+    async def delete(self, file_key: str) -> None:
+        await self._call("delete_object", Bucket=self.bucket, Key=file_key)
+
+    @asynccontextmanager
+    async def open_pdf_source(self, file_key: str) -> AsyncIterator[PdfSource]:
+        """
+        Each ingest makes at most one copy of the object:
+          - up to pdf_memory_max_bytes: the object body, read once into memory
+            (pdf_extract writes it to a local temp file before fanning it out
+            to its process pool, rather than pickling it into every task);
+          - larger: a spill file written by boto3's ranged, concurrent GETs
+            (s3_transfer_chunk_bytes parts), never held in memory as a whole.
+            MuPDF reads the spill file lazily by path; it is deleted on exit.
+        """
+        head = await self._call("head_object", Bucket=self.bucket, Key=file_key)
+        if head["ContentLength"] <= settings.pdf_memory_max_bytes:
+            yield await self.load(file_key)
+            return
+
+        fd, spill_path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        try:
+            await asyncio.to_thread(
+                self._client.download_file,
+                self.bucket,
+                file_key,
+                spill_path,
+                Config=self._transfer,
+            )
+            yield spill_path
+        finally:
+            os.remove(spill_path)
+
+
+_storage: StorageBackend | None = None
+
+
+def get_storage() -> StorageBackend:
+    """The process-wide backend (S3 when S3_BUCKET_NAME is set)."""
+    global _storage
+    if _storage is None:
+        _storage = S3Storage(settings.s3_bucket_name) if settings.s3_bucket_name else LocalStorage()
+    return _storage
+
+
+async def save_file(file_content: bytes, file_key: str) -> str:
+    """Save a file. Returns the path/key for later retrieval."""
+    return await get_storage().save(file_key, file_content)
+
+
+async def save_stream(file_key: str, chunks: AsyncIterable[bytes]) -> str:
+    """Stream chunks to storage a part at a time. Returns the path/key."""
+    return await get_storage().save_stream(file_key, chunks)
+
+
+async def load_file(file_key: str) -> bytes:
+    """Load a file by its key/path."""
+    return await get_storage().load(file_key)
+
+
+async def delete_file(file_key: str) -> None:
+    await get_storage().delete(file_key)
+
+
+def file_key_for(storage_path: str) -> str:
+    """The key of a stored file, given the storage_path recorded for it."""
+    return get_storage().file_key(storage_path)
+
+
+def open_pdf_source(file_key: str) -> AbstractAsyncContextManager[PdfSource]:
+    """Async context manager yielding a path or bytes PyMuPDF can open directly."""
+    return get_storage().open_pdf_source(file_key)
@@ -0,0 +1,143 @@
+"""
+Streaming multipart/form-data parsing for document uploads.
+
+Declaring `file: UploadFile = File(...)` makes Starlette parse the whole
+request body — spooling it to memory/disk — before the handler even runs, so
+a size limit can only be checked after the damage is done. MultipartFileStream
+instead feeds request.stream() through python-multipart's incremental parser
+and hands the file part's bytes to the caller as they arrive, hashing and
+counting them on the way, so an upload can be piped straight into storage and
+cut off with a 413 the moment it crosses the limit.
+"""
+import hashlib
+from collections.abc import AsyncIterator
+
+from fastapi import HTTPException, Request
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+# Allowance for boundaries and part headers when checking Content-Length.
+_MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+class MultipartFileStream:
+    """
+    The first file part named `field_name` of a multipart request, as a stream.
+
+    Call start() to read up to the part's headers and get its filename, then
+    iterate chunks() for its content. After chunks() is exhausted, `size` and
+    `sha256` (hex digest of the content) describe the whole file.
+    """
+
+    def __init__(self, request: Request, max_bytes: int, field_name: str = "file"):
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload.")
+
+        self.max_bytes = max_bytes
+        # Reject before reading a byte when the client declares an oversize body.
+        declared = request.headers.get("content-length", "")
+        if declared.isdigit() and int(declared) > max_bytes + _MULTIPART_OVERHEAD_BYTES:
+            raise self._too_large()
+
+        self.field_name = field_name
+        self.filename: str | None = None
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._body = request.stream()
+        self._ready: list[bytes] = []  # file bytes produced by the last parser write
+        self._in_file = False
+        self._file_done = False
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._parser = MultipartParser(
+            params[b"boundary"],
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"File exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit.",
+        )
+
+    # --- parser callbacks -------------------------------------------------
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        if self.filename is not None:
+            return
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name") == self.field_name.encode() and b"filename" in options:
+            self.filename = options[b"filename"].decode("utf-8", errors="replace")
+            self._in_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._ready.append(bytes(data[start:end]))
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    # --- consumption ------------------------------------------------------
+
+    async def _feed(self) -> bool:
+        """Push the next chunk of the request body through the parser."""
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            return False
+        if chunk:
+            self._parser.write(chunk)
+        return True
+
+    async def start(self) -> str:
+        """Read until the file part's headers; returns its filename."""
+        while self.filename is None:
+            if not await self._feed():
+                raise HTTPException(
+                    status_code=400, detail=f"Missing '{self.field_name}' file field."
+                )
+        return self.filename
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """The file's content as it arrives. Raises HTTPException(413) past max_bytes."""
+        while True:
+            ready, self._ready = self._ready, []
+            for data in ready:
+                self.size += len(data)
+                if self.size > self.max_bytes:
+                    raise self._too_large()
+                self._hash.update(data)
+                yield data
+            if self._file_done:
+                return
+            if not await self._feed():
+                raise HTTPException(status_code=400, detail="Upload ended before the file was complete.")
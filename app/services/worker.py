@@ -6,6 +6,7 @@ from arq.cron import cron
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 from app.config import settings
+from app.services import http_clients, pdf_extract
 
 logger = logging.getLogger(__name__)
 
@@ -16,38 +17,71 @@ async def process_document(
     file_path: str,
     filename: str,
     user_id: str,
+    reingest: bool = False,
+    storage_path: str | None = None,
+    content_hash: str | None = None,
+    previous_status: str = "ready",
 ):
     """
     Background job: run the full ingestion pipeline for a document.
 
     This is the same logic that was in the upload endpoint,
-    but now runs in a separate worker process.
+    but now runs in a separate worker process. With reingest=True the
+    document already has chunks from an earlier revision, and only the
+    chunks that changed in file_path are re-embedded; storage_path and
+    content_hash are the new revision's, recorded once it succeeds. If it
+    fails, the previous revision keeps being served under previous_status
+    and the new file is deleted.
     """
     # Import here to avoid circular imports
-    from app.services.ingestion import ingest_document_background
+    from app.services.ingestion import (
+        ingest_document_background,
+        reingest_document_background,
+    )
 
     db_session = ctx["db_session"]
 
     try:
         async with db_session() as db:
-            await ingest_document_background(
-                db, document_id, file_path, filename, user_id
-            )
+            if reingest:
+                await reingest_document_background(
+                    db, document_id, file_path, storage_path, content_hash
+                )
+            else:
+                await ingest_document_background(
+                    db, document_id, file_path, filename, user_id
+                )
         logger.info(f"Document processed successfully: {filename} ({document_id})")
     except Exception as e:
         logger.error(f"Document processing failed: {document_id} — {e}", exc_info=True)
-        # Mark document as failed
+        # Mark document as failed and drop any chunk slices already committed,
+        # recounting the user's chunks: another ingest may have counted them.
+        # A failed re-ingest commits nothing, so the previous revision's
+        # chunks, file and hash are still in place and still served: the
+        # document goes back to the status it had, and the new file goes.
         async with db_session() as db:
-            from app.models import Document
-            from sqlalchemy import select
+            from app.models import Chunk, Document
+            from app.services.chunk_counts import refresh_chunk_count
+            from app.services.storage import delete_file
+            from sqlalchemy import delete, select
 
             result = await db.execute(
                 select(Document).where(Document.id == document_id)
             )
             doc = result.scalar_one_or_none()
             if doc:
-                doc.status = "failed"
+                if reingest:
+                    doc.status = previous_status
+                else:
+                    await db.execute(delete(Chunk).where(Chunk.document_id == doc.id))
+                    await refresh_chunk_count(db, doc.user_id)
+                    doc.status = "failed"
                 await db.commit()
+        if reingest:
+            try:
+                await delete_file(file_path)
+            except Exception as cleanup_error:
+                logger.warning(f"Could not delete failed revision {file_path}: {cleanup_error}")
 
 
 async def extract_memories_job(
@@ -105,7 +139,7 @@ async def extract_memories_job(
 
 async def cleanup_expired_guests(ctx: dict):
     """Hourly job: delete guest users older than guest_session_duration_hours."""
-    from app.models import User, Document, Conversation, Memory
+    from app.models import User, Document, Conversation, Memory, UserChunkCount
     from sqlalchemy import select, delete
 
     db_session = ctx["db_session"]
@@ -126,6 +160,7 @@ async def cleanup_expired_guests(ctx: dict):
         await db.execute(delete(Memory).where(Memory.user_id.in_(expired_ids)))
         await db.execute(delete(Document).where(Document.user_id.in_(expired_ids)))
         await db.execute(delete(Conversation).where(Conversation.user_id.in_(expired_ids)))
+        await db.execute(delete(UserChunkCount).where(UserChunkCount.user_id.in_(expired_ids)))
         for u in expired:
             await db.delete(u)
 
@@ -137,11 +172,19 @@ async def startup(ctx: dict):
     """Called when the worker starts. Set up shared resources."""
     engine = create_async_engine(settings.database_url, echo=False)
     ctx["db_session"] = async_sessionmaker(engine, expire_on_commit=False)
+    # PyMuPDF is CPU-bound; extracting on the loop would stall every other job.
+    pdf_extract.start_pool(settings.pdf_extract_processes)
+    http_clients.start()
     logger.info("Worker started")
 
 
 async def shutdown(ctx: dict):
     """Called when the worker stops. Clean up."""
+    from app.services import embedding_cache
+
+    await embedding_cache.aclose()
+    await http_clients.aclose()
+    pdf_extract.shutdown_pool()
     logger.info("Worker shutting down")
 
 
@@ -17,6 +17,7 @@ class ToolContext:
     user_id: str
     db: AsyncSession
     is_guest: bool = False
+    conversation_id: str | None = None
 
 
 class Tool(ABC):
@@ -28,6 +29,12 @@ class Tool(ABC):
       - description: a human-readable description the LLM sees in the tool list
       - parameters: a JSON Schema describing the arguments
       - execute(): the actual implementation
+      - uses_db: True if execute() queries through ctx.db
+
+    The agent runs the tool calls of one model turn concurrently and cancels
+    any that outlive the turn's deadline. An AsyncSession can't serve concurrent
+    queries or survive a cancelled one, so a tool with uses_db set always gets
+    a session of its own, committed when it returns.
 
     The LLM sees `name`, `description`, and `parameters` when deciding whether
     to invoke a tool. Make the description specific — vague descriptions lead
@@ -37,6 +44,7 @@ class Tool(ABC):
     name: str
     description: str
     parameters: dict[str, Any]
+    uses_db: bool = False
 
     @abstractmethod
     async def execute(self, ctx: ToolContext, args: dict[str, Any]) -> str:
@@ -1,6 +1,8 @@
 import logging
 
-from app.services.retrieval import retrieve_relevant_chunks
+from app.config import settings
+from app.services.rerank import rerank
+from app.services.retrieval import RETRIEVAL_MODES, adaptive_cutoff, retrieve_relevant_chunks
 from app.tools import register_tool
 from app.tools.base import Tool, ToolContext
 
@@ -13,7 +15,8 @@ class DocumentSearchTool(Tool):
         "Search the user's uploaded document library — resumes, job descriptions, "
         "offer letters, sourcing notes, and candidate profiles. Use this when the user "
         "asks about a specific candidate, role, or document they have uploaded. "
-        "Returns the most relevant passages with similarity scores."
+        "Returns the most relevant passages, with their surrounding text, source "
+        "document names, and similarity scores."
     )
     parameters = {
         "type": "object",
@@ -24,26 +27,51 @@ class DocumentSearchTool(Tool):
             },
             "top_k": {
                 "type": "integer",
-                "description": "Number of results to return (1-10).",
+                "description": "Maximum number of results to return (1-10); weak matches are left out.",
                 "default": 5,
             },
+            "mode": {
+                "type": "string",
+                "enum": list(RETRIEVAL_MODES),
+                "description": (
+                    "'vector' matches by meaning. 'hybrid' also matches exact words — "
+                    "use it when the query contains names, identifiers, or numbers."
+                ),
+                "default": "vector",
+            },
         },
         "required": ["query"],
     }
+    uses_db = True
 
     async def execute(self, ctx: ToolContext, args: dict) -> str:
         query = args["query"]
         top_k = max(1, min(10, args.get("top_k", 5)))
+        mode = args.get("mode", "vector")
+        if mode not in RETRIEVAL_MODES:
+            mode = "vector"
 
-        logger.info(f"Document search: {query} (user={ctx.user_id})")
+        logger.info(f"Document search ({mode}): {query} (user={ctx.user_id})")
 
+        # With reranking on, over-fetch and let the reranker pick the top_k.
+        fetch_k = max(top_k, settings.rerank_candidates) if settings.rerank_enabled else top_k
         chunks = await retrieve_relevant_chunks(
             db=ctx.db,
             query=query,
             user_id=ctx.user_id,
-            top_k=top_k,
+            top_k=fetch_k,
             include_seed=ctx.is_guest,
+            mode=mode,
+            neighbors=settings.retrieval_context_neighbors,
+            # The reranker orders the over-fetched candidates itself, and the
+            # cutoff then applies to what it picked.
+            mmr_lambda=None if settings.rerank_enabled else settings.retrieval_mmr_lambda,
+            adaptive=settings.retrieval_adaptive_cutoff and not settings.rerank_enabled,
         )
+        if settings.rerank_enabled:
+            chunks = await rerank(query, chunks, top_k)
+            if settings.retrieval_adaptive_cutoff:
+                chunks = adaptive_cutoff(chunks)
 
         if not chunks:
             return "No relevant documents found in your library."
@@ -51,8 +79,8 @@ class DocumentSearchTool(Tool):
         formatted = []
         for i, chunk in enumerate(chunks, 1):
             formatted.append(
-                f"[Result {i}, relevance {chunk['similarity']:.2f}]\n"
-                f"{chunk['content']}"
+                f"[Result {i}, relevance {chunk['similarity']:.2f}, from {chunk['filename']}]\n"
+                f"{chunk['context']}"
             )
 
         return "\n\n---\n\n".join(formatted)
@@ -42,6 +42,7 @@ class MemorySaveTool(Tool):
         },
         "required": ["fact"],
     }
+    uses_db = True
 
     async def execute(self, ctx: ToolContext, args: dict) -> str:
         fact = args["fact"].strip()
@@ -34,6 +34,7 @@ class MemorySearchTool(Tool):
         },
         "required": ["query"],
     }
+    uses_db = True
 
     async def execute(self, ctx: ToolContext, args: dict) -> str:
         query = args["query"]
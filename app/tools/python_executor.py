@@ -1,8 +1,6 @@
 import logging
 
-from e2b_code_interpreter import AsyncSandbox
-
-from app.config import settings
+from app.services import sandbox
 from app.tools import register_tool
 from app.tools.base import Tool, ToolContext
 
@@ -16,6 +14,7 @@ class PythonExecutorTool(Tool):
         "calculations, data analysis, plotting, or any task that benefits "
         "from code execution. The sandbox has numpy, pandas, matplotlib, "
         "scipy, and other standard data science libraries pre-installed. "
+        "Variables and files persist between calls in the same conversation. "
         "Returns stdout, stderr, and any errors. Print results with print() "
         "to capture them."
     )
@@ -37,49 +36,30 @@ class PythonExecutorTool(Tool):
         code = args["code"]
         logger.info(f"Python executor: {len(code)} chars (user={ctx.user_id})")
 
-        if not settings.e2b_api_key:
+        if not sandbox.configured():
             return "Error: Python executor is not configured."
 
-        # Create an ephemeral sandbox, run code, tear down.
-        # For a future optimization, we could keep sandboxes alive across
-        # tool calls within the same conversation — but that requires session
-        # tracking and cleanup logic. Ephemeral is simpler and correct.
-        sandbox = None
+        # Pooled: the conversation's own sandbox, so variables from its
+        # earlier calls are still defined (see app/services/sandbox.py).
         try:
-            sandbox = await AsyncSandbox.create(api_key=settings.e2b_api_key)
-            execution = await sandbox.run_code(code)
-
-            # Build a response that includes stdout, stderr, and any error.
-            # The LLM needs all of this to understand what happened.
-            parts = []
-
-            if execution.logs.stdout:
-                stdout_str = "".join(execution.logs.stdout)
-                parts.append(f"stdout:\n{stdout_str}")
-
-            if execution.logs.stderr:
-                stderr_str = "".join(execution.logs.stderr)
-                parts.append(f"stderr:\n{stderr_str}")
-
-            if execution.error:
-                parts.append(
-                    f"error:\n{execution.error.name}: {execution.error.value}"
-                )
-
-            if not parts:
-                parts.append("(no output)")
-
-            return "\n\n".join(parts)
-
+            execution = await sandbox.get_pool().run(ctx.user_id, ctx.conversation_id, code)
         except Exception as e:
             logger.error(f"Python executor failed: {e}", exc_info=True)
             return f"Error: Failed to execute code: {e}"
-        finally:
-            if sandbox:
-                try:
-                    await sandbox.kill()
-                except Exception as e:
-                    logger.warning(f"Failed to kill sandbox: {e}")
+
+        # Build a response that includes stdout, stderr, and any error.
+        # The LLM needs all of this to understand what happened.
+        parts = []
+        if execution.stdout:
+            parts.append(f"stdout:\n{execution.stdout}")
+        if execution.stderr:
+            parts.append(f"stderr:\n{execution.stderr}")
+        if execution.error:
+            parts.append(f"error:\n{execution.error}")
+        if not parts:
+            parts.append("(no output)")
+
+        return "\n\n".join(parts)
 
 
 register_tool(PythonExecutorTool())
\ No newline at end of file
@@ -1,7 +1,6 @@
 import logging
 
-import httpx
-
+from app.services.http_clients import get_client
 from app.tools import register_tool
 from app.tools.base import Tool, ToolContext
 
@@ -34,12 +33,11 @@ class UrlReaderTool(Tool):
         url = args["url"].strip()
         logger.info(f"URL reader: {url}")
 
-        async with httpx.AsyncClient(timeout=20.0, follow_redirects=True) as client:
-            response = await client.get(
-                f"{JINA_BASE}/{url}",
-                headers={"Accept": "text/plain"},
-            )
-            response.raise_for_status()
+        response = await get_client("jina").get(
+            f"{JINA_BASE}/{url}",
+            headers={"Accept": "text/plain"},
+        )
+        response.raise_for_status()
 
         text = response.text.strip()
         if len(text) > MAX_CHARS:
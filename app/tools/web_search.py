@@ -11,6 +11,7 @@ from tavily.errors import (
 )
 
 from app.config import settings
+from app.services.http_clients import get_client
 from app.tools import register_tool
 from app.tools.base import Tool, ToolContext
 
@@ -52,7 +53,8 @@ class WebSearchTool(Tool):
             return "Error: Web search is not configured."
 
         try:
-            client = AsyncTavilyClient(api_key=settings.tavily_api_key)
+            # A thin wrapper; the pooled connection lives in the shared client.
+            client = AsyncTavilyClient(api_key=settings.tavily_api_key, client=get_client("tavily"))
             response = await client.search(
                 query=query,
                 max_results=max_results,
@@ -521,6 +521,10 @@ export default function ChatPage() {
             );
             clearInterval(uploadPollRef.current);
             uploadPollRef.current = null;
+          } else if (statusDoc.status === "empty") {
+            setUploadStatus(`No text found: ${statusDoc.filename} (scanned PDF?)`);
+            clearInterval(uploadPollRef.current);
+            uploadPollRef.current = null;
           } else if (statusDoc.status === "failed") {
             setUploadStatus(`Failed: ${statusDoc.filename}`);
             clearInterval(uploadPollRef.current);
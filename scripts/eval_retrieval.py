@@ -4,6 +4,7 @@ Two modes::
 
     python -m scripts.eval_retrieval --freeze   # regenerate tests/eval/frozen_vectors.json
     python -m scripts.eval_retrieval            # live eval against a real DB, prints a report
+    python -m scripts.eval_retrieval --mode hybrid   # same, with hybrid (vector + full-text) retrieval
 
 ``--freeze`` embeds the corpus + golden queries once via the production
 ``generate_embeddings`` path, writes the frozen vectors + a baseline block, and
@@ -31,7 +32,7 @@ from statistics import mean
 import numpy as np
 
 from app.eval.dataset import load_corpus, load_golden
-from app.eval.retrieval_eval import evaluate, rank_by_cosine
+from app.eval.retrieval_eval import calibrate_cutoffs, evaluate, evaluate_cutoff, rank_by_cosine
 
 EVAL_DIR = Path(__file__).resolve().parent.parent / "tests" / "eval"
 CORPUS_PATH = EVAL_DIR / "corpus.json"
@@ -130,33 +131,72 @@ def freeze() -> None:
     print(f"  hit_rate@3={metrics['hit_rate_at_3']:.6f}")
 
 
-async def _live_report() -> None:
+def report_offline_modes() -> None:
+    """Print offline metrics per retrieval mode and vector storage mode."""
+    from app.eval.retrieval_eval import load_frozen
+
+    corpus = load_corpus(CORPUS_PATH)
+    golden = load_golden(GOLDEN_PATH)
+    frozen = load_frozen(FROZEN_PATH)
+    print("Offline retrieval eval (frozen vectors)")
+    variants = [
+        ("vector", {"mode": "vector"}),
+        ("hybrid", {"mode": "hybrid"}),
+        ("halfvec", {"storage": "halfvec", "rescore_pool": 20}),
+        ("binary", {"storage": "binary", "rescore_pool": 20}),
+        ("512d", {"dimensions": 512}),
+        ("256d", {"dimensions": 256}),
+        ("mmr0.7", {"mmr_lambda": 0.7}),
+    ]
+    for label, kwargs in variants:
+        metrics = evaluate(frozen, golden, corpus=corpus, **kwargs)
+        print(
+            f"  {label:<7} MRR={metrics['mrr']:.4f} "
+            f"hit_rate@3={metrics['hit_rate_at_3']:.4f} hit_rate@5={metrics['hit_rate_at_5']:.4f}"
+        )
+
+    cutoffs = calibrate_cutoffs(frozen, golden)
+    metrics = evaluate_cutoff(frozen, golden, **cutoffs)
+    print(
+        f"Calibrated cutoffs: RETRIEVAL_MIN_SIMILARITY={cutoffs['min_similarity']} "
+        f"RETRIEVAL_RELATIVE_FLOOR={cutoffs['relative_floor']}"
+    )
+    print(
+        f"  cutoff  MRR={metrics['mrr']:.4f} hit_rate@5={metrics['hit_rate_at_5']:.4f} "
+        f"mean results={metrics['mean_results']:.2f} (of 5)"
+    )
+
+
+async def _live_report(mode: str = "vector") -> None:
     """Default mode: live embed + retrieve against a real DB, print a report."""
     from app.config import settings
     from app.database import async_session
-    from app.services.ingestion import generate_embeddings
-    from app.services.retrieval import retrieve_relevant_chunks
+    from app.eval.metrics import hit_rate_at_k, reciprocal_rank
+    from app.services.retrieval import retrieve_relevant_chunks_many
 
     corpus = load_corpus(CORPUS_PATH)
     golden = load_golden(GOLDEN_PATH)
     content_to_id = {text: cid for cid, text in corpus.items()}
 
-    rrs, hits3, hits5 = [], [], []
+    # Every golden query in one embedding call and one SQL round-trip.
     async with async_session() as db:
-        for case in golden:
-            chunks = await retrieve_relevant_chunks(
-                db, case.query, settings.seed_user_id, top_k=5, include_seed=True
-            )
-            ranked = [content_to_id.get(c["content"], "?") for c in chunks]
-            from app.eval.metrics import hit_rate_at_k, reciprocal_rank
-
-            rrs.append(reciprocal_rank(ranked, case.relevant_ids))
-            hits3.append(hit_rate_at_k(ranked, case.relevant_ids, 3))
-            hits5.append(hit_rate_at_k(ranked, case.relevant_ids, 5))
-
-    # Keep generate_embeddings referenced for the live path even if unused above.
-    _ = generate_embeddings
-    print("Live retrieval eval (real OpenAI + pgvector)")
+        results = await retrieve_relevant_chunks_many(
+            db,
+            [case.query for case in golden],
+            settings.seed_user_id,
+            top_k=5,
+            include_seed=True,
+            mode=mode,
+        )
+
+    rrs, hits3, hits5 = [], [], []
+    for case, chunks in zip(golden, results):
+        ranked = [content_to_id.get(c["content"], "?") for c in chunks]
+        rrs.append(reciprocal_rank(ranked, case.relevant_ids))
+        hits3.append(hit_rate_at_k(ranked, case.relevant_ids, 3))
+        hits5.append(hit_rate_at_k(ranked, case.relevant_ids, 5))
+
+    print(f"Live retrieval eval (real OpenAI + pgvector, mode={mode})")
     print(f"  queries     : {len(golden)}")
     print(f"  MRR         : {mean(rrs):.4f}")
     print(f"  hit_rate@3  : {mean(hits3):.4f}")
@@ -170,11 +210,27 @@ def main() -> None:
         action="store_true",
         help="Regenerate tests/eval/frozen_vectors.json and the committed baseline.",
     )
+    parser.add_argument(
+        "--mode",
+        choices=("vector", "hybrid"),
+        default="vector",
+        help="Retrieval mode for the live eval.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help=(
+            "Compare retrieval and storage modes and calibrate the similarity "
+            "cutoffs over the frozen vectors (no DB, no key)."
+        ),
+    )
     args = parser.parse_args()
     if args.freeze:
         freeze()
+    elif args.offline:
+        report_offline_modes()
     else:
-        asyncio.run(_live_report())
+        asyncio.run(_live_report(args.mode))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+"""
+Re-project stored embeddings to EMBEDDING_DIMENSIONS (Matryoshka truncation).
+
+Usage:
+    EMBEDDING_DIMENSIONS=512 uv run python -m scripts.reproject_embeddings
+
+text-embedding-3 vectors keep their meaning when cut to a prefix and
+L2-renormalized (the provider does exactly that for `dimensions=`), so
+existing chunks and memories can be shrunk in place instead of re-embedded:
+
+    ALTER COLUMN embedding TYPE vector(d)
+        USING l2_normalize(subvector(embedding, 1, d))
+
+This is the same transform as ingestion.fit_dimensions, so re-projected rows
+and newly embedded ones are directly comparable. Postgres rewrites each table
+and rebuilds its full-precision HNSW index under an exclusive lock, so run it
+in a maintenance window and restart the API and worker with the same
+EMBEDDING_DIMENSIONS afterwards. Compact indexes from scripts/vector_index.py
+encode the old size and are dropped; rebuild them once this finishes.
+
+Shrinking is lossy: going back to more dimensions means re-embedding
+(POST /documents/{id}/reingest per document). Requires pgvector >= 0.7.
+"""
+
+import asyncio
+
+from sqlalchemy import text
+
+TABLES = ("chunks", "memories")
+COMPACT_INDEXES = ("ix_chunks_embedding_halfvec_hnsw", "ix_chunks_embedding_bit_hnsw")
+
+
+async def current_dimensions(conn, table: str) -> int:
+    # pgvector keeps the declared size in the column's type modifier.
+    result = await conn.execute(
+        text(
+            "SELECT atttypmod FROM pg_attribute "
+            "WHERE attrelid = CAST(:table AS regclass) AND attname = 'embedding'"
+        ),
+        {"table": table},
+    )
+    return result.scalar_one()
+
+
+async def reproject() -> None:
+    from app.config import settings
+    from app.database import engine
+
+    target = settings.embedding_dimensions
+    async with engine.begin() as conn:
+        for table in TABLES:
+            current = await current_dimensions(conn, table)
+            if current == target:
+                print(f"{table}: already vector({target})")
+                continue
+            if current < target:
+                raise SystemExit(
+                    f"{table}: vector({current}) can't grow to {target}; re-embed instead"
+                )
+            if table == "chunks":
+                for index in COMPACT_INDEXES:
+                    await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+            print(f"{table}: vector({current}) -> vector({target}) ...")
+            await conn.execute(text(
+                f"ALTER TABLE {table} ALTER COLUMN embedding TYPE vector({target}) "
+                f"USING l2_normalize(subvector(embedding, 1, {target}))"
+            ))
+
+        result = await conn.execute(text("""
+            SELECT relname, pg_size_pretty(pg_total_relation_size(relid))
+            FROM pg_stat_user_tables
+            WHERE relname IN ('chunks', 'memories')
+            ORDER BY relname
+        """))
+        for table, size in result:
+            print(f"  {table}: {size}")
+    await engine.dispose()
+    print("Done. Rebuild any compact index with scripts.vector_index.")
+
+
+def main() -> None:
+    asyncio.run(reproject())
+
+
+if __name__ == "__main__":
+    main()
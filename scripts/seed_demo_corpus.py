@@ -44,7 +44,8 @@ async def seed(pdf_paths: list[Path]) -> None:
             sys.exit(1)
 
         doc_id = str(uuid.uuid4())
-        storage_path = await save_file(pdf_path.read_bytes(), doc_id, pdf_path.name)
+        file_key = f"{seed_clerk_id}/{doc_id}.pdf"
+        storage_path = await save_file(pdf_path.read_bytes(), file_key)
 
         async with async_session() as db:
             doc = Document(
@@ -57,7 +58,7 @@ async def seed(pdf_paths: list[Path]) -> None:
             db.add(doc)
             await db.commit()
 
-            await ingest_document_background(db, doc_id, storage_path, pdf_path.name, seed_clerk_id)
+            await ingest_document_background(db, doc_id, file_key, pdf_path.name, seed_clerk_id)
 
         print(f"Seeded: {pdf_path.name} (id={doc_id})")
 
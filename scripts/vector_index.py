@@ -0,0 +1,88 @@
+"""
+Build the chunks HNSW index for a vector storage mode.
+
+Usage:
+    uv run python -m scripts.vector_index halfvec
+    uv run python -m scripts.vector_index binary --drop-full
+
+The compact modes index an expression over the existing `embedding` column,
+so no data is rewritten and full-precision vectors stay available for
+rescoring:
+
+    halfvec  HNSW over embedding::halfvec(d)                  (~2x smaller)
+    binary   HNSW over binary_quantize(embedding)::bit(d)     (~32x smaller)
+
+After the index is built, set VECTOR_STORAGE_MODE to the same mode so
+retrieval walks it (then rescores on full vectors). --drop-full removes the
+float32 ix_chunks_embedding_hnsw index to reclaim its space; only do that once
+every API process runs with the compact mode. `full` rebuilds that index.
+
+Indexes are built CONCURRENTLY, so ingestion and search keep running.
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+INDEXES = {
+    "full": (
+        "ix_chunks_embedding_hnsw",
+        "embedding vector_cosine_ops",
+    ),
+    "halfvec": (
+        "ix_chunks_embedding_halfvec_hnsw",
+        "(embedding::halfvec({dims})) halfvec_cosine_ops",
+    ),
+    "binary": (
+        "ix_chunks_embedding_bit_hnsw",
+        "(binary_quantize(embedding)::bit({dims})) bit_hamming_ops",
+    ),
+}
+
+
+async def build(mode: str, drop_full: bool) -> None:
+    from app.config import settings
+    from app.database import engine
+
+    name, expression = INDEXES[mode]
+    expression = expression.format(dims=settings.embedding_dimensions)
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        print(f"Building {name} ...")
+        await conn.execute(text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON chunks "
+            f"USING hnsw ({expression}) WITH (m = 16, ef_construction = 64)"
+        ))
+        if drop_full and mode != "full":
+            print("Dropping ix_chunks_embedding_hnsw ...")
+            await conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_chunks_embedding_hnsw"))
+
+        result = await conn.execute(text("""
+            SELECT indexrelname, pg_size_pretty(pg_relation_size(indexrelid))
+            FROM pg_stat_user_indexes
+            WHERE relname = 'chunks' AND indexrelname LIKE 'ix_chunks_embedding%'
+            ORDER BY indexrelname
+        """))
+        for index_name, size in result:
+            print(f"  {index_name}: {size}")
+    await engine.dispose()
+    print(f"Done. Set VECTOR_STORAGE_MODE={mode} to search this index.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the chunks HNSW index for a storage mode")
+    parser.add_argument("mode", choices=sorted(INDEXES))
+    parser.add_argument(
+        "--drop-full",
+        action="store_true",
+        help="Drop the float32 HNSW index after building a compact one.",
+    )
+    args = parser.parse_args()
+    asyncio.run(build(args.mode, args.drop_full))
+
+
+if __name__ == "__main__":
+    main()
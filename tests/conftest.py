@@ -0,0 +1,24 @@
+"""Shared fixtures.
+
+The embedding and rerank caches and the seed index are process-global: without
+isolation, a text embedded in one test would be served from the LRU in the
+next, and tests that assert on the provider call would see none. Tests never
+talk to Redis.
+"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolate_embedding_cache(monkeypatch):
+    from app.config import settings
+    from app.services import embedding_cache, rerank, seed_index
+
+    monkeypatch.setattr(settings, "embedding_cache_redis_enabled", False)
+    embedding_cache.clear()
+    rerank.clear()
+    seed_index.clear()
+    yield
+    embedding_cache.clear()
+    rerank.clear()
+    seed_index.clear()
@@ -659,7 +659,7 @@ async def test_guest_non_openai_model_is_coerced_to_gpt_5_nano():
 
     responses_models = {}
 
-    async def fake_responses(db, user_id, input_messages, tools, api_key, model, is_guest, effort):
+    async def fake_responses(db, user_id, input_messages, tools, api_key, model, is_guest, effort, conversation_id=None):
         responses_models["model"] = model
         yield {"type": "done"}
 
@@ -0,0 +1,55 @@
+"""Tests for the binary COPY encoder behind the chunks/memories bulk write path.
+
+The byte layout must match what Postgres' COPY ... (FORMAT binary) expects,
+and vectors must match pgvector's own binary representation exactly.
+"""
+
+import struct
+import uuid
+from datetime import datetime
+
+from pgvector import Vector
+
+from app.services import bulk_insert
+
+
+def test_vector_encoding_matches_pgvector_binary_format():
+    values = [0.5, -1.25, 3.0, 0.0]
+    assert bulk_insert._encode_vector(values) == Vector(values).to_binary()
+
+
+def test_timestamp_encoding_is_microseconds_since_2000():
+    assert bulk_insert._encode_timestamp(datetime(2000, 1, 1)) == struct.pack("!q", 0)
+    assert bulk_insert._encode_timestamp(datetime(2000, 1, 2, 0, 0, 0, 5)) == struct.pack(
+        "!q", 86_400_000_000 + 5
+    )
+
+
+def test_copy_stream_has_header_tuples_and_trailer():
+    row_id = uuid.uuid4()
+    stream = bulk_insert.encode_copy_binary(
+        [(row_id, "héllo", 7, None)],
+        (bulk_insert._encode_uuid, bulk_insert._encode_text, bulk_insert._encode_int4, bulk_insert._encode_uuid),
+    )
+
+    header = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+    assert stream.startswith(header)
+    assert stream.endswith(struct.pack("!h", -1))
+
+    body = stream[len(header):-2]
+    expected = (
+        struct.pack("!h", 4)
+        + struct.pack("!i", 16) + row_id.bytes
+        + struct.pack("!i", len("héllo".encode())) + "héllo".encode()
+        + struct.pack("!i", 4) + struct.pack("!i", 7)
+        + struct.pack("!i", -1)
+    )
+    assert body == expected
+
+
+async def test_copy_rows_with_no_rows_does_not_touch_the_session():
+    class ExplodingSession:
+        async def connection(self):
+            raise AssertionError("empty COPY must not check out a connection")
+
+    await bulk_insert.copy_rows(ExplodingSession(), "chunks", (), (), [])
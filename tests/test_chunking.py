@@ -5,7 +5,7 @@ sentences, never exceed chunk_size (except an oversize single sentence that
 must be hard-split), carry whole-sentence overlap, and handle empty input.
 """
 
-from app.services.ingestion import chunk_text
+from app.services.ingestion import chunk_text, merge_chunks
 
 
 def test_empty_input_returns_an_empty_list():
@@ -91,3 +91,57 @@ def _trailing_sentences(chunk: str) -> list[str]:
     for i in range(len(parts)):
         suffixes.append(" ".join(parts[i:]))
     return suffixes
+
+
+# ---------------------------------------------------------------------------
+# Streaming pipeline: pages → sentences → chunks must match whole-text chunking
+# ---------------------------------------------------------------------------
+
+def test_streamed_pages_chunk_identically_to_joined_text():
+    from app.services.ingestion import iter_chunks, iter_sentences
+
+    pages = [
+        "First page opens here. It has a sentence that runs",
+        "onto the second page. Then a new thought.\n",
+        "\nA fresh paragraph after a page-spanning blank line. Done!",
+        "",
+        "Trailing text without a terminator",
+    ]
+    joined = "\n".join(pages)
+    streamed = list(iter_chunks(iter_sentences(pages), 60, 20))
+    assert streamed == chunk_text(joined, 60, 20)
+
+
+def test_iter_sentences_does_not_split_a_sentence_across_pages():
+    from app.services.ingestion import iter_sentences
+
+    sentences = list(iter_sentences(["The offer is valid", "until Friday. Sign it."]))
+    assert sentences == ["The offer is valid\nuntil Friday.", "Sign it."]
+
+
+def test_iter_chunks_is_lazy():
+    """Chunks are produced before the sentence stream is exhausted."""
+    from app.services.ingestion import iter_chunks
+
+    def sentences():
+        yield "Alpha sentence here."
+        yield "Beta sentence here."
+        yield "Gamma sentence here."
+        raise AssertionError("iter_chunks pulled more sentences than it needed")
+
+    chunks = iter_chunks(sentences(), 25, 0)
+    assert next(chunks) == "Alpha sentence here."
+
+
+def test_merging_consecutive_chunks_removes_the_overlap_seed():
+    sentences = [f"Sentence number {i} talks about topic {i % 7}." for i in range(40)]
+    chunks = chunk_text(" ".join(sentences), chunk_size=200, overlap=60)
+
+    assert len(chunks) > 3
+    assert merge_chunks(chunks) == " ".join(sentences)
+    assert merge_chunks(chunks[1:3]) in " ".join(sentences)
+
+
+def test_merging_chunks_without_overlap_joins_them():
+    assert merge_chunks(["Alpha beta.", "Gamma delta."]) == "Alpha beta. Gamma delta."
+    assert merge_chunks([]) == ""
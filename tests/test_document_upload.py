@@ -1,7 +1,14 @@
-"""Tests for Redis pool reuse in document upload endpoint (WIRE-03)."""
+"""Tests for Redis pool reuse in document upload endpoint (WIRE-03), and for
+claiming a document for re-ingest."""
 
 import os
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
+from fastapi import HTTPException
+
+from app.routers import documents
 
 
 def _read_documents_source() -> str:
@@ -26,3 +33,46 @@ def test_upload_document_reads_pool_from_app_state():
     assert "request.app.state.redis_pool" in source, (
         "upload_document must use request.app.state.redis_pool, not create its own pool"
     )
+
+
+def _doc(status, content_hash="old-hash"):
+    return MagicMock(id=uuid.uuid4(), status=status, content_hash=content_hash, filename="doc.pdf")
+
+
+async def _reingest(*docs):
+    """Call reingest_document (rate limit unwrapped); the lookups return docs in turn."""
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=[MagicMock(scalar_one_or_none=MagicMock(return_value=d)) for d in docs])
+    db.commit = AsyncMock()
+    db.refresh = AsyncMock()
+    request = MagicMock()
+    request.app.state.redis_pool.enqueue_job = AsyncMock()
+    upload = MagicMock(sha256="new-hash")
+    with patch(
+        "app.routers.documents._stream_pdf_upload",
+        new_callable=AsyncMock,
+        return_value=(upload, "u1/new.pdf", "uploads/u1/new.pdf"),
+    ), patch("app.routers.documents.delete_file", new_callable=AsyncMock) as mock_delete:
+        try:
+            return await documents.reingest_document.__wrapped__(request, docs[0].id, "u1", db), mock_delete, request
+        except HTTPException as e:
+            return e, mock_delete, request
+
+
+async def test_reingest_claims_the_document_after_the_upload():
+    doc = _doc("ready")
+    result, mock_delete, request = await _reingest(doc, doc)
+
+    assert result is doc and doc.status == "processing"
+    enqueue = request.app.state.redis_pool.enqueue_job
+    assert enqueue.await_args.kwargs["previous_status"] == "ready"
+    mock_delete.assert_not_awaited()
+
+
+async def test_concurrent_reingest_that_loses_the_claim_is_rejected_and_its_upload_deleted():
+    before, claimed_meanwhile = _doc("ready"), _doc("processing")
+    result, mock_delete, request = await _reingest(before, claimed_meanwhile)
+
+    assert isinstance(result, HTTPException) and result.status_code == 409
+    mock_delete.assert_awaited_once_with("u1/new.pdf")
+    request.app.state.redis_pool.enqueue_job.assert_not_awaited()
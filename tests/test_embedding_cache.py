@@ -0,0 +1,167 @@
+"""Tests for the content-addressed embedding cache in front of generate_embeddings.
+
+Cache hits must skip the provider entirely, only distinct misses may be sent,
+and a broken Redis tier must degrade to a miss instead of failing the caller.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.config import settings
+from app.services import embedding_cache
+from app.services.embedding_cache import LRUCache
+
+
+def _response_for(texts):
+    response = MagicMock()
+    response.data = [{"embedding": [float(len(t)), 1.0]} for t in texts]
+    return response
+
+
+def _fake_aembedding():
+    async def fake(model, input, api_key, **kwargs):
+        return _response_for(input)
+    return AsyncMock(side_effect=fake)
+
+
+async def test_repeated_texts_are_served_from_cache_without_a_provider_call():
+    from app.services.ingestion import generate_embeddings
+
+    with patch("app.services.ingestion.aembedding", new=_fake_aembedding()) as mock_aembedding:
+        first = await generate_embeddings(["alpha", "beta"])
+        second = await generate_embeddings(["beta", "alpha"])
+
+    assert mock_aembedding.await_count == 1
+    assert second == [first[1], first[0]]
+    stats = embedding_cache.stats()
+    assert stats["lru_hits"] == 2
+    assert stats["misses"] == 2
+
+
+async def test_only_distinct_misses_are_sent_to_the_provider():
+    from app.services.ingestion import generate_embeddings
+
+    with patch("app.services.ingestion.aembedding", new=_fake_aembedding()) as mock_aembedding:
+        await generate_embeddings(["cached"])
+        out = await generate_embeddings(["cached", "new", "new"])
+
+    assert mock_aembedding.await_args.kwargs["input"] == ["new"]
+    assert out[1] == out[2] == [3.0, 1.0]
+
+
+def test_cache_key_is_scoped_by_model_and_dimensions():
+    assert embedding_cache.cache_key("x", "m1", 1536) != embedding_cache.cache_key("x", "m2", 1536)
+    assert embedding_cache.cache_key("x", "m1", 1536) != embedding_cache.cache_key("x", "m1", 512)
+
+
+async def test_redis_hit_populates_lru_and_skips_provider(monkeypatch):
+    from app.services.ingestion import generate_embeddings
+
+    stored = embedding_cache._to_bytes([0.5, 0.25])
+    fake_redis = MagicMock()
+    fake_redis.mget = AsyncMock(return_value=[stored])
+    monkeypatch.setattr(settings, "embedding_cache_redis_enabled", True)
+    monkeypatch.setattr(embedding_cache, "_redis", fake_redis)
+    monkeypatch.setattr(embedding_cache, "_redis_skip_until", 0.0)
+
+    with patch("app.services.ingestion.aembedding", new_callable=AsyncMock) as mock_aembedding:
+        out = await generate_embeddings(["shared"])
+        again = await generate_embeddings(["shared"])
+
+    mock_aembedding.assert_not_awaited()
+    assert out == again == [[0.5, 0.25]]
+    assert fake_redis.mget.await_count == 1  # second lookup served by the LRU
+    assert embedding_cache.stats()["redis_hits"] == 1
+
+
+async def test_redis_errors_degrade_to_a_miss(monkeypatch):
+    from app.services.ingestion import generate_embeddings
+
+    fake_redis = MagicMock()
+    fake_redis.mget = AsyncMock(side_effect=ConnectionError("redis down"))
+    monkeypatch.setattr(settings, "embedding_cache_redis_enabled", True)
+    monkeypatch.setattr(embedding_cache, "_redis", fake_redis)
+    monkeypatch.setattr(embedding_cache, "_redis_skip_until", 0.0)
+
+    with patch("app.services.ingestion.aembedding", new=_fake_aembedding()):
+        out = await generate_embeddings(["text"])
+
+    assert out == [[4.0, 1.0]]
+    assert embedding_cache.stats()["redis_errors"] == 1
+    # Cool-off: the tier is skipped rather than retried on the next call.
+    assert embedding_cache._get_redis() is None
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1  # "b" is now least recently used
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+    assert lru.evictions == 1
+
+
+def test_lru_entries_expire_after_ttl():
+    lru = LRUCache(max_entries=10, ttl_seconds=60)
+    with patch("app.services.embedding_cache.time.monotonic", return_value=1000.0):
+        lru.set("k", "v")
+    with patch("app.services.embedding_cache.time.monotonic", return_value=1059.0):
+        assert lru.get("k") == "v"
+    with patch("app.services.embedding_cache.time.monotonic", return_value=1061.0):
+        assert lru.get("k") is None
+
+
+# ---------------------------------------------------------------------------
+# Per-user query-embedding cache (document_search / memory_search)
+# ---------------------------------------------------------------------------
+
+def _empty_db():
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(fetchall=MagicMock(return_value=[])))
+    return db
+
+
+async def test_repeated_document_search_query_skips_embedding_and_key_lookup():
+    from app.services import retrieval
+
+    db = _empty_db()
+    with patch(
+        "app.services.retrieval.get_user_api_key", new_callable=AsyncMock, return_value=None
+    ) as mock_key, patch(
+        "app.services.retrieval.generate_embeddings", new_callable=AsyncMock, return_value=[[0.1] * 4]
+    ) as mock_embed:
+        await retrieval.retrieve_relevant_chunks(db=db, query="Senior Engineer salary", user_id="u1")
+        await retrieval.retrieve_relevant_chunks(db=db, query="  senior engineer   SALARY ", user_id="u1")
+
+    assert mock_embed.await_count == 1
+    assert mock_key.await_count == 1
+    # Per call: the tenant-size lookup and the SQL search itself still run.
+    assert db.execute.await_count == 4
+    assert embedding_cache.query_stats()["hits"] == 1
+
+
+async def test_query_cache_is_scoped_per_user():
+    from app.services.memory import search_memories
+
+    db = _empty_db()
+    with patch(
+        "app.services.memory.get_user_api_key", new_callable=AsyncMock, return_value=None
+    ), patch(
+        "app.services.memory.generate_embeddings", new_callable=AsyncMock, return_value=[[0.1] * 4]
+    ) as mock_embed:
+        await search_memories(db=db, user_id="u1", query="project x")
+        await search_memories(db=db, user_id="u2", query="project x")
+
+    assert mock_embed.await_count == 2
+
+
+def test_query_cache_entries_expire(monkeypatch):
+    monkeypatch.setattr(embedding_cache._query_lru, "ttl_seconds", 60)
+    with patch("app.services.embedding_cache.time.monotonic", return_value=0.0):
+        embedding_cache.set_query("u1", "q", [1.0])
+    with patch("app.services.embedding_cache.time.monotonic", return_value=61.0):
+        assert embedding_cache.get_query("u1", "q") is None
+    assert embedding_cache.query_stats()["misses"] == 1
@@ -0,0 +1,133 @@
+"""Tests for the bounded-concurrency embedding scheduler used by ingestion.
+
+Batches must overlap up to max_in_flight, come back in input order regardless
+of completion order, and be retried with backoff when the provider returns 429.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import litellm
+import pytest
+
+from app.services import embedding_scheduler
+from app.services.embedding_cache import LRUCache
+from app.services.embedding_scheduler import (
+    EmbeddingScheduler,
+    TokenBucket,
+    get_embedding_scheduler,
+)
+from app.services.tokens import count_tokens
+
+
+def _rate_limit_error():
+    return litellm.RateLimitError(
+        message="slow down", llm_provider="openai", model="text-embedding-3-small"
+    )
+
+
+async def _collect(scheduler, batches, embed, lookup=None):
+    return [item async for item in scheduler.embed_batches(batches, embed, lookup)]
+
+
+async def test_results_are_yielded_in_input_order_when_batches_finish_out_of_order():
+    scheduler = EmbeddingScheduler(max_in_flight=4, tokens_per_minute=0, max_retries=0)
+    delays = {"a": 0.03, "b": 0.0, "c": 0.02, "d": 0.01}
+
+    async def embed(batch):
+        await asyncio.sleep(delays[batch[0]])
+        return [[float(ord(batch[0]))]]
+
+    results = await _collect(scheduler, [["a"], ["b"], ["c"], ["d"]], embed)
+    assert [batch for batch, _ in results] == [["a"], ["b"], ["c"], ["d"]]
+    assert [emb for _, emb in results] == [[[97.0]], [[98.0]], [[99.0]], [[100.0]]]
+
+
+async def test_in_flight_requests_never_exceed_the_limit():
+    scheduler = EmbeddingScheduler(max_in_flight=3, tokens_per_minute=0, max_retries=0)
+    in_flight = 0
+    peak = 0
+
+    async def embed(batch):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [[0.0]]
+
+    results = await _collect(scheduler, [[str(i)] for i in range(10)], embed)
+    assert len(results) == 10
+    assert peak == 3
+
+
+async def test_rate_limited_batch_is_retried_then_succeeds():
+    scheduler = EmbeddingScheduler(max_in_flight=2, tokens_per_minute=0, max_retries=3)
+    embed = AsyncMock(side_effect=[_rate_limit_error(), _rate_limit_error(), [[1.0]]])
+
+    with patch("app.services.embedding_scheduler.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        results = await _collect(scheduler, [["x"]], embed)
+
+    assert results == [(["x"], [[1.0]])]
+    assert embed.await_count == 3
+    assert mock_sleep.await_count == 2
+
+
+async def test_rate_limit_error_propagates_after_max_retries():
+    scheduler = EmbeddingScheduler(max_in_flight=2, tokens_per_minute=0, max_retries=1)
+    embed = AsyncMock(side_effect=_rate_limit_error())
+
+    with patch("app.services.embedding_scheduler.asyncio.sleep", new_callable=AsyncMock):
+        with pytest.raises(litellm.RateLimitError):
+            await _collect(scheduler, [["x"]], embed)
+
+    assert embed.await_count == 2
+
+
+async def test_token_bucket_waits_when_budget_is_exhausted():
+    bucket = TokenBucket(tokens_per_minute=600)  # 10 tokens/second
+    await bucket.acquire(600)
+
+    with patch("app.services.embedding_scheduler.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        mock_sleep.side_effect = lambda seconds: setattr(bucket, "tokens", bucket.capacity)
+        await bucket.acquire(50)
+
+    mock_sleep.assert_awaited()
+    assert mock_sleep.await_args.args[0] == pytest.approx(5.0, rel=0.1)
+
+
+def test_scheduler_is_shared_per_api_key():
+    assert get_embedding_scheduler("sk-a") is get_embedding_scheduler("sk-a")
+    assert get_embedding_scheduler("sk-a") is not get_embedding_scheduler("sk-b")
+    assert get_embedding_scheduler(None) is get_embedding_scheduler(None)
+
+
+async def test_cached_texts_are_served_without_spending_the_token_budget():
+    scheduler = EmbeddingScheduler(max_in_flight=2, tokens_per_minute=1_000_000, max_retries=0)
+    cache = {"hit one": [1.0], "hit two": [2.0]}
+
+    async def lookup(batch):
+        return [cache.get(text) for text in batch]
+
+    embed = AsyncMock(return_value=[[3.0]])
+    with patch.object(scheduler._budget, "acquire", new_callable=AsyncMock) as mock_acquire:
+        results = await _collect(
+            scheduler, [["hit one", "a miss", "a miss"], ["hit two", "hit one"]], embed, lookup
+        )
+
+    assert [emb for _, emb in results] == [[[1.0], [3.0], [3.0]], [[2.0], [1.0]]]
+    embed.assert_awaited_once_with(["a miss"])  # distinct misses only; the all-hit batch sends nothing
+    mock_acquire.assert_awaited_once_with(count_tokens("a miss"))
+
+
+def test_scheduler_registry_drops_least_recently_used_keys():
+    with patch.object(embedding_scheduler, "_schedulers", LRUCache(2)):
+        first = get_embedding_scheduler("sk-a")
+        get_embedding_scheduler("sk-b")
+        assert get_embedding_scheduler("sk-a") is first  # recently used again
+        get_embedding_scheduler("sk-c")  # evicts sk-b, not sk-a
+
+        assert get_embedding_scheduler("sk-a") is first
+        assert len(embedding_scheduler._schedulers) == 2
@@ -52,6 +52,34 @@ async def test_generate_embeddings_falls_back_to_system_key():
     )
 
 
+async def test_generate_embeddings_requests_configured_dimensions():
+    """text-embedding-3 can return shortened vectors; ask for the stored size."""
+    from app.services.ingestion import generate_embeddings
+
+    with patch.object(settings, "embedding_dimensions", 256), patch(
+        "app.services.ingestion.aembedding", new_callable=AsyncMock
+    ) as mock_aembedding:
+        mock_aembedding.return_value = MagicMock(data=[{"embedding": [0.1] * 256}])
+        result = await generate_embeddings(["hello"])
+
+    assert mock_aembedding.call_args.kwargs["dimensions"] == 256
+    assert len(result[0]) == 256
+
+
+async def test_generate_embeddings_truncates_when_dimensions_not_requested():
+    """Providers that ignore `dimensions` get their vectors cut and renormalized."""
+    from app.services.ingestion import generate_embeddings
+
+    with patch.object(settings, "embedding_dimensions", 2), patch.object(
+        settings, "embedding_request_dimensions", False
+    ), patch("app.services.ingestion.aembedding", new_callable=AsyncMock) as mock_aembedding:
+        mock_aembedding.return_value = MagicMock(data=[{"embedding": [3.0, 4.0, 12.0]}])
+        result = await generate_embeddings(["hello"])
+
+    assert "dimensions" not in mock_aembedding.call_args.kwargs
+    assert result == [[0.6, 0.8]]
+
+
 async def test_retrieve_relevant_chunks_resolves_user_key():
     """retrieve_relevant_chunks resolves the key via get_user_api_key and forwards it to generate_embeddings."""
     from app.services import retrieval
@@ -122,13 +122,14 @@ async def test_cleanup_expired_guests_deletes_expired():
         MagicMock(),  # delete Memory
         MagicMock(),  # delete Document
         MagicMock(),  # delete Conversation
+        MagicMock(),  # delete UserChunkCount
     ]
 
     ctx = {"db_session": _mock_session_factory(db)}
     await cleanup_expired_guests(ctx)
 
-    # 1 SELECT + 3 DELETE statements.
-    assert db.execute.await_count == 4
+    # 1 SELECT + 4 DELETE statements.
+    assert db.execute.await_count == 5
     db.delete.assert_awaited_once_with(expired_user)
     db.commit.assert_awaited_once()
 
@@ -0,0 +1,84 @@
+"""Tests for the shared outbound HTTP clients and the tools that use them.
+
+No request leaves the process: url_reader is pointed at an httpx
+MockTransport and Tavily's client is mocked.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from tavily import AsyncTavilyClient
+
+from app.services import http_clients
+from app.tools.base import ToolContext
+from app.tools.url_reader import UrlReaderTool
+from app.tools.web_search import WebSearchTool
+
+
+async def test_one_pooled_client_per_upstream_reused_until_closed():
+    with patch.object(http_clients.settings, "http_max_connections", 7):
+        http_clients.start()
+        jina = http_clients.get_client("jina")
+        assert http_clients.get_client("jina") is jina
+        assert http_clients.get_client("tavily") is not jina
+        assert jina._transport._pool._max_connections == 7
+        await http_clients.aclose()
+
+    assert jina.is_closed
+    assert http_clients.get_client("jina") is not jina
+    await http_clients.aclose()
+
+
+async def test_clients_speak_http2():
+    # Fails, instead of passing on HTTP/1.1, if the environment lacks h2.
+    assert http_clients.get_client("jina")._transport._pool._http2
+    await http_clients.aclose()
+
+
+def test_http2_without_h2_fails_loudly():
+    with patch.dict(sys.modules, {"h2": None}), pytest.raises(ImportError, match="h2"):
+        http_clients.get_client("jina")
+
+
+async def test_tavily_credentials_stay_on_the_tavily_client():
+    AsyncTavilyClient(api_key="tvly-secret", client=http_clients.get_client("tavily"))
+
+    assert "tvly-secret" in http_clients.get_client("tavily").headers["authorization"]
+    assert "authorization" not in http_clients.get_client("jina").headers
+    await http_clients.aclose()
+
+
+async def test_url_reader_uses_the_shared_client():
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, text="x" * 9000)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+    with patch("app.tools.url_reader.get_client", return_value=client) as mock_get:
+        first = await UrlReaderTool().execute(ctx, {"url": " https://example.com/a "})
+        await UrlReaderTool().execute(ctx, {"url": "https://example.com/b"})
+
+    assert requested == ["https://r.jina.ai/https://example.com/a", "https://r.jina.ai/https://example.com/b"]
+    assert first.endswith("[content truncated]")
+    assert not client.is_closed  # shared: a call must not close it
+    mock_get.assert_called_with("jina")
+    await client.aclose()
+
+
+async def test_web_search_hands_tavily_the_shared_client():
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+    with patch("app.tools.web_search.AsyncTavilyClient") as mock_cls, patch.object(
+        http_clients.settings, "tavily_api_key", "tvly-key"
+    ):
+        mock_cls.return_value.search = AsyncMock(return_value={"results": []})
+        await WebSearchTool().execute(ctx, {"query": "q"})
+
+    assert mock_cls.call_args.kwargs["client"] is http_clients.get_client("tavily")
+    await http_clients.aclose()
@@ -0,0 +1,246 @@
+"""Tests for the streaming ingestion pipeline (pages → chunks → batches → insert).
+
+The pipeline must embed and insert chunk batches as they are produced instead
+of materializing the whole document, while keeping chunk_index contiguous
+across batch boundaries.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import ingestion
+
+
+def test_iter_batches_groups_and_keeps_remainder():
+    assert list(ingestion.iter_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(ingestion.iter_batches([], 3)) == []
+
+
+async def test_embed_and_store_inserts_one_batch_per_embedding_call():
+    db = MagicMock()
+    db.commit = AsyncMock()
+    chunks = [f"chunk {i}" for i in range(5)]
+    doc_id = uuid.uuid4()
+
+    async def fake_embed(texts, api_key=None):
+        return [[float(len(t))] for t in texts]
+
+    with patch.object(ingestion, "EMBEDDING_BATCH_SIZE", 2), patch(
+        "app.services.ingestion.get_user_api_key", new_callable=AsyncMock, return_value=None
+    ), patch("app.services.ingestion._embed_uncached", side_effect=fake_embed) as mock_embed, patch(
+        "app.services.ingestion.copy_chunks", new_callable=AsyncMock
+    ) as mock_copy:
+        stored = await ingestion._embed_and_store_chunks(db, doc_id, "u1", iter(chunks))
+
+    assert stored == 5
+    assert mock_embed.call_count == 3
+    assert mock_copy.await_count == 3
+    rows = [row for call in mock_copy.await_args_list for row in call.args[1]]
+    assert [r["chunk_index"] for r in rows] == [0, 1, 2, 3, 4]
+    assert [r["content"] for r in rows] == chunks
+    assert all(r["document_id"] == doc_id and r["user_id"] == "u1" for r in rows)
+
+
+async def test_embed_and_store_with_no_chunks_makes_no_calls():
+    db = MagicMock()
+
+    with patch(
+        "app.services.ingestion.get_user_api_key", new_callable=AsyncMock, return_value=None
+    ), patch("app.services.ingestion._embed_uncached", new_callable=AsyncMock) as mock_embed, patch(
+        "app.services.ingestion.copy_chunks", new_callable=AsyncMock
+    ) as mock_copy:
+        stored = await ingestion._embed_and_store_chunks(db, uuid.uuid4(), "u1", iter([]))
+
+    assert stored == 0
+    mock_embed.assert_not_awaited()
+    mock_copy.assert_not_awaited()
+
+
+async def test_embed_and_store_commits_in_bounded_slices():
+    db = MagicMock()
+    db.commit = AsyncMock()
+
+    async def fake_embed(texts, api_key=None):
+        return [[0.0] for _ in texts]
+
+    with patch.object(ingestion, "EMBEDDING_BATCH_SIZE", 2), patch.object(
+        ingestion.settings, "ingest_commit_rows", 4
+    ), patch(
+        "app.services.ingestion.get_user_api_key", new_callable=AsyncMock, return_value=None
+    ), patch("app.services.ingestion._embed_uncached", side_effect=fake_embed), patch(
+        "app.services.ingestion.copy_chunks", new_callable=AsyncMock
+    ):
+        await ingestion._embed_and_store_chunks(db, uuid.uuid4(), "u1", iter(["c"] * 10))
+
+    # 10 rows, commit every >= 4 rows → after rows 4 and 8; the tail is left
+    # for the caller's final commit alongside the status change.
+    assert db.commit.await_count == 2
+
+
+def _stored_rows(contents):
+    """(id, chunk_index, content_hash) rows as the diff query returns them."""
+    return [(uuid.uuid4(), i, ingestion.chunk_hash(c)) for i, c in enumerate(contents)]
+
+
+async def test_reingest_only_embeds_changed_chunks_and_reindexes_the_rest():
+    old = ["intro", "section a", "section b", "outro"]
+    new = ["intro", "new section", "section b", "outro", "appendix"]
+    rows = _stored_rows(old)
+    select_result = MagicMock()
+    select_result.all.return_value = rows
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=[select_result, None, None])
+    db.commit = AsyncMock()
+
+    async def fake_embed(texts, api_key=None):
+        return [[0.0] for _ in texts]
+
+    with patch(
+        "app.services.ingestion.get_user_api_key", new_callable=AsyncMock, return_value=None
+    ), patch("app.services.ingestion._embed_uncached", side_effect=fake_embed) as mock_embed, patch(
+        "app.services.ingestion.copy_chunks", new_callable=AsyncMock
+    ) as mock_copy:
+        counts = await ingestion.reingest_chunks(db, uuid.uuid4(), "u1", iter(new))
+
+    assert counts == {"kept": 3, "moved": 0, "added": 2, "removed": 1}
+    embedded = [t for call in mock_embed.call_args_list for t in call.args[0]]
+    assert embedded == ["new section", "appendix"]
+    inserted = [(r["chunk_index"], r["content"]) for call in mock_copy.await_args_list for r in call.args[1]]
+    assert inserted == [(1, "new section"), (4, "appendix")]
+    # Nothing moved, so the only follow-up statement deletes "section a".
+    delete_stmt = db.execute.await_args_list[1].args[0]
+    assert rows[1][0] in delete_stmt.compile().params["id_1"]
+    db.commit.assert_not_awaited()
+
+
+async def test_reingest_moves_shifted_chunks_instead_of_re_embedding():
+    old = ["a", "b", "c"]
+    new = ["inserted", "a", "b", "c"]
+    rows = _stored_rows(old)
+    select_result = MagicMock()
+    select_result.all.return_value = rows
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=[select_result, None])
+
+    async def fake_embed(texts, api_key=None):
+        return [[0.0] for _ in texts]
+
+    with patch(
+        "app.services.ingestion.get_user_api_key", new_callable=AsyncMock, return_value=None
+    ), patch("app.services.ingestion._embed_uncached", side_effect=fake_embed) as mock_embed, patch(
+        "app.services.ingestion.copy_chunks", new_callable=AsyncMock
+    ):
+        counts = await ingestion.reingest_chunks(db, uuid.uuid4(), "u1", iter(new))
+
+    assert counts == {"kept": 3, "moved": 3, "added": 1, "removed": 0}
+    assert mock_embed.call_count == 1
+    moves = db.execute.await_args_list[1].args[1]
+    assert moves == [{"id": rows[i][0], "chunk_index": i + 1} for i in range(3)]
+
+
+
+@asynccontextmanager
+async def _pdf_source(file_key):
+    yield b"%PDF"
+
+
+async def _reingest_job(doc, reingest_chunks):
+    """Run reingest_document_background for doc; returns (db, delete_file mock)."""
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(scalar_one=MagicMock(return_value=doc)))
+    db.commit = AsyncMock()
+    mock_delete = AsyncMock()
+    with patch("app.services.ingestion.open_pdf_source", _pdf_source), patch(
+        "app.services.ingestion.pdf_page_count", new_callable=AsyncMock, return_value=3
+    ), patch("app.services.ingestion.reingest_chunks", reingest_chunks), patch(
+        "app.services.ingestion.refresh_chunk_count", new_callable=AsyncMock
+    ), patch("app.services.ingestion.file_key_for", side_effect=lambda path: f"key of {path}"), patch(
+        "app.services.ingestion.delete_file", mock_delete
+    ):
+        await ingestion.reingest_document_background(
+            db, str(uuid.uuid4()), "u1/new.pdf", "uploads/u1/new.pdf", "new-hash"
+        )
+    return db, mock_delete
+
+
+async def test_reingest_job_switches_to_the_new_revision_and_deletes_the_old_file():
+    doc = MagicMock(storage_path="uploads/u1/old.pdf", content_hash="old-hash")
+    counts = {"kept": 1, "moved": 0, "added": 0, "removed": 0}
+    db, mock_delete = await _reingest_job(doc, AsyncMock(return_value=counts))
+
+    assert (doc.storage_path, doc.content_hash, doc.status) == ("uploads/u1/new.pdf", "new-hash", "ready")
+    db.commit.assert_awaited_once()
+    mock_delete.assert_awaited_once_with("key of uploads/u1/old.pdf")
+
+
+async def test_failed_reingest_job_keeps_the_previous_revision():
+    doc = MagicMock(storage_path="uploads/u1/old.pdf", content_hash="old-hash")
+    with pytest.raises(RuntimeError):
+        await _reingest_job(doc, AsyncMock(side_effect=RuntimeError("embedding failed")))
+
+    # The hash still matches the chunks served, so the same revision can be retried.
+    assert (doc.storage_path, doc.content_hash) == ("uploads/u1/old.pdf", "old-hash")
+
+
+def _job_ctx(doc):
+    """A worker ctx whose sessions all find doc; returns (ctx, db)."""
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(scalar_one_or_none=MagicMock(return_value=doc)))
+    db.commit = AsyncMock()
+    session_cm = MagicMock(__aenter__=AsyncMock(return_value=db), __aexit__=AsyncMock(return_value=None))
+    return {"db_session": MagicMock(return_value=session_cm)}, db
+
+
+async def test_failed_ingest_drops_its_chunks_and_recounts_the_user():
+    from app.services.worker import process_document
+
+    doc = MagicMock(user_id="u1")
+    ctx, db = _job_ctx(doc)
+
+    with patch(
+        "app.services.ingestion.ingest_document_background", side_effect=RuntimeError("extraction failed")
+    ), patch("app.services.chunk_counts.refresh_chunk_count", new_callable=AsyncMock) as mock_refresh:
+        await process_document(ctx, str(uuid.uuid4()), "u1/doc.pdf", "doc.pdf", "u1")
+
+    assert "DELETE FROM chunks" in str(db.execute.await_args_list[1].args[0])
+    mock_refresh.assert_awaited_once_with(db, "u1")
+    assert doc.status == "failed"
+    db.commit.assert_awaited_once()
+
+
+async def test_failed_reingest_keeps_serving_the_previous_revision_and_drops_the_upload():
+    from app.services.worker import process_document
+
+    doc = MagicMock(user_id="u1", status="processing")
+    ctx, db = _job_ctx(doc)
+    with patch(
+        "app.services.ingestion.reingest_document_background", side_effect=RuntimeError("embedding failed")
+    ), patch("app.services.storage.delete_file", new_callable=AsyncMock) as mock_delete:
+        await process_document(
+            ctx, str(uuid.uuid4()), "u1/new.pdf", "doc.pdf", "u1",
+            reingest=True, storage_path="uploads/u1/new.pdf", content_hash="new-hash", previous_status="ready",
+        )
+
+    assert doc.status == "ready"
+    assert db.execute.await_count == 1  # the lookup; no chunk is deleted
+    db.commit.assert_awaited_once()
+    mock_delete.assert_awaited_once_with("u1/new.pdf")
+
+
+async def test_background_ingest_marks_a_document_without_text_empty():
+    doc = MagicMock(user_id="u1", status="processing")
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(scalar_one=MagicMock(return_value=doc)))
+    db.commit = AsyncMock()
+    with patch("app.services.ingestion.open_pdf_source", _pdf_source), patch(
+        "app.services.ingestion._ingest_pdf", new_callable=AsyncMock, return_value=0
+    ), patch("app.services.ingestion.refresh_chunk_count", new_callable=AsyncMock):
+        await ingestion.ingest_document_background(db, str(uuid.uuid4()), "u1/scan.pdf", "scan.pdf", "u1")
+
+    assert doc.status == "empty"
+    db.commit.assert_awaited_once()
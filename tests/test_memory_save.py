@@ -125,7 +125,8 @@ async def test_persist_memories_dedup_inserts_when_low_similarity():
     db.execute.return_value = fake_result
 
     with patch("app.services.memory.generate_embeddings", new_callable=AsyncMock) as mock_embed, \
-            patch("app.services.memory.get_user_api_key", new_callable=AsyncMock, return_value=None):
+            patch("app.services.memory.get_user_api_key", new_callable=AsyncMock, return_value=None), \
+            patch("app.services.memory.copy_memories", new_callable=AsyncMock) as mock_copy:
         mock_embed.return_value = [vector_a]
 
         count = await persist_memories(
@@ -135,11 +136,49 @@ async def test_persist_memories_dedup_inserts_when_low_similarity():
             memories=[{"category": "preference", "content": "User prefers JavaScript."}],
         )
 
-    # Low similarity → should insert
-    db.add.assert_called_once()
+    # Low similarity → should insert (via the bulk COPY path)
+    mock_copy.assert_awaited_once()
+    rows = mock_copy.call_args.args[1]
+    assert [r["content"] for r in rows] == ["User prefers JavaScript."]
     assert count == 1, f"Expected 1 memory saved (different content), got {count}"
 
 
+@pytest.mark.asyncio
+async def test_persist_memories_dedup_skips_duplicates_within_one_batch():
+    """Two near-identical memories in one call are deduped against each other,
+    since queued rows are not yet visible to the dedup query."""
+    from app.services.memory import persist_memories
+
+    vector_a = [1.0] + [0.0] * 1535
+    vector_b = [0.0, 1.0] + [0.0] * 1534
+
+    fake_result = MagicMock()
+    fake_result.fetchone.return_value = None  # nothing stored yet
+
+    db = _mock_db()
+    db.execute.return_value = fake_result
+
+    with patch("app.services.memory.generate_embeddings", new_callable=AsyncMock) as mock_embed, \
+            patch("app.services.memory.get_user_api_key", new_callable=AsyncMock, return_value=None), \
+            patch("app.services.memory.copy_memories", new_callable=AsyncMock) as mock_copy:
+        mock_embed.return_value = [vector_a, vector_a, vector_b]
+
+        count = await persist_memories(
+            db=db,
+            user_id="u1",
+            conversation_id=None,
+            memories=[
+                {"category": "preference", "content": "User prefers Python."},
+                {"category": "preference", "content": "User likes Python best."},
+                {"category": "preference", "content": "User prefers tabs."},
+            ],
+        )
+
+    rows = mock_copy.call_args.args[1]
+    assert [r["content"] for r in rows] == ["User prefers Python.", "User prefers tabs."]
+    assert count == 2
+
+
 # ---------------------------------------------------------------------------
 # MEM-02: search_memories returns only context-category memories
 # ---------------------------------------------------------------------------
@@ -0,0 +1,100 @@
+"""Tests for off-loop PDF extraction (process pool / thread fallback).
+
+Extraction must return every page exactly once, in document order, whether a
+document fits in one range or is split across several pool tasks.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import os
+from unittest.mock import patch
+
+import pymupdf
+import pytest
+
+from app.services import ingestion, pdf_extract
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "doc.pdf"
+    with pymupdf.open() as pdf:
+        for i in range(7):
+            page = pdf.new_page()
+            page.insert_text((72, 72), f"Page {i} says hello.")
+        pdf.save(path)
+    return str(path)
+
+
+def test_page_ranges_cover_document_without_overlap():
+    assert pdf_extract.page_ranges(7, 3) == [(0, 3), (3, 6), (6, 7)]
+    assert pdf_extract.page_ranges(2, 32) == [(0, 2)]
+    assert pdf_extract.page_ranges(0, 32) == []
+
+
+async def test_pages_come_back_in_order_across_ranges(pdf_path):
+    count = await pdf_extract.pdf_page_count(pdf_path)
+    pages = [
+        p async for p in pdf_extract.aiter_pdf_pages(pdf_path, count, pages_per_task=2, max_pending=2)
+    ]
+
+    assert count == 7
+    assert [p.strip() for p in pages] == [f"Page {i} says hello." for i in range(7)]
+
+
+async def test_in_memory_source_matches_path_source(pdf_path):
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+
+    from_bytes = [p async for p in pdf_extract.aiter_pdf_pages(data, 7, 3, 2)]
+    from_path = [p async for p in pdf_extract.aiter_pdf_pages(pdf_path, 7, 3, 2)]
+
+    assert await pdf_extract.pdf_page_count(data) == 7
+    assert from_bytes == from_path
+
+
+async def test_process_pool_matches_thread_fallback(pdf_path):
+    fallback = [p async for p in pdf_extract.aiter_pdf_pages(pdf_path, 7, 3, 2)]
+    pdf_extract.start_pool(2)
+    try:
+        pooled = [p async for p in pdf_extract.aiter_pdf_pages(pdf_path, 7, 3, 2)]
+    finally:
+        pdf_extract.shutdown_pool()
+
+    assert pooled == fallback
+
+
+async def test_in_memory_source_reaches_the_pool_as_a_spill_file(pdf_path):
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+    submitted = []
+    run = pdf_extract._run
+
+    async def spy(fn, *args):
+        submitted.append(args[0])
+        return await run(fn, *args)
+
+    pdf_extract.start_pool(2)
+    try:
+        with patch.object(pdf_extract, "_run", spy):
+            count = await pdf_extract.pdf_page_count(data)
+            pages = [p async for p in pdf_extract.aiter_pdf_pages(data, count, 3, 2)]
+    finally:
+        pdf_extract.shutdown_pool()
+
+    assert count == 7  # counted in-process: the bytes never went to the pool
+    assert [p.strip() for p in pages] == [f"Page {i} says hello." for i in range(7)]
+    assert len(submitted) == 3 and len(set(submitted)) == 1  # one path, not the bytes per range
+    assert isinstance(submitted[0], str) and not os.path.exists(submitted[0])
+
+
+async def test_aiter_chunks_matches_sync_pipeline():
+    pages = ["The offer is valid", "until Friday. Sign it.\n\nNew para here. " * 20, "Last bit"]
+
+    async def agen():
+        for page in pages:
+            yield page
+
+    streamed = [c async for c in ingestion.aiter_chunks(agen(), 60, 20)]
+
+    assert streamed == list(ingestion.iter_chunks(ingestion.iter_sentences(pages), 60, 20))
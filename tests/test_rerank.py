@@ -0,0 +1,118 @@
+"""Tests for the rerank stage and its document_search wiring.
+
+acompletion is mocked, so these check ordering, fallback and caching
+behaviour, not how well a model ranks.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import rerank
+from app.tools.base import ToolContext
+from app.tools.document_search import DocumentSearchTool
+
+CHUNKS = [
+    {"content": f"passage {i}", "similarity": 0.9 - i / 100, "context": f"passage {i}", "filename": "cv.pdf"}
+    for i in range(4)
+]
+
+
+def _completion(scores):
+    response = MagicMock()
+    response.choices = [MagicMock(message=MagicMock(content=json.dumps({"scores": scores})))]
+    return response
+
+
+async def test_candidates_are_reordered_by_score_and_cut_to_top_k():
+    with patch("app.services.rerank.acompletion", new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = _completion([1, 9, 3, 9])
+        result = await rerank.rerank("q", CHUNKS, top_k=3)
+
+    # Ties keep retrieval order.
+    assert [c["content"] for c in result] == ["passage 1", "passage 3", "passage 2"]
+    assert mock_llm.await_count == 1  # every candidate scored in one call
+
+
+async def test_same_query_and_candidates_are_served_from_cache():
+    with patch("app.services.rerank.acompletion", new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = _completion([0, 0, 0, 5])
+        first = await rerank.rerank("Python  roles", CHUNKS, top_k=2)
+        second = await rerank.rerank("python roles", CHUNKS, top_k=2)
+        # A different candidate set is a different ranking problem.
+        await rerank.rerank("python roles", CHUNKS[:3], top_k=2)
+
+    assert first == second
+    assert mock_llm.await_count == 2
+    assert rerank.stats()["cache_hits"] == 1
+
+
+async def test_slow_reranker_falls_back_to_retrieval_order():
+    async def slow(**kwargs):
+        await asyncio.sleep(1)
+
+    with patch.object(rerank.settings, "rerank_timeout_seconds", 0.01), patch(
+        "app.services.rerank.acompletion", side_effect=slow
+    ):
+        result = await rerank.rerank("q", CHUNKS, top_k=2)
+
+    assert result == CHUNKS[:2]
+    assert rerank.stats()["fallbacks"] == 1
+
+
+async def test_malformed_scores_fall_back_and_are_not_cached():
+    with patch("app.services.rerank.acompletion", new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = _completion([5, 4])  # wrong length
+        result = await rerank.rerank("q", CHUNKS, top_k=2)
+        await rerank.rerank("q", CHUNKS, top_k=2)
+
+    assert result == CHUNKS[:2]
+    assert mock_llm.await_count == 2
+
+
+async def test_document_search_overfetches_and_reranks_when_enabled():
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+    with patch.object(rerank.settings, "rerank_enabled", True), patch.object(
+        rerank.settings, "rerank_candidates", 50
+    ), patch(
+        "app.tools.document_search.retrieve_relevant_chunks", new_callable=AsyncMock, return_value=CHUNKS
+    ) as mock_retrieve, patch(
+        "app.tools.document_search.rerank", new_callable=AsyncMock, return_value=CHUNKS[2:]
+    ) as mock_rerank:
+        output = await DocumentSearchTool().execute(ctx, {"query": "q", "top_k": 2})
+
+    assert mock_retrieve.await_args.kwargs["top_k"] == 50
+    mock_rerank.assert_awaited_once_with("q", CHUNKS, 2)
+    assert output.startswith("[Result 1, relevance 0.88, from cv.pdf]\npassage 2")
+
+
+async def test_document_search_skips_rerank_by_default():
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+    with patch(
+        "app.tools.document_search.retrieve_relevant_chunks", new_callable=AsyncMock, return_value=CHUNKS[:2]
+    ) as mock_retrieve, patch("app.tools.document_search.rerank", new_callable=AsyncMock) as mock_rerank:
+        await DocumentSearchTool().execute(ctx, {"query": "q", "top_k": 2})
+
+    assert mock_retrieve.await_args.kwargs["top_k"] == 2
+    mock_rerank.assert_not_awaited()
+
+
+async def test_document_search_cutoff_can_be_turned_off():
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+    weak_tail = CHUNKS[:1] + [{**CHUNKS[1], "similarity": 0.1}]
+    with patch.object(rerank.settings, "retrieval_adaptive_cutoff", False), patch.object(
+        rerank.settings, "rerank_enabled", True
+    ), patch("app.tools.document_search.retrieve_relevant_chunks", new_callable=AsyncMock, return_value=CHUNKS), patch(
+        "app.tools.document_search.rerank", new_callable=AsyncMock, return_value=weak_tail
+    ):
+        output = await DocumentSearchTool().execute(ctx, {"query": "q", "top_k": 2})
+
+    assert "[Result 2, relevance 0.10" in output  # kept, though far below the floor
+
+    with patch.object(rerank.settings, "retrieval_adaptive_cutoff", False), patch(
+        "app.tools.document_search.retrieve_relevant_chunks", new_callable=AsyncMock, return_value=CHUNKS
+    ) as mock_retrieve:
+        await DocumentSearchTool().execute(ctx, {"query": "q", "top_k": 2})
+    assert mock_retrieve.await_args.kwargs["adaptive"] is False
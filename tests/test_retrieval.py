@@ -0,0 +1,259 @@
+"""Tests for retrieve_relevant_chunks query construction.
+
+The database is mocked, so these check which SQL path each mode takes and
+which parameters reach it, not pgvector's ranking itself (the eval harness
+covers ranking quality).
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import retrieval
+
+
+def _row(content, similarity, **extra):
+    """A result row as _CONTEXT_SQL returns it, with no neighbours."""
+    return MagicMock(
+        content=content, similarity=similarity, neighborhood=[content],
+        document_id="doc-1", filename="cv.pdf", **extra,
+    )
+
+
+def _db(rows=()):
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(fetchall=MagicMock(return_value=list(rows))))
+    return db
+
+
+async def _retrieve(db, chunk_count=100, **kwargs):
+    with patch("app.services.retrieval.get_user_api_key", new_callable=AsyncMock), patch(
+        "app.services.retrieval.generate_embeddings", new_callable=AsyncMock, return_value=[[0.1] * 1536]
+    ), patch("app.services.retrieval.get_chunk_count", new_callable=AsyncMock, return_value=chunk_count):
+        return await retrieval.retrieve_relevant_chunks(db=db, user_id="u1", **kwargs)
+
+
+async def test_small_tenant_is_ranked_exactly_without_the_hnsw_index():
+    db = _db()
+    await _retrieve(db, query="python backend")
+
+    assert db.execute.await_count == 1  # no HNSW session settings
+    sql, params = db.execute.await_args.args
+    assert "websearch_to_tsquery" not in str(sql)
+    assert "ORDER BY (embedding <=> :embedding) + 0" in str(sql)
+    assert params["user_id"] == "u1"
+    assert params["pool"] == retrieval.settings.retrieval_top_k
+
+
+async def test_large_tenant_uses_hnsw_with_raised_ef_search_and_iterative_scan():
+    db = _db()
+    big = retrieval.settings.retrieval_exact_scan_max_chunks + 1
+    await _retrieve(db, chunk_count=big, query="python backend", top_k=5)
+
+    tuning_sql, tuning_params = db.execute.await_args_list[0].args
+    assert "hnsw.ef_search" in str(tuning_sql) and "hnsw.iterative_scan" in str(tuning_sql)
+    assert int(tuning_params["ef"]) >= retrieval.settings.retrieval_hnsw_ef_search
+    search_sql = str(db.execute.await_args.args[0])
+    assert "ORDER BY embedding <=> :embedding\n" in search_sql
+    # Iterative scans may return rows slightly out of order; the outer query re-sorts.
+    assert "ORDER BY distance" in search_sql
+
+
+async def test_compact_storage_walks_quantized_index_and_rescores_a_wider_pool():
+    db = _db()
+    big = retrieval.settings.retrieval_exact_scan_max_chunks + 1
+    with patch.object(retrieval.settings, "vector_storage_mode", "binary"), patch.object(
+        retrieval.settings, "vector_rescore_factor", 4
+    ):
+        await _retrieve(db, chunk_count=big, query="q", top_k=5)
+
+    sql, params = db.execute.await_args.args
+    assert "ORDER BY binary_quantize(embedding)::bit(1536) <~>" in str(sql)
+    # Final ranking is on full-precision distance over the 20-row pool.
+    assert "embedding <=> :embedding AS distance" in str(sql)
+    assert params["pool"] == 20 and params["top_k"] == 5
+    assert int(db.execute.await_args_list[0].args[1]["ef"]) >= 20
+
+
+async def test_small_tenant_ignores_compact_storage_and_scans_exactly():
+    db = _db()
+    with patch.object(retrieval.settings, "vector_storage_mode", "halfvec"):
+        await _retrieve(db, query="q", top_k=5)
+
+    sql, params = db.execute.await_args.args
+    assert "halfvec" not in str(sql)
+    assert params["pool"] == 5
+
+
+async def test_iterative_scan_can_be_disabled_for_older_pgvector():
+    db = _db()
+    big = retrieval.settings.retrieval_exact_scan_max_chunks + 1
+    with patch.object(retrieval.settings, "retrieval_hnsw_iterative_scan", ""):
+        await _retrieve(db, chunk_count=big, query="q")
+
+    tuning_sql = str(db.execute.await_args_list[0].args[0])
+    assert "hnsw.ef_search" in tuning_sql and "iterative_scan" not in tuning_sql
+
+
+async def test_hybrid_mode_fuses_full_text_and_vector_candidates():
+    db = _db([_row("Jane Doe, ID 4471", 0.4)])
+    chunks = await _retrieve(db, query="ID 4471", top_k=3, mode="hybrid")
+
+    sql, params = db.execute.await_args.args
+    assert "websearch_to_tsquery('english', :query)" in str(sql)
+    assert "1.0 / (:rrf_k + rank)" in str(sql)
+    assert params["query"] == "ID 4471"
+    assert params["candidates"] >= params["top_k"] == 3
+    assert chunks == [{
+        "content": "Jane Doe, ID 4471",
+        "similarity": 0.4,
+        "context": "Jane Doe, ID 4471",
+        "document_id": "doc-1",
+        "filename": "cv.pdf",
+    }]
+
+
+async def test_hybrid_mode_keeps_guest_seed_corpus_filter():
+    db = _db()
+    await _retrieve(db, query="q", mode="hybrid", include_seed=True)
+
+    sql, params = db.execute.await_args.args
+    assert str(sql).count("user_id = :seed_user_id") == 2
+    assert params["seed_user_id"] == retrieval.settings.seed_user_id
+
+
+async def test_many_queries_share_one_embedding_call_and_one_statement():
+    db = _db([
+        _row("b1", 0.8, idx=1),
+        _row("a1", 0.9, idx=0),
+        _row("b2", 0.7, idx=1),
+    ])
+    with patch("app.services.retrieval.get_user_api_key", new_callable=AsyncMock), patch(
+        "app.services.retrieval.generate_embeddings",
+        new_callable=AsyncMock,
+        return_value=[[0.1] * 1536, [0.2] * 1536, [0.3] * 1536],
+    ) as mock_embed, patch("app.services.retrieval.get_chunk_count", new_callable=AsyncMock, return_value=100):
+        results = await retrieval.retrieve_relevant_chunks_many(
+            db=db, queries=["first", "second", "third"], user_id="u1", top_k=2
+        )
+
+    mock_embed.assert_awaited_once()
+    assert mock_embed.await_args.args[0] == ["first", "second", "third"]
+    assert db.execute.await_count == 1
+    sql, params = db.execute.await_args.args
+    assert "CROSS JOIN LATERAL" in str(sql)
+    assert "ORDER BY (embedding <=> q.query_embedding) + 0" in str(sql)
+    assert params["query_2"] == "third" and params["top_k"] == 2
+    assert [[(hit["content"], hit["similarity"]) for hit in hits] for hits in results] == [
+        [("a1", 0.9)],
+        [("b1", 0.8), ("b2", 0.7)],
+        [],
+    ]
+
+
+async def test_many_hybrid_queries_match_text_per_query():
+    db = _db()
+    with patch("app.services.retrieval.get_user_api_key", new_callable=AsyncMock), patch(
+        "app.services.retrieval.generate_embeddings", new_callable=AsyncMock, return_value=[[0.1] * 1536] * 2
+    ), patch("app.services.retrieval.get_chunk_count", new_callable=AsyncMock, return_value=100):
+        await retrieval.retrieve_relevant_chunks_many(
+            db=db, queries=["ID 4471", "Jane Doe"], user_id="u1", mode="hybrid"
+        )
+
+    sql = str(db.execute.await_args.args[0])
+    assert "websearch_to_tsquery('english', q.query_text)" in sql
+    assert ":query" not in sql.replace(":query_", "")
+
+
+async def test_many_queries_reuse_cached_query_embeddings():
+    db = _db()
+    retrieval.embedding_cache.set_query("u1", "cached", [0.5] * 1536)
+    with patch("app.services.retrieval.get_user_api_key", new_callable=AsyncMock), patch(
+        "app.services.retrieval.generate_embeddings", new_callable=AsyncMock, return_value=[[0.1] * 1536]
+    ) as mock_embed, patch("app.services.retrieval.get_chunk_count", new_callable=AsyncMock, return_value=100):
+        await retrieval.retrieve_relevant_chunks_many(db=db, queries=["cached", "new"], user_id="u1")
+
+    assert mock_embed.await_args.args[0] == ["new"]
+    assert db.execute.await_args.args[1]["embedding_0"] == str([0.5] * 1536)
+
+
+async def test_hits_are_expanded_with_neighbouring_chunks_in_the_same_statement():
+    db = _db([
+        MagicMock(
+            content="Second sentence. Third sentence.",
+            similarity=0.9,
+            neighborhood=["First sentence. Second sentence.", "Second sentence. Third sentence."],
+            document_id="doc-1",
+            filename="cv.pdf",
+        )
+    ])
+    [hit] = await _retrieve(db, query="q", neighbors=1)
+
+    assert db.execute.await_count == 1
+    sql, params = db.execute.await_args.args
+    assert "c.chunk_index - :neighbors AND c.chunk_index + :neighbors" in str(sql)
+    assert "JOIN documents d ON d.id = c.document_id" in str(sql)
+    assert params["neighbors"] == 1
+    assert hit["content"] == "Second sentence. Third sentence."
+    assert hit["context"] == "First sentence. Second sentence. Third sentence."
+    assert (hit["document_id"], hit["filename"]) == ("doc-1", "cv.pdf")
+
+
+async def test_mmr_overfetches_with_vectors_and_skips_near_duplicates():
+    def vector(*head):  # padded to the query's 1536 dims
+        return str(list(head) + [0.0] * (1536 - len(head)))
+
+    rows = [
+        _row("page 3, chunk a", 0.95, embedding=vector(1.0, 0.0, 0.0)),
+        _row("page 3, chunk b", 0.94, embedding=vector(0.99, 0.14, 0.0)),
+        _row("page 9", 0.80, embedding=vector(0.6, 0.0, 0.8)),
+    ]
+    db = _db(rows)
+    retrieval.embedding_cache.set_query("u1", "q", json.loads(vector(1.0, 0.0, 0.2)))
+    with patch.object(retrieval.settings, "retrieval_mmr_candidates", 20):
+        hits = await _retrieve(db, query="q", top_k=2, mmr_lambda=0.5)
+
+    sql, params = db.execute.await_args.args
+    assert "c.embedding::text AS embedding" in str(sql)
+    assert params["top_k"] == 20
+    assert [hit["content"] for hit in hits] == ["page 3, chunk a", "page 9"]
+
+
+def test_mmr_with_lambda_one_is_similarity_order():
+    vectors = retrieval.np.array([[1.0, 0.0], [0.99, 0.1], [0.0, 1.0]])
+    assert retrieval.mmr_order([1.0, 0.0], vectors, 3, 1.0) == [0, 1, 2]
+    assert retrieval.mmr_order([1.0, 0.0], vectors, 2, 0.3) == [0, 2]
+
+
+async def test_without_mmr_no_vectors_are_fetched():
+    db = _db()
+    await _retrieve(db, query="q", top_k=3)
+
+    sql, params = db.execute.await_args.args
+    assert "embedding::text" not in str(sql)
+    assert params["top_k"] == 3
+
+
+def test_adaptive_cutoff_drops_weak_tail_and_respects_the_token_budget():
+    hits = [
+        {"content": c, "context": c, "similarity": sim}
+        for c, sim in [("best", 0.62), ("close", 0.55), ("tail", 0.40), ("junk", 0.20)]
+    ]
+    with patch.object(retrieval.settings, "retrieval_min_similarity", 0.25), patch.object(
+        retrieval.settings, "retrieval_relative_floor", 0.8
+    ), patch.object(retrieval.settings, "retrieval_max_context_tokens", 0):
+        assert [h["content"] for h in retrieval.adaptive_cutoff(hits)] == ["best", "close"]
+
+    with patch.object(retrieval.settings, "retrieval_relative_floor", 0.0), patch.object(
+        retrieval.settings, "retrieval_max_context_tokens", 1
+    ):
+        # The first hit is always kept, even over budget.
+        assert [h["content"] for h in retrieval.adaptive_cutoff(hits)] == ["best"]
+
+
+async def test_adaptive_retrieval_returns_fewer_than_top_k():
+    db = _db([_row("best", 0.62), _row("close", 0.55), _row("tail", 0.30)])
+    hits = await _retrieve(db, query="q", top_k=3, adaptive=True)
+
+    assert [hit["content"] for hit in hits] == ["best", "close"]
@@ -18,7 +18,17 @@ from pathlib import Path
 
 from app.eval.dataset import load_corpus, load_golden
 from app.eval.metrics import hit_rate_at_k, reciprocal_rank
-from app.eval.retrieval_eval import evaluate, load_frozen, rank_case
+from app.eval.retrieval_eval import (
+    apply_cutoff,
+    calibrate_cutoffs,
+    evaluate,
+    evaluate_cutoff,
+    load_frozen,
+    rank_by_bm25,
+    rank_case,
+    reciprocal_rank_fusion,
+    truncate_frozen,
+)
 
 # The offline path is fully deterministic, so the regression tolerance is tiny;
 # it only absorbs floating-point noise, not genuine metric drift.
@@ -53,6 +63,77 @@ def test_metrics_are_reported_at_both_k_3_and_k_5():
     assert metrics["hit_rate_at_5"] >= metrics["hit_rate_at_3"]
 
 
+def test_hybrid_mode_does_not_regress_below_vector_baseline():
+    """Hybrid retrieval (cosine + BM25, RRF-fused) must score at least as well
+    as the committed vector-only baseline on the golden set."""
+    metrics = evaluate(FROZEN, GOLDEN, corpus=CORPUS, mode="hybrid")
+    assert metrics["mrr"] >= FROZEN["baseline"]["mrr"] - EPSILON
+    assert metrics["hit_rate_at_5"] >= FROZEN["baseline"]["hit_rate_at_5"] - EPSILON
+
+
+def test_quantized_storage_with_rescoring_does_not_regress_below_baseline():
+    """halfvec and binary first passes, rescored on full vectors, must keep the
+    committed baseline with a rescoring pool smaller than the corpus."""
+    pool = len(CORPUS) // 2
+    for storage in ("halfvec", "binary"):
+        metrics = evaluate(FROZEN, GOLDEN, storage=storage, rescore_pool=pool)
+        assert metrics["mrr"] >= FROZEN["baseline"]["mrr"] - EPSILON, storage
+        assert metrics["hit_rate_at_5"] >= FROZEN["baseline"]["hit_rate_at_5"] - EPSILON, storage
+
+
+def test_truncated_dimensions_do_not_regress_below_baseline():
+    """256/512-dim Matryoshka prefixes of the frozen vectors keep the baseline."""
+    for dimensions in (512, 256):
+        metrics = evaluate(FROZEN, GOLDEN, dimensions=dimensions)
+        assert metrics["mrr"] >= FROZEN["baseline"]["mrr"] - EPSILON, dimensions
+        assert metrics["hit_rate_at_5"] >= FROZEN["baseline"]["hit_rate_at_5"] - EPSILON, dimensions
+
+
+def test_truncate_frozen_renormalizes_prefixes():
+    small = truncate_frozen(FROZEN, 256)
+    for vector in list(small["corpus"].values()) + list(small["queries"].values()):
+        assert len(vector) == 256
+        assert abs(sum(x * x for x in vector) - 1.0) < 1e-9
+
+
+def test_mmr_diversification_at_the_default_lambda_does_not_regress_below_baseline():
+    # 0.7 is the retrieval_mmr_lambda default document_search runs with.
+    metrics = evaluate(FROZEN, GOLDEN, mmr_lambda=0.7)
+    assert metrics["mrr"] >= FROZEN["baseline"]["mrr"] - EPSILON
+    assert metrics["hit_rate_at_5"] >= FROZEN["baseline"]["hit_rate_at_5"] - EPSILON
+
+
+def test_calibrated_cutoffs_match_config_defaults_and_keep_the_baseline():
+    """The committed retrieval_min_similarity / retrieval_relative_floor
+    defaults (0.25 / 0.8) are what calibration yields on the golden set, and
+    cutting with them loses no relevant hit while dropping most of the tail."""
+    cutoffs = calibrate_cutoffs(FROZEN, GOLDEN)
+    assert cutoffs == {"min_similarity": 0.25, "relative_floor": 0.8}
+
+    metrics = evaluate_cutoff(FROZEN, GOLDEN, **cutoffs)
+    assert metrics["mrr"] >= FROZEN["baseline"]["mrr"] - EPSILON
+    assert metrics["hit_rate_at_5"] >= FROZEN["baseline"]["hit_rate_at_5"] - EPSILON
+    assert metrics["mean_results"] < 2.5
+
+
+def test_apply_cutoff_uses_absolute_and_relative_floors():
+    scored = [("a", 0.6), ("b", 0.5), ("c", 0.45), ("d", 0.2)]
+    assert apply_cutoff(scored, min_similarity=0.25, relative_floor=0.8) == ["a", "b"]
+    assert apply_cutoff(scored, min_similarity=0.7, relative_floor=0.0) == []
+
+
+def test_bm25_only_returns_documents_sharing_a_query_term():
+    ranked = rank_by_bm25("kubernetes", ["ran kubernetes clusters", "wrote react apps"], ["ops", "fe"])
+    assert ranked == ["ops"]
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    # "b" is second in both lists, "a" and "c" each top only one list.
+    fused = reciprocal_rank_fusion([["a", "b", "x"], ["c", "b", "y"]], k=60)
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "x", "y"}
+
+
 def test_gate_has_teeth_reversing_a_ranking_lowers_reciprocal_rank():
     """A degraded (reversed) ranking must score strictly worse — proving the
     gate can actually fail when retrieval regresses."""
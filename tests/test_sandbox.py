@@ -0,0 +1,228 @@
+"""Tests for the python_executor sandbox pool and the local backend.
+
+Pool tests use an in-memory fake sandbox; LocalSandbox tests start a real
+subprocess, so they need no E2B key.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+from app.services import sandbox
+from app.services.sandbox import Execution, LocalSandbox, Sandbox, SandboxPool
+from app.tools.base import ToolContext
+from app.tools.python_executor import PythonExecutorTool
+
+
+class FakeSandbox(Sandbox):
+    def __init__(self):
+        self.codes = []
+        self.killed = False
+
+    async def run(self, code: str) -> Execution:
+        self.codes.append(code)
+        if code == "boom":
+            raise RuntimeError("connection lost")
+        await asyncio.sleep(0.01)
+        return Execution(stdout=code, stderr="")
+
+    async def kill(self) -> None:
+        self.alive = False
+        self.killed = True
+
+
+def _pool():
+    made = []
+
+    async def create():
+        made.append(FakeSandbox())
+        return made[-1]
+
+    return SandboxPool(create), made
+
+
+async def test_conversation_reuses_its_sandbox_and_users_are_isolated():
+    pool, made = _pool()
+    await pool.run("u1", "conv", "a = 1")
+    await pool.run("u1", "conv", "print(a)")
+    await pool.run("u2", "conv", "print(a)")  # same conversation id, other user
+
+    assert [s.codes for s in made] == [["a = 1", "print(a)"], ["print(a)"]]
+    assert pool.stats()["reuses"] == 1
+
+
+async def test_calls_without_a_conversation_use_a_throwaway_sandbox():
+    pool, made = _pool()
+    await pool.run("u1", None, "1 + 1")
+
+    assert made[0].killed
+    assert pool.stats()["bound"] == 0
+
+
+async def test_warm_sandboxes_serve_first_calls_and_are_topped_up():
+    pool, made = _pool()
+    with patch.object(sandbox.settings, "sandbox_warm_size", 2):
+        await pool.fill()
+        assert len(made) == 2
+        await pool.run("u1", "conv", "x")
+        await asyncio.sleep(0)  # let the refill task run
+
+    assert made[1].codes == ["x"]  # a warm one, not a new one
+    assert len(made) == 3
+    stats = pool.stats()
+    assert (stats["warm"], stats["bound"], stats["warm_hits"]) == (2, 1, 1)
+
+
+async def test_idle_sandboxes_are_reaped():
+    pool, made = _pool()
+    await pool.run("u1", "conv", "x")
+    with patch.object(sandbox.settings, "sandbox_idle_seconds", 0), patch.object(
+        sandbox.settings, "sandbox_warm_size", 0
+    ):
+        await pool.reap()
+        await asyncio.sleep(0)
+
+    assert made[0].killed
+    assert pool.stats()["bound"] == 0
+
+
+async def _one_warm_sandbox_aged(pool, seconds):
+    with patch.object(sandbox.settings, "sandbox_warm_size", 1):
+        await pool.fill()
+    warm, _ = pool._warm[0]
+    pool._warm[0] = (warm, time.monotonic() - seconds)
+    return warm
+
+
+async def test_bound_sandbox_ages_from_creation_not_from_binding():
+    pool, made = _pool()
+    await _one_warm_sandbox_aged(pool, 100)
+    await pool.run("u1", "conv", "x")
+    with patch.object(sandbox.settings, "sandbox_max_age_seconds", 50), patch.object(
+        sandbox.settings, "sandbox_warm_size", 0
+    ):
+        await pool.reap()
+        await asyncio.sleep(0)
+
+    assert made[0].codes == ["x"] and made[0].killed  # 100s old, though bound just now
+
+
+async def test_warm_sandbox_near_max_age_is_not_handed_out():
+    pool, made = _pool()
+    with patch.object(sandbox.settings, "sandbox_max_age_seconds", 3600), patch.object(
+        sandbox.settings, "sandbox_idle_seconds", 600
+    ), patch.object(sandbox.settings, "sandbox_warm_size", 0):
+        stale = await _one_warm_sandbox_aged(pool, 3100)  # < 600s of life left
+        await pool.run("u1", "conv", "x")
+        await asyncio.sleep(0)
+
+    assert stale.killed and stale.codes == []
+    assert made[1].codes == ["x"]
+
+
+async def test_bound_sandbox_past_max_age_is_replaced_before_the_next_call():
+    pool, made = _pool()
+    await pool.run("u1", "conv", "x")
+    pool._bound[("u1", "conv")].created -= 100
+    with patch.object(sandbox.settings, "sandbox_max_age_seconds", 50):
+        await pool.run("u1", "conv", "y")  # no reap in between
+        await asyncio.sleep(0)
+
+    assert made[0].killed and made[0].codes == ["x"]
+    assert made[1].codes == ["y"]
+
+
+async def test_full_pool_evicts_least_recently_used_idle_sandbox():
+    pool, made = _pool()
+    with patch.object(sandbox.settings, "sandbox_pool_max", 2):
+        await pool.run("u1", "a", "x")
+        await pool.run("u1", "b", "x")
+        await pool.run("u1", "a", "x")  # b is now least recently used
+        await pool.run("u1", "c", "x")
+        await asyncio.sleep(0)
+
+    assert [s.killed for s in made] == [False, True, False]
+
+
+async def test_full_pool_of_busy_sandboxes_falls_back_to_throwaway():
+    pool, made = _pool()
+    with patch.object(sandbox.settings, "sandbox_pool_max", 1):
+        await asyncio.gather(pool.run("u1", "a", "x"), pool.run("u1", "b", "y"))
+
+    assert pool.stats()["throwaway"] == 1
+    assert made[1].killed and not made[0].killed
+
+
+async def test_sandbox_that_fails_mid_run_is_discarded():
+    pool, made = _pool()
+    try:
+        await pool.run("u1", "conv", "boom")
+    except RuntimeError:
+        pass
+    await asyncio.sleep(0)
+    await pool.run("u1", "conv", "x")
+
+    assert made[0].killed
+    assert made[1].codes == ["x"]
+
+
+async def test_local_sandbox_keeps_state_and_reports_errors():
+    box = await LocalSandbox.create()
+    try:
+        first = await box.run("import math\nx = math.pi")
+        second = await box.run("print(round(x, 2)); import sys; print('warn', file=sys.stderr)")
+        failed = await box.run("1 / 0")
+    finally:
+        await box.kill()
+
+    assert first == Execution("", "", None)
+    assert second == Execution("3.14\n", "warn\n", None)
+    assert failed.error == "ZeroDivisionError: division by zero"
+
+
+async def test_local_sandbox_enforces_memory_limit():
+    with patch.object(sandbox.settings, "sandbox_local_memory_mb", 256):
+        box = await LocalSandbox.create()
+    try:
+        result = await box.run("blob = bytearray(1024 ** 3)")
+    finally:
+        await box.kill()
+
+    assert result.error.startswith("MemoryError")
+
+
+async def test_local_sandbox_applies_its_rlimits_itself():
+    with patch.object(sandbox.settings, "sandbox_local_cpu_seconds", 7):
+        box = await LocalSandbox.create()
+    try:
+        result = await box.run(
+            "import resource\nprint(resource.getrlimit(resource.RLIMIT_CPU), resource.getrlimit(resource.RLIMIT_FSIZE))"
+        )
+    finally:
+        await box.kill()
+
+    assert result.stdout == f"(7, 7) ({64 * 1024 * 1024}, {64 * 1024 * 1024})\n"
+
+
+async def test_python_executor_keeps_variables_across_calls_in_a_conversation():
+    ctx = ToolContext(user_id="u1", db=MagicMock(), conversation_id="conv")
+    tool = PythonExecutorTool()
+    with patch.object(sandbox.settings, "sandbox_backend", "local"):
+        try:
+            await tool.execute(ctx, {"code": "total = 41"})
+            output = await tool.execute(ctx, {"code": "print(total + 1)"})
+        finally:
+            await sandbox.aclose()
+
+    assert output == "stdout:\n42\n"
+
+
+async def test_python_executor_without_e2b_key_is_not_configured():
+    with patch.object(sandbox.settings, "sandbox_backend", "e2b"), patch.object(
+        sandbox.settings, "e2b_api_key", ""
+    ):
+        output = await PythonExecutorTool().execute(ToolContext(user_id="u1", db=MagicMock()), {"code": "1"})
+
+    assert output == "Error: Python executor is not configured."
@@ -0,0 +1,130 @@
+"""Tests for the in-process seed corpus index and the guest retrieval path.
+
+The database is mocked; rows are built in the shape _LOAD_SQL returns.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import retrieval, seed_index
+
+DIMS = 1536
+
+
+def _vector(*head):
+    return list(head) + [0.0] * (DIMS - len(head))
+
+
+def _seed_row(content, chunk_index, embedding, document_id="seed-doc"):
+    return MagicMock(
+        content=content,
+        chunk_index=chunk_index,
+        document_id=document_id,
+        filename="demo.pdf",
+        embedding=str(embedding),
+    )
+
+
+SEED_ROWS = [
+    _seed_row("Alpha one. Alpha two.", 0, _vector(1.0, 0.0)),
+    _seed_row("Alpha two. Beta one.", 1, _vector(0.0, 1.0)),
+    _seed_row("Gamma.", 0, _vector(0.7, 0.7), document_id="other-doc"),
+]
+
+
+def _index():
+    return seed_index.SeedIndex(SEED_ROWS, version=(3, "t0"))
+
+
+def test_search_ranks_exactly_and_expands_neighbours():
+    hits = _index().search(_vector(0.1, 1.0), k=2, neighbors=1)
+
+    assert [hit["content"] for hit, _ in hits] == ["Alpha two. Beta one.", "Gamma."]
+    top, vector = hits[0]
+    assert top["context"] == "Alpha one. Alpha two. Beta one."
+    assert top["filename"] == "demo.pdf"
+    assert abs(top["similarity"] - 0.995) < 1e-3
+    assert vector.shape == (DIMS,)
+
+
+def test_empty_corpus_returns_nothing():
+    assert seed_index.SeedIndex([], version=None).search(_vector(1.0), k=5) == []
+
+
+async def test_index_is_reloaded_only_when_the_seed_version_changes():
+    db = MagicMock()
+    version = MagicMock(first=MagicMock(return_value=(3, "t0")))
+    rows = MagicMock(fetchall=MagicMock(return_value=SEED_ROWS))
+    db.execute = AsyncMock(side_effect=[version, rows, version])
+
+    with patch.object(seed_index.settings, "seed_index_check_seconds", 0):
+        first = await seed_index.get_seed_index(db)
+        second = await seed_index.get_seed_index(db)
+
+    assert first is second and len(first) == 3
+    assert db.execute.await_count == 3  # load (version + rows), then one version check
+
+    db.execute = AsyncMock(side_effect=[
+        MagicMock(first=MagicMock(return_value=(4, "t1"))),
+        MagicMock(first=MagicMock(return_value=(4, "t1"))),
+        MagicMock(fetchall=MagicMock(return_value=SEED_ROWS[:1])),
+    ])
+    with patch.object(seed_index.settings, "seed_index_check_seconds", 0):
+        reloaded = await seed_index.get_seed_index(db)
+    assert len(reloaded) == 1
+
+
+async def _guest_search(db, own_count, user_id="guest", **kwargs):
+    with patch("app.services.retrieval.get_user_api_key", new_callable=AsyncMock), patch(
+        "app.services.retrieval.generate_embeddings", new_callable=AsyncMock, return_value=[_vector(0.1, 1.0)]
+    ), patch("app.services.retrieval.get_chunk_count", new_callable=AsyncMock, return_value=own_count), patch(
+        "app.services.retrieval.get_seed_index", new_callable=AsyncMock, return_value=_index()
+    ):
+        return await retrieval.retrieve_relevant_chunks(
+            db=db, query="q", user_id=user_id, include_seed=True, **kwargs
+        )
+
+
+async def test_guest_without_chunks_is_served_from_memory_without_sql():
+    db = MagicMock()
+    db.execute = AsyncMock()
+    hits = await _guest_search(db, own_count=0, top_k=2)
+
+    db.execute.assert_not_awaited()
+    assert [hit["content"] for hit in hits] == ["Alpha two. Beta one.", "Gamma."]
+
+
+async def test_guest_chunks_are_searched_in_sql_and_merged_by_similarity():
+    own = MagicMock(
+        content="My CV.", similarity=0.8, neighborhood=["My CV."], document_id="mine", filename="cv.pdf"
+    )
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(fetchall=MagicMock(return_value=[own])))
+    hits = await _guest_search(db, own_count=3, top_k=2)
+
+    sql, params = db.execute.await_args.args
+    assert "seed_user_id" not in str(sql)  # the seed corpus comes from the index
+    assert [hit["content"] for hit in hits] == ["Alpha two. Beta one.", "My CV."]
+
+
+async def test_seed_user_gets_each_seed_chunk_once():
+    seed_row = MagicMock(
+        content="Alpha two. Beta one.", similarity=0.99, neighborhood=["Alpha two. Beta one."],
+        document_id="seed-doc", filename="demo.pdf",
+    )
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(fetchall=MagicMock(return_value=[seed_row])))
+    hits = await _guest_search(db, own_count=3, user_id=retrieval.settings.seed_user_id, top_k=2)
+
+    sql, params = db.execute.await_args.args
+    assert "seed_user_id" not in str(sql)  # own chunks are the seed corpus
+    assert [hit["content"] for hit in hits] == ["Alpha two. Beta one."]  # not merged from the index too
+
+
+async def test_hybrid_guest_search_keeps_the_sql_seed_filter():
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(fetchall=MagicMock(return_value=[])))
+    await _guest_search(db, own_count=0, mode="hybrid")
+
+    assert "user_id = :seed_user_id" in str(db.execute.await_args.args[0])
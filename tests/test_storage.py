@@ -0,0 +1,131 @@
+"""Tests for the async storage backends.
+
+Uploads must stream (S3: one part in memory at a time, aborted on failure;
+local: nothing left behind on failure). Opening a stored PDF must avoid
+temp-file round trips: small S3 objects come back as bytes, large ones as a
+spill file written by ranged downloads and removed afterwards, and local
+files as their own path.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import storage
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def _failing_stream():
+    yield b"x" * 10
+    raise RuntimeError("client disconnected")
+
+
+@pytest.fixture
+def s3():
+    client = MagicMock()
+    client.create_multipart_upload.return_value = {"UploadId": "up-1"}
+    client.upload_part.side_effect = lambda **kw: {"ETag": f"etag-{kw['PartNumber']}"}
+    with patch.object(storage.boto3, "client", return_value=client):
+        yield client
+
+
+@pytest.fixture
+def local_dir(tmp_path):
+    with patch.object(storage, "LOCAL_UPLOAD_DIR", str(tmp_path)):
+        yield tmp_path
+
+
+async def test_local_stream_is_written_and_opened_in_place(local_dir):
+    backend = storage.LocalStorage()
+
+    path = await backend.save_stream("u1/doc.pdf", _chunks(b"%PDF", b"-1.7"))
+
+    assert path == os.path.join(str(local_dir), "u1/doc.pdf")
+    assert await backend.load("u1/doc.pdf") == b"%PDF-1.7"
+    async with backend.open_pdf_source("u1/doc.pdf") as source:
+        assert source == path
+
+
+async def test_stored_path_maps_back_to_its_key(local_dir, s3):
+    local_path = await storage.LocalStorage().save_stream("u1/doc.pdf", _chunks(b"%PDF"))
+    s3_path = await storage.S3Storage("bucket").save_stream("u1/doc.pdf", _chunks(b"%PDF"))
+
+    assert storage.LocalStorage().file_key(local_path) == "u1/doc.pdf"
+    assert storage.S3Storage("bucket").file_key(s3_path) == "u1/doc.pdf"
+
+
+async def test_local_failed_stream_leaves_no_file(local_dir):
+    with pytest.raises(RuntimeError):
+        await storage.LocalStorage().save_stream("u1/doc.pdf", _failing_stream())
+
+    assert not (local_dir / "u1" / "doc.pdf").exists()
+
+
+async def test_s3_small_stream_is_a_single_put(s3):
+    backend = storage.S3Storage("bucket")
+
+    key = await backend.save_stream("u1/doc.pdf", _chunks(b"ab", b"cd"))
+
+    assert key == "u1/doc.pdf"
+    s3.put_object.assert_called_once_with(Bucket="bucket", Key="u1/doc.pdf", Body=b"abcd")
+    s3.create_multipart_upload.assert_not_called()
+
+
+async def test_s3_large_stream_uploads_fixed_size_parts(s3):
+    with patch.object(storage.settings, "s3_transfer_chunk_bytes", 4):
+        backend = storage.S3Storage("bucket")
+        await backend.save_stream("k", _chunks(b"abc", b"defgh", b"ij"))
+
+    bodies = [c.kwargs["Body"] for c in s3.upload_part.call_args_list]
+    assert bodies == [b"abcd", b"efgh", b"ij"]
+    completed = s3.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+    assert completed == [{"PartNumber": n, "ETag": f"etag-{n}"} for n in (1, 2, 3)]
+    s3.put_object.assert_not_called()
+
+
+async def test_s3_failed_multipart_upload_is_aborted(s3):
+    with patch.object(storage.settings, "s3_transfer_chunk_bytes", 4):
+        backend = storage.S3Storage("bucket")
+        with pytest.raises(RuntimeError):
+            await backend.save_stream("k", _failing_stream())
+
+    s3.abort_multipart_upload.assert_called_once_with(Bucket="bucket", Key="k", UploadId="up-1")
+    s3.complete_multipart_upload.assert_not_called()
+
+
+async def test_small_s3_object_is_read_into_memory(s3):
+    s3.head_object.return_value = {"ContentLength": 10}
+    s3.get_object.return_value = {"Body": MagicMock(read=MagicMock(return_value=b"%PDF-1.7"))}
+
+    async with storage.S3Storage("bucket").open_pdf_source("u1/doc.pdf") as source:
+        assert source == b"%PDF-1.7"
+
+    s3.download_file.assert_not_called()
+
+
+async def test_large_s3_object_spills_to_a_file_that_is_removed(s3):
+    s3.head_object.return_value = {"ContentLength": 100}
+
+    with patch.object(storage.settings, "pdf_memory_max_bytes", 50):
+        async with storage.S3Storage("bucket").open_pdf_source("u1/doc.pdf") as source:
+            assert isinstance(source, str) and os.path.exists(source)
+            bucket, key, path = s3.download_file.call_args.args
+            assert (bucket, key, path) == ("bucket", "u1/doc.pdf", source)
+
+    s3.get_object.assert_not_called()
+    assert not os.path.exists(source)
+
+
+def test_s3_backend_is_shared_across_calls(s3):
+    with patch.object(storage.settings, "s3_bucket_name", "bucket"), patch.object(
+        storage, "_storage", None
+    ):
+        assert storage.get_storage() is storage.get_storage()
+        assert storage.boto3.client.call_count == 1
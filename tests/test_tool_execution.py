@@ -0,0 +1,329 @@
+"""Tests for concurrent, deadline-bounded tool execution within one agent turn.
+
+Tools are in-process fakes looked up through a patched get_tool, so these
+check scheduling, ordering, budgets and session handling, not any real tool.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import agent
+from app.tools.base import Tool, ToolContext
+
+
+class SleepyTool(Tool):
+    description = "sleeps, then echoes"
+    parameters = {"type": "object", "properties": {}}
+
+    def __init__(self, name: str, delay: float, uses_db: bool = False, log: list | None = None):
+        self.name = name
+        self.delay = delay
+        self.uses_db = uses_db
+        self.sessions = []
+        self.log = [] if log is None else log
+
+    async def execute(self, ctx: ToolContext, args: dict) -> str:
+        self.sessions.append(ctx.db)
+        self.log.append(f"{self.name} started")
+        await asyncio.sleep(self.delay)
+        return f"{self.name}:{args.get('q', '')}"
+
+
+def _patch_tools(*tools):
+    registry = {t.name: t for t in tools}
+    return patch("app.services.agent.get_tool", side_effect=lambda name: registry[name])
+
+
+async def _collect(ctx, calls, deadline=None):
+    deadline = time.monotonic() + 100 if deadline is None else deadline
+    return [event async for event in agent._execute_tool_calls(ctx, calls, deadline)]
+
+
+async def test_calls_run_concurrently_and_events_keep_call_order():
+    slow, fast = SleepyTool("slow", 0.2), SleepyTool("fast", 0.01)
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+
+    started = time.perf_counter()
+    with _patch_tools(slow, fast):
+        events = await _collect(ctx, [("c1", "slow", '{"q": "a"}'), ("c2", "fast", '{"q": "b"}'), ("c3", "slow", "")])
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.35  # two 0.2s calls overlapped, not summed
+    assert [(e["type"], e.get("id") or e.get("tool_call_id")) for e in events] == [
+        ("tool_call_start", "c1"),
+        ("tool_call_start", "c2"),
+        ("tool_call_start", "c3"),
+        ("tool_call_result", "c1"),
+        ("tool_message", "c1"),
+        ("tool_call_result", "c2"),
+        ("tool_message", "c2"),
+        ("tool_call_result", "c3"),
+        ("tool_message", "c3"),
+    ]
+    assert [e["content"] for e in events if e["type"] == "tool_message"] == ["slow:a", "fast:b", "slow:"]
+
+
+async def test_concurrency_is_capped_per_turn():
+    tool = SleepyTool("t", 0.1)
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+
+    started = time.perf_counter()
+    with _patch_tools(tool), patch.object(agent.settings, "agent_max_parallel_tools", 2):
+        await _collect(ctx, [(f"c{i}", "t", "") for i in range(4)])
+
+    assert time.perf_counter() - started >= 0.2  # two waves of two
+
+
+async def test_timeout_and_bad_calls_become_tool_errors_without_stopping_others():
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+    with _patch_tools(SleepyTool("hung", 5), SleepyTool("ok", 0)), patch.object(
+        agent.settings, "agent_tool_timeout_seconds", 0.05
+    ):
+        events = await _collect(
+            ctx, [("c1", "hung", ""), ("c2", "ok", ""), ("c3", "ok", "{not json"), ("c4", "nope", "")]
+        )
+
+    errors = {e["id"]: (e["code"], e["error"]) for e in events if e["type"] == "tool_call_error"}
+    assert errors["c1"] == ("timeout", "Error: hung timed out after 0.05s and was cancelled. Continue without its result.")
+    assert errors["c3"][0] == "invalid_arguments"
+    assert errors["c4"] == ("unknown_tool", "Error: Unknown tool 'nope'")
+    assert [e["id"] for e in events if e["type"] == "tool_call_result"] == ["c2"]
+    assert len([e for e in events if e["type"] == "tool_message"]) == 4
+
+
+async def test_tool_gets_what_is_left_of_the_turn_minus_the_answer_reserve():
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+    with _patch_tools(SleepyTool("slow", 5)), patch.object(
+        agent.settings, "agent_answer_reserve_seconds", 10
+    ):
+        started = time.perf_counter()
+        events = await _collect(ctx, [("c1", "slow", "")], deadline=time.monotonic() + 10.05)
+
+    assert time.perf_counter() - started < 1  # cut at the turn deadline, not the 60s tool cap
+    assert events[1]["code"] == "timeout"
+
+
+async def test_tools_are_not_started_once_the_turn_budget_is_spent():
+    tool = SleepyTool("t", 0)
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+    with _patch_tools(tool):
+        events = await _collect(ctx, [("c1", "t", "")], deadline=time.monotonic() - 1)
+
+    assert tool.sessions == []  # never executed
+    assert events[1]["code"] == "budget_exhausted"
+    assert events[2]["content"].startswith("Error: t was not run")
+
+
+def test_turn_budget_follows_effort():
+    with patch.object(agent.settings, "agent_turn_budget_fast_seconds", 5), patch.object(
+        agent.settings, "agent_turn_budget_balanced_seconds", 50
+    ), patch.object(agent.settings, "agent_turn_budget_thorough_seconds", 500):
+        now = time.monotonic()
+        budgets = [round(agent._turn_deadline(e) - now) for e in ("fast", "balanced", "thorough")]
+
+    assert budgets == [5, 50, 500]
+
+
+def _own_session():
+    own_db = MagicMock(commit=AsyncMock())
+    session_cm = MagicMock(__aenter__=AsyncMock(return_value=own_db), __aexit__=AsyncMock(return_value=False))
+    return own_db, session_cm
+
+
+async def test_db_tools_never_use_the_request_session():
+    request_db = MagicMock()
+    ctx = ToolContext(user_id="u1", db=request_db)
+    db_tool, web_tool = SleepyTool("db_tool", 0, uses_db=True), SleepyTool("web_tool", 0)
+
+    own_db, session_cm = _own_session()
+    with _patch_tools(db_tool, web_tool), patch(
+        "app.services.agent.async_session", return_value=session_cm
+    ) as mock_session_factory:
+        await _collect(ctx, [("c1", "db_tool", "")])
+        await _collect(ctx, [("c2", "db_tool", ""), ("c3", "web_tool", "")])
+
+    # Alone or alongside others: a fresh, committed session. Others: untouched.
+    assert db_tool.sessions == [own_db, own_db]
+    assert web_tool.sessions == [request_db]
+    assert mock_session_factory.call_count == 2
+    assert own_db.commit.await_count == 2
+
+
+async def test_timed_out_db_tool_leaves_the_request_session_alone():
+    request_db = MagicMock()
+    ctx = ToolContext(user_id="u1", db=request_db)
+    own_db, session_cm = _own_session()
+    with _patch_tools(SleepyTool("db_tool", 5, uses_db=True)), patch(
+        "app.services.agent.async_session", return_value=session_cm
+    ), patch.object(agent.settings, "agent_tool_timeout_seconds", 0.05):
+        events = await _collect(ctx, [("c1", "db_tool", "")])
+
+    assert events[1]["code"] == "timeout"
+    own_db.commit.assert_not_awaited()
+    # The cancelled query's session was exited with the cancellation (rolled back, closed).
+    assert session_cm.__aexit__.await_args.args[0] is asyncio.CancelledError
+    assert request_db.mock_calls == []
+
+
+def _tool_call(index, call_id, name, arguments='{"q": "x"}'):
+    tc = MagicMock(index=index, id=call_id)
+    tc.function.name = name
+    tc.function.arguments = arguments
+    return tc
+
+
+def _chunk(content=None, tool_calls=None):
+    c = MagicMock()
+    c.choices = [MagicMock()]
+    c.choices[0].delta.content = content
+    c.choices[0].delta.tool_calls = tool_calls
+    return c
+
+
+async def _stream(chunks):
+    for c in chunks:
+        yield c
+
+
+async def test_run_agent_persists_parallel_tool_results_in_call_order():
+    responses = [
+        _stream([_chunk(tool_calls=[_tool_call(0, "c1", "slow"), _tool_call(1, "c2", "fast")])]),
+        _stream([_chunk(content="Done.")]),
+    ]
+    seen_messages = []
+
+    async def fake_acompletion(**kwargs):
+        seen_messages.append(list(kwargs["messages"]))
+        return responses.pop(0)
+
+    with _patch_tools(SleepyTool("slow", 0.05), SleepyTool("fast", 0)), patch(
+        "app.services.agent.acompletion", side_effect=fake_acompletion
+    ):
+        events = [
+            e
+            async for e in agent.run_agent(
+                db=MagicMock(), user_id="u1", user_message="hi", conversation_history=[],
+                api_key="sk-test", model="gpt-4o", effort="fast",
+            )
+        ]
+
+    tool_messages = [m for m in seen_messages[1] if m["role"] == "tool"]
+    assert [(m["tool_call_id"], m["content"]) for m in tool_messages] == [("c1", "slow:x"), ("c2", "fast:x")]
+    assert [e["type"] for e in events][-2:] == ["assistant_message", "done"]
+
+
+async def test_run_agent_withholds_tools_once_the_turn_budget_is_spent():
+    seen_tools = []
+
+    async def fake_acompletion(**kwargs):
+        seen_tools.append(kwargs["tools"])
+        return _stream([_chunk(content="Best answer I have.")])
+
+    with patch.object(agent.settings, "agent_turn_budget_fast_seconds", 5), patch.object(
+        agent.settings, "agent_answer_reserve_seconds", 10
+    ), patch("app.services.agent.acompletion", side_effect=fake_acompletion):
+        events = [
+            e
+            async for e in agent.run_agent(
+                db=MagicMock(), user_id="u1", user_message="hi", conversation_history=[],
+                api_key="sk-test", model="gpt-4o", effort="fast",
+            )
+        ]
+
+    assert seen_tools == [None]
+    assert events[-1] == {"type": "done"}
+
+
+async def _run_speculating_turn(tool_name, log):
+    """A turn whose first tool call completes long before the stream ends."""
+
+    async def first_turn():
+        yield _chunk(tool_calls=[_tool_call(0, "c1", tool_name, '{"q": ')])
+        yield _chunk(tool_calls=[_tool_call(0, None, None, '"x"}')])
+        await asyncio.sleep(0.05)  # the model keeps writing other calls
+        yield _chunk(tool_calls=[_tool_call(1, "c2", "web_search")])
+        log.append("stream end")
+
+    responses = [first_turn(), _stream([_chunk(content="Done.")])]
+    tool = SleepyTool(tool_name, 0, log=log)
+    with _patch_tools(tool, SleepyTool("web_search", 0)), patch(
+        "app.services.agent.acompletion", side_effect=lambda **kwargs: responses.pop(0)
+    ):
+        events = [
+            e
+            async for e in agent.run_agent(
+                db=MagicMock(), user_id="u1", user_message="hi", conversation_history=[],
+                api_key="sk-test", model="gpt-4o", effort="fast",
+            )
+        ]
+    return tool, events
+
+
+async def test_search_tools_start_while_the_model_is_still_streaming():
+    log = []
+    tool, events = await _run_speculating_turn("document_search", log)
+
+    assert log == ["document_search started", "stream end"]
+    assert len(tool.sessions) == 1  # the early run is the one used
+    assert [e["content"] for e in events if e["type"] == "tool_message"] == ["document_search:x", "web_search:x"]
+
+
+async def test_other_tools_wait_for_the_full_turn():
+    log = []
+    await _run_speculating_turn("memory_save", log)
+
+    assert log == ["stream end", "memory_save started"]
+
+
+async def test_prefetched_call_is_used_only_if_the_final_arguments_match():
+    tool = SleepyTool("t", 0.05)
+    ctx = ToolContext(user_id="u1", db=MagicMock())
+    deadline = time.monotonic() + 100
+    limit = asyncio.Semaphore(4)
+    with _patch_tools(tool):
+        stale = agent._prefetch_tool_call(ctx, "t", '{"q": "old"}', limit, deadline)
+        same = agent._prefetch_tool_call(ctx, "t", '{"q":"kept"}', limit, deadline)
+        await asyncio.sleep(0.01)  # both early runs are under way
+        events = [
+            e
+            async for e in agent._execute_tool_calls(
+                ctx,
+                [("c1", "t", '{"q": "new"}'), ("c2", "t", '{"q": "kept"}')],
+                deadline,
+                limit,
+                {0: stale, 1: same},
+            )
+        ]
+
+    assert stale[2].cancelled()
+    assert [e["content"] for e in events if e["type"] == "tool_message"] == ["t:new", "t:kept"]
+    assert len(tool.sessions) == 3  # old (discarded), kept (reused), new
+
+
+async def test_prefetched_calls_are_cancelled_if_the_consumer_leaves_before_they_run():
+    started = []
+    prefetch = agent._prefetch_tool_call
+
+    def spy(*args):
+        started.append(prefetch(*args))
+        return started[-1]
+
+    response = _stream([_chunk(tool_calls=[_tool_call(0, "c1", "document_search")])])
+    with _patch_tools(SleepyTool("document_search", 5)), patch(
+        "app.services.agent.acompletion", side_effect=lambda **kwargs: response
+    ), patch("app.services.agent._prefetch_tool_call", side_effect=spy):
+        events = agent.run_agent(
+            db=MagicMock(), user_id="u1", user_message="hi", conversation_history=[],
+            api_key="sk-test", model="gpt-4o", effort="fast",
+        )
+        async for event in events:
+            if event["type"] == "assistant_message":
+                break  # e.g. the client disconnected while it was being saved
+        await events.aclose()
+        await asyncio.sleep(0)
+
+    [(_, _, task)] = started
+    assert task.cancelled()
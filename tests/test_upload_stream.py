@@ -0,0 +1,96 @@
+"""Tests for streaming multipart upload parsing.
+
+The upload endpoint must never buffer the whole file: the file part is handed
+over chunk by chunk, hashed on the fly, and cut off with a 413 as soon as it
+crosses the size limit.
+
+asyncio_mode = auto, so async tests need no decorator.
+"""
+
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.services.upload_stream import MultipartFileStream
+
+BOUNDARY = "testboundary"
+
+
+def _multipart_body(content: bytes, filename: str = "report.pdf", field: str = "file") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="note"\r\n\r\n'
+        f"hello\r\n"
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _request(body: bytes, piece: int = 7, content_length: int | None = None) -> Request:
+    """A request whose body arrives in `piece`-byte messages, like a slow client."""
+    messages = [
+        {"type": "http.request", "body": body[i : i + piece], "more_body": i + piece < len(body)}
+        for i in range(0, len(body), piece)
+    ]
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+
+    async def receive():
+        return messages.pop(0)
+
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+
+async def test_file_part_streams_in_pieces_with_hash_and_size():
+    content = b"%PDF-1.7 " + bytes(range(256)) * 4
+    upload = MultipartFileStream(_request(_multipart_body(content)), max_bytes=10_000)
+
+    assert await upload.start() == "report.pdf"
+    pieces = [p async for p in upload.chunks()]
+
+    assert len(pieces) > 1
+    assert b"".join(pieces) == content
+    assert upload.size == len(content)
+    assert upload.sha256 == hashlib.sha256(content).hexdigest()
+
+
+async def test_oversize_file_is_cut_off_mid_stream():
+    upload = MultipartFileStream(_request(_multipart_body(b"x" * 500)), max_bytes=100)
+    await upload.start()
+
+    received = 0
+    with pytest.raises(HTTPException) as exc:
+        async for piece in upload.chunks():
+            received += len(piece)
+
+    assert exc.value.status_code == 413
+    assert received <= 100
+
+
+def test_declared_oversize_body_is_rejected_before_reading():
+    with pytest.raises(HTTPException) as exc:
+        MultipartFileStream(_request(b"", content_length=10_000_000), max_bytes=1000)
+
+    assert exc.value.status_code == 413
+
+
+async def test_missing_file_field_is_a_400():
+    upload = MultipartFileStream(_request(_multipart_body(b"data", field="other")), max_bytes=1000)
+
+    with pytest.raises(HTTPException) as exc:
+        await upload.start()
+
+    assert exc.value.status_code == 400
+
+
+def test_non_multipart_request_is_a_400():
+    request = Request({"type": "http", "method": "POST", "headers": [(b"content-type", b"application/pdf")]})
+
+    with pytest.raises(HTTPException) as exc:
+        MultipartFileStream(request, max_bytes=1000)
+
+    assert exc.value.status_code == 400